@@ -8,14 +8,17 @@ from flask_cors import CORS
 
 # from .scheduler import init_scheduler # 移除这个导入
 
-def create_app(config_name='default'):
+def create_app(config_name='default', config_overrides: dict = None):
     """
     Flask 应用工厂函数。
+    config_overrides 覆盖配置类中的同名配置项（测试和基准测试用，例如把外部服务地址指向模拟服务器）。
     """
     app = Flask(__name__)
 
     # 1. 加载配置
     app.config.from_object(config[config_name])
+    if config_overrides:
+        app.config.update(config_overrides)
 
     # 2. 注册数据库扩展
     db.init_app(app)
@@ -24,6 +27,8 @@ def create_app(config_name='default'):
     from app.modules.user import user_bp
     from app.modules.wishlist import wishlist_bp
     from app.modules.devinfo import devinfo_bp # <-- 新增导入
+    from app.modules.items import items_bp
+    from app.modules.system import system_bp
 
     # 在 app/__init__.py 中找到注册蓝图的位置，添加：
     from app.modules.chat.views import chat_bp
@@ -32,6 +37,8 @@ def create_app(config_name='default'):
     app.register_blueprint(user_bp)
     app.register_blueprint(wishlist_bp)
     app.register_blueprint(devinfo_bp) # <-- 新增注册
+    app.register_blueprint(items_bp)
+    app.register_blueprint(system_bp)
 
     # 4. 注册 CORS 扩展
     CORS(app, supports_credentials=True)
@@ -42,6 +49,14 @@ def create_app(config_name='default'):
     from app.modules.battle.views import battle_bp
     app.register_blueprint(battle_bp)
 
+    # 5. 外部服务地址：服务实例是进程内共享的单例，后台线程中没有 app_context，在这里统一设置
+    from app.services.steam_service import steam_service
+    from app.services.github_service import github_service
+    from app.services.moonshot_client import moonshot_client
+    steam_service.api_url = app.config['STEAM_API_URL']
+    github_service.api_base = app.config['GITHUB_API_BASE'].rstrip('/')
+    moonshot_client.base_url = app.config['MOONSHOT_BASE_URL'].rstrip('/')
+
     # 简单的测试路由
     @app.route('/')
     def index():
@@ -33,4 +33,69 @@ class GitHubAnalysis(db.Model):
             'github_username': self.github_username,
             'avatar_url': self.avatar_url,
             'timestamp': self.timestamp.isoformat()
-        }
\ No newline at end of file
+        }
+
+class LLMResponseCache(db.Model):
+    """
+    大模型响应缓存：以 (模型, 提示词, 参数) 的哈希为主键，相同输入直接复用上次的输出。
+    容量超出上限时按 last_accessed_at 淘汰最久未使用的记录（LRU）。
+    """
+    __tablename__ = 'llm_response_cache'
+
+    # 请求 payload 规范化后的 SHA-256
+    cache_key = db.Column(db.String(64), primary_key=True)
+    # 调用方名称（如 analyze_repo），用于按调用方设置 TTL 和统计
+    endpoint = db.Column(db.String(64), nullable=False, index=True)
+    model = db.Column(db.String(64))
+
+    # 用户深度报告可能超过 TEXT 的 64KB 上限，MySQL 下使用 MEDIUMTEXT
+    content = db.Column(db.Text(length=16777215), nullable=False)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+    hits = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class AnalysisJob(db.Model):
+    """
+    GitHub 用户 AI 分析任务：接口只负责入队，由后台工作线程获取 GitHub 数据并调用大模型。
+    任务状态保存在数据库中，进程重启后未完成的任务会被重新执行。
+    """
+    __tablename__ = 'analysis_jobs'
+    __table_args__ = (
+        db.Index('ix_analysis_jobs_username_status', 'github_username', 'status'),
+    )
+
+    # UUID，作为对外返回的任务 ID
+    id = db.Column(db.String(36), primary_key=True)
+    github_username = db.Column(db.String(128), nullable=False)
+
+    # 状态：'queued'（排队中）、'running'（执行中）、'succeeded'（成功）、'failed'（失败）
+    status = db.Column(db.String(16), default='queued', nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+
+    # 成功时关联生成的分析报告；失败时记录错误信息和建议的 HTTP 状态码
+    analysis_id = db.Column(db.Integer, db.ForeignKey('github_analysis.id'))
+    error = db.Column(db.String(512))
+    error_code = db.Column(db.Integer)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # 执行中由工作线程定期刷新；长时间未刷新说明执行它的进程已崩溃
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'username': self.github_username,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
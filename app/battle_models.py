@@ -0,0 +1,104 @@
+from app.database import db
+from datetime import datetime
+
+
+class BattleLog(db.Model):
+    """
+    对战记录：每次对战一行，只保存统计需要的字段。
+    由 battle_stats_service 的内存缓冲区批量写入，不在请求线程中直接插入。
+    """
+    __tablename__ = 'battle_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # 双方 GitHub 用户名（小写）
+    player1 = db.Column(db.String(39), nullable=False, index=True)
+    player2 = db.Column(db.String(39), nullable=False, index=True)
+
+    # 战力值和等级
+    player1_score = db.Column(db.Integer, nullable=False)
+    player2_score = db.Column(db.Integer, nullable=False)
+    player1_rank = db.Column(db.String(16))
+    player2_rank = db.Column(db.String(16))
+
+    # 胜者用户名；战力相同为平局，记为 None
+    winner = db.Column(db.String(39))
+
+    # 是否直接返回了缓存的对战结果
+    cached = db.Column(db.Boolean, default=False, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class BattlePlayerStats(db.Model):
+    """按选手汇总的对战统计（由对战记录增量累加，读取时无需扫描 battle_log）"""
+    __tablename__ = 'battle_player_stats'
+
+    username = db.Column(db.String(39), primary_key=True)
+
+    battles = db.Column(db.Integer, default=0, nullable=False)
+    wins = db.Column(db.Integer, default=0, nullable=False, index=True)
+    losses = db.Column(db.Integer, default=0, nullable=False)
+    draws = db.Column(db.Integer, default=0, nullable=False)
+
+    # 被挑战次数：作为蓝方（player2）出场的次数
+    challenged = db.Column(db.Integer, default=0, nullable=False, index=True)
+
+    last_rank = db.Column(db.String(16))
+    last_power_score = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'username': self.username,
+            'battles': self.battles,
+            'wins': self.wins,
+            'losses': self.losses,
+            'draws': self.draws,
+            'win_rate': round(self.wins / self.battles, 3) if self.battles else 0,
+            'challenged': self.challenged,
+            'rank': self.last_rank,
+            'power_score': self.last_power_score
+        }
+
+
+class BattleRankStats(db.Model):
+    """等级分布：每个等级在对战中出场的次数"""
+    __tablename__ = 'battle_rank_stats'
+
+    rank = db.Column(db.String(16), primary_key=True)
+    appearances = db.Column(db.Integer, default=0, nullable=False)
+
+
+class BattleCounter(db.Model):
+    """全局计数器（如总对战次数），按名称存储"""
+    __tablename__ = 'battle_counters'
+
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.BigInteger, default=0, nullable=False)
+
+
+class PlayerPowerScore(db.Model):
+    """
+    选手战力值及其计算输入，每次获取选手数据后更新。
+    排行榜查询使用进程内的有序索引，这张表用于持久化和进程启动时重建索引。
+    """
+    __tablename__ = 'player_power_scores'
+
+    # 小写 GitHub 用户名
+    username = db.Column(db.String(39), primary_key=True)
+    display_name = db.Column(db.String(39))
+    avatar_url = db.Column(db.String(512))
+
+    power_score = db.Column(db.Integer, nullable=False, index=True)
+    rank = db.Column(db.String(16))
+
+    # 战力值的计算输入
+    repos = db.Column(db.Integer, default=0)
+    followers = db.Column(db.Integer, default=0)
+    stars = db.Column(db.Integer, default=0)
+    commits_weekly = db.Column(db.Integer, default=0)
+    wishes_count = db.Column(db.Integer, default=0)
+    score = db.Column(db.Integer, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
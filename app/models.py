@@ -32,6 +32,9 @@ class Item(db.Model):
     # 平台名称：'jd', 'steam', 'taobao'
     platform = db.Column(db.String(50), index=True, nullable=False)
 
+    # 信息补全状态：'pending'（占位记录，等待后台抓取）、'ready'（已补全）、'failed'（抓取失败，由监控任务重试）
+    enrich_status = db.Column(db.String(20), default='ready', server_default='ready', index=True, nullable=False)
+
     # 关联价格历史记录
     prices = db.relationship('PriceHistory', backref='item', lazy='dynamic')
     wishes = db.relationship('Wish', backref='item', lazy='dynamic')
@@ -64,10 +67,112 @@ class Wish(db.Model):
 class PriceHistory(db.Model):
     """价格历史模型：记录每次抓取到的价格"""
     __tablename__ = 'price_history'
+    # 图表查询总是“某商品 + 时间范围”，联合索引避免按 item_id 过滤后再排序
+    __table_args__ = (
+        db.Index('ix_price_history_item_timestamp', 'item_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
 
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'))
     price = db.Column(db.Float, nullable=False)
 
     # 记录抓取时间
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ItemPriceStats(db.Model):
+    """商品价格统计模型：由监控任务在每次记录价格时增量更新，避免在请求中扫描 price_history"""
+    __tablename__ = 'item_price_stats'
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), primary_key=True)
+
+    # 最近一次记录的价格
+    last_price = db.Column(db.Float)
+    last_timestamp = db.Column(db.DateTime)
+
+    # 史低价格及出现时间
+    all_time_low = db.Column(db.Float)
+    all_time_low_at = db.Column(db.DateTime)
+    all_time_high = db.Column(db.Float)
+
+    # 近 30 / 90 天最低价及其所在日期（过期后从按天汇总表中重新计算）
+    low_30d = db.Column(db.Float)
+    low_30d_at = db.Column(db.DateTime)
+    low_90d = db.Column(db.Float)
+    low_90d_at = db.Column(db.DateTime)
+
+    # 用于计算均价的累计值
+    price_sum = db.Column(db.Float, default=0, nullable=False)
+    price_count = db.Column(db.Integer, default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    item = db.relationship('Item', backref=db.backref('price_stats', uselist=False))
+
+
+class ItemPriceDaily(db.Model):
+    """商品价格按天汇总：用于在窗口最低价过期时以有限代价重新计算"""
+    __tablename__ = 'item_price_daily'
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    min_price = db.Column(db.Float, nullable=False)
+    max_price = db.Column(db.Float, nullable=False)
+    price_sum = db.Column(db.Float, default=0, nullable=False)
+    price_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class NotificationOutbox(db.Model):
+    """
+    通知发件箱：与触发事件（记录价格 / 解锁心愿）在同一事务中写入，
+    由后台投递任务异步发送邮件，失败后按指数退避重试，超过次数后进入死信状态。
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+
+    # 通知类型：'price_alert', 'unlock'
+    kind = db.Column(db.String(32), nullable=False)
+
+    # 渲染邮件所需的数据 (JSON 字符串)
+    payload = db.Column(db.Text, nullable=False)
+
+    # 状态：'pending'（待发送）、'sending'（已被投递任务领取）、'sent'（已发送）、'skipped'（无收件人）、'dead'（重试耗尽）
+    status = db.Column(db.String(16), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.String(512))
+
+    # 领取标记：防止多个投递任务重复发送同一条通知
+    claim_token = db.Column(db.String(36), index=True)
+    claimed_at = db.Column(db.DateTime)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+class WishChangeLog(db.Model):
+    """
+    心愿变更日志：自增 id 即增量同步的游标。
+    - 心愿级变更（新增 / 修改 / 解锁 / 删除）记录 user_id 和 wish_id
+    - 商品级变更（价格、标题、图片）只按 item_id 记录一条，user_id 为空，查询时再关联到收藏了该商品的用户
+    与触发变更的数据在同一事务中写入；旧日志由定时任务压缩清理。
+    """
+    __tablename__ = 'wish_change_log'
+    __table_args__ = (
+        db.Index('ix_wish_change_log_user_id_id', 'user_id', 'id'),
+        db.Index('ix_wish_change_log_item_id_id', 'item_id', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, nullable=True)
+    # 不设外键：心愿删除后日志仍需保留被删除的 wish_id
+    wish_id = db.Column(db.Integer, nullable=True)
+    item_id = db.Column(db.Integer, nullable=True)
+
+    # 变更类型：'upsert'（心愿新增或修改）、'delete'（心愿删除）、'item'（商品价格或信息变化）
+    change_type = db.Column(db.String(16), nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -1,6 +1,6 @@
-from flask import jsonify, request, make_response
+from flask import jsonify, request, make_response, stream_with_context
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from io import BytesIO
 import markdown
 import os
@@ -11,8 +11,13 @@ from app.modules.ai_analysis import ai_bp
 # 导入服务
 from app.services.github_service import github_service
 from app.services.llm_analysis import llm_service
-from app.ai_models import GitHubAnalysis
+from app.services.prompt_builder import readme_extract
+from app.services.analysis_job_service import (
+    analysis_job_service, get_recent_analysis, collect_analysis_inputs, save_analysis
+)
+from app.ai_models import GitHubAnalysis, AnalysisJob
 from app.database import db
+from app.modules.sse import sse, sse_response
 
 # PDF 库和 ReportLab 核心依赖
 from xhtml2pdf import pisa
@@ -143,86 +148,106 @@ def generate_ai_evaluation(score, tech_stack):
 # ---------------------------------------------------------
 @ai_bp.route('/analyze/<string:username>', methods=['POST', 'GET'])
 def analyze_github_user_radar(username):
+    """
+    有效期内已有报告时直接返回（200）；否则创建后台分析任务并返回任务 ID（202），
+    客户端轮询 GET /api/ai/jobs/<job_id> 获取结果。同一用户的并发请求共用同一个任务。
+    """
     # 1. 检查缓存
-    cached = GitHubAnalysis.query.filter_by(github_username=username).order_by(GitHubAnalysis.timestamp.desc()).first()
+    cached = get_recent_analysis(username)
+    if cached:
+        return jsonify({
+            'message': '获取成功 (来自缓存)',
+            'data': cached[0],
+            'avatar_url': cached[1],
+            'cached': True,
+            'username': username
+        }), 200
 
-    if cached and cached.timestamp > datetime.utcnow() - timedelta(hours=24):
-        try:
-            return jsonify({
-                'message': '获取成功 (来自缓存)',
-                'data': json.loads(cached.analysis_json),
-                'avatar_url': cached.avatar_url,
-                'cached': True,
-                'username': username
-            }), 200
-        except json.JSONDecodeError:
-            pass
-
-    # 2. 获取基础数据
-    profile = github_service.fetch_user_profile(username)
-    if not profile:
-        return jsonify({'message': f'GitHub 用户 {username} 不存在或 API 受限'}), 404
-
-    repos = github_service.fetch_user_repos(username)
-    if not repos:
-        return jsonify({'message': '该用户没有公开仓库，无法分析'}), 400
-
-    # 3. 数据准备
-    sorted_repos = sorted(repos, key=lambda r: (r.get('stars', 0), r.get('updated_at', '')), reverse=True)
-    simple_repos_data = []
-    for r in sorted_repos:
-        simple_repos_data.append({
-            'name': r.get('name'),
-            'description': r.get('description'),
-            'updated_at': r.get('updated_at'),
-            'language': r.get('language'),
-            'stars': r.get('stars')
-        })
-
-    top_repos = sorted_repos[:5]
-    detailed_repos = []
-
-    for repo in top_repos:
-        repo_name = repo['name']
-        langs = github_service.fetch_repo_languages(username, repo_name)
-        readme_content = github_service.fetch_repo_readme(username, repo_name)
-        if readme_content and len(readme_content) > 3000:
-            readme_content = readme_content[:3000] + "...(truncated)"
-        detailed_repos.append({
-            'name': repo_name,
-            'description': repo['description'],
-            'stars': repo['stars'],
-            'updated_at': repo['updated_at'],
-            'language': repo['language'],
-            'languages_stats': langs,
-            'readme': readme_content
-        })
-
-    # 4. 调用 AI
-    ai_result = llm_service.analyze_github_user(username, profile, detailed_repos, simple_repos_data)
-
-    if "error" in ai_result:
-        return jsonify({'message': ai_result['error'], 'data': ai_result, 'avatar_url': profile.get('avatar_url')}), 500
-
-    # 5. 存入数据库
-    try:
-        analysis_json_str = json.dumps(ai_result, ensure_ascii=False)
-        new_record = GitHubAnalysis(
-            github_username=username, avatar_url=profile.get('avatar_url'), analysis_json=analysis_json_str
-        )
-        db.session.add(new_record)
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error saving AI analysis to DB: {e}")
+    # 2. 入队，由后台工作线程获取 GitHub 数据并调用 AI
+    job = analysis_job_service.enqueue(username)
+    if job is None:
+        return jsonify({'message': '分析任务过多，请稍后再试'}), 503
 
     return jsonify({
-        'message': 'AI 深度分析完成',
-        'data': ai_result,
-        'avatar_url': profile.get('avatar_url'),
-        'cached': False,
+        'message': '分析任务已创建',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/ai/jobs/{job.id}',
         'username': username
-    }), 200
+    }), 202
+
+
+# ---------------------------------------------------------
+# 路由：查询 AI 分析任务状态 / 结果
+# ---------------------------------------------------------
+@ai_bp.route('/jobs/<string:job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    job = db.session.get(AnalysisJob, job_id)
+    if not job:
+        return jsonify({'message': '任务不存在'}), 404
+
+    body = job.to_dict()
+    if job.status == 'succeeded':
+        record = db.session.get(GitHubAnalysis, job.analysis_id)
+        if record:
+            body['data'] = json.loads(record.analysis_json)
+            body['avatar_url'] = record.avatar_url
+        return jsonify({'message': 'AI 深度分析完成', **body}), 200
+
+    if job.status == 'failed':
+        # 任务本身查询成功，失败原因放在 error 中，error_code 是同步接口原本会返回的状态码
+        body['error_code'] = job.error_code
+        return jsonify({'message': job.error or '分析失败', **body}), 200
+
+    return jsonify({'message': '分析进行中', **body}), 200
+
+
+# ---------------------------------------------------------
+# 路由：流式执行 AI 分析 (Server-Sent Events)
+# ---------------------------------------------------------
+@ai_bp.route('/analyze/<string:username>/stream', methods=['POST', 'GET'])
+def analyze_github_user_stream(username):
+    """
+    AI 分析的流式版本。GitHub 数据获取失败时与非流式接口返回相同的 JSON 错误；成功后依次推送：
+    - profile: {"username", "avatar_url"}
+    - field:   报告中刚生成完的顶层字段 {"key", "value"}；radar_scores、overall_score、tech_stack 通常最先到达，
+               summary 和 repositories 随后
+    - done:    {"data", "cached"}，data 与非流式接口返回（以及存入数据库）的报告完全一致
+    - error:   {"message"}，AI 调用失败
+    """
+    cached = get_recent_analysis(username)
+    if cached:
+        def replay():
+            yield sse('profile', {'username': username, 'avatar_url': cached[1]})
+            for key, value in cached[0].items():
+                yield sse('field', {'key': key, 'value': value})
+            yield sse('done', {'data': cached[0], 'cached': True})
+
+        return sse_response(replay())
+
+    inputs = collect_analysis_inputs(username)
+    if inputs[0] is None:
+        return jsonify({'message': inputs[1]}), inputs[2]
+    profile, detailed_repos, simple_repos_data = inputs
+
+    def generate():
+        yield sse('profile', {'username': username, 'avatar_url': profile.get('avatar_url')})
+        try:
+            for event in llm_service.stream_github_user(username, profile, detailed_repos, simple_repos_data):
+                if event[0] == 'field':
+                    yield sse('field', {'key': event[1], 'value': event[2]})
+                else:
+                    ai_result = event[1]
+        except Exception as e:
+            print(f"AI Stream Error: {e}")
+            yield sse('error', {'message': str(e)})
+            return
+
+        save_analysis(username, profile, ai_result)
+        yield sse('done', {'data': ai_result, 'cached': False})
+
+    # 生成器中需要访问数据库（响应缓存、保存报告），保留请求上下文
+    return sse_response(stream_with_context(generate()))
 
 
 # ---------------------------------------------------------
@@ -478,7 +503,7 @@ def analyze_single_repo_route(owner, repo_name):
     # 保持不变
     try:
         repo_details = github_service.fetch_repo_details(owner, repo_name)
-        readme_content = github_service.fetch_repo_readme(owner, repo_name)
+        readme_content = readme_extract(*github_service.fetch_repo_readme_blob(owner, repo_name))
         analysis_result = llm_service.analyze_specific_repo(repo_details, readme_content)
 
         if "error" in analysis_result:
@@ -1,11 +1,15 @@
 # app/modules/battle/views.py (优化版)
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from functools import wraps
 import time
 import re
-from app.services.battle_service import battle_service
+import numpy as np
+from app.services.battle_service import battle_service, battle_result_cache, battle_cache_key
 from app.services.llm_analysis import llm_service
+from app.services.battle_stats_service import battle_stats_service
+from app.services.leaderboard_service import leaderboard_service
+from app.modules.sse import sse, sse_response
 
 battle_bp = Blueprint('battle', __name__, url_prefix='/api/battle')
 
@@ -78,6 +82,7 @@ def analyze_battle():
     """
     对战分析接口
     前端发送 JSON: { "player1": "github_id_1", "player2": "github_id_2" }
+    查询参数: ?refresh=1 跳过缓存，重新获取数据并生成解说
     返回: {
         "success": true,
         "players": {
@@ -89,119 +94,319 @@ def analyze_battle():
             "player2": {...}
         },
         "commentary": "AI解说文本",
-        "analysis_time": 1.23  # 分析耗时（秒）
+        "cached": false,  # 是否来自对战结果缓存
+        "analysis_time": 1.23,  # 分析耗时（秒）
+        "stage_times": {"github_fetch", "enhance", "llm", "github_calls"}  # 各阶段耗时（秒）
     }
     """
     start_time = time.time()
+    data = request.json
+    p1_username = data.get('player1').strip()
+    p2_username = data.get('player2').strip()
+    # ?refresh=1 跳过对战结果缓存和选手数据缓存
+    refresh = request.args.get('refresh') == '1'
+
+    print(f"\n{'=' * 60}")
+    print(f"[Battle Request] {p1_username} VS {p2_username}")
+    print(f"{'=' * 60}")
+
+    # 0. 热门对局直接返回缓存结果；过期的结果先返回，再在后台重新生成
+    cache_key = battle_cache_key(p1_username, p2_username)
+    if not refresh:
+        cached, stale = battle_result_cache.get(cache_key)
+        if cached is not None:
+            if stale:
+                app = current_app._get_current_object()
+                battle_result_cache.revalidate(
+                    cache_key, lambda: _revalidate_battle(app, p1_username, p2_username)
+                )
+            print(f"[Battle Cache] 命中{'（已过期，后台刷新中）' if stale else ''}")
+            body = _from_cached_result(cached, p1_username, p2_username, start_time)
+            battle_stats_service.record(body['players']['player1'], body['players']['player2'], cached=True)
+            return jsonify(body), 200
 
     try:
-        data = request.json
-        p1_username = data.get('player1').strip()
-        p2_username = data.get('player2').strip()
-
-        print(f"\n{'=' * 60}")
-        print(f"[Battle Request] {p1_username} VS {p2_username}")
-        print(f"{'=' * 60}")
-
-        # 1. 获取两名选手数据
-        print("[Step 1/3] 获取选手数据...")
-        try:
-            p1_data = battle_service.get_player_data(p1_username)
-        except Exception as e:
-            print(f"[Error] Failed to fetch player1 data: {e}")
-            return jsonify({
-                "success": False,
-                "message": f"获取选手 {p1_username} 数据失败，请检查用户名是否正确"
-            }), 404
+        body, status, cacheable = _run_battle(p1_username, p2_username, start_time, refresh)
+        if cacheable:
+            battle_result_cache.set(cache_key, _to_cached_result(body, p1_username, p2_username))
+        if status == 200:
+            battle_stats_service.record(body['players']['player1'], body['players']['player2'])
+        return jsonify(body), status
 
-        try:
-            p2_data = battle_service.get_player_data(p2_username)
-        except Exception as e:
-            print(f"[Error] Failed to fetch player2 data: {e}")
-            return jsonify({
-                "success": False,
-                "message": f"获取选手 {p2_username} 数据失败，请检查用户名是否正确"
-            }), 404
+    except Exception as e:
+        print(f"\n[Fatal Error] Battle analysis failed: {e}")
+        import traceback
+        traceback.print_exc()
 
-        # 2. 验证数据有效性
-        if not p1_data.get('found'):
-            return jsonify({
-                "success": False,
-                "message": f"GitHub 用户不存在: {p1_username}"
-            }), 404
+        return jsonify({
+            "success": False,
+            "message": "服务器内部错误，对战分析失败，请稍后重试"
+        }), 500
 
-        if not p2_data.get('found'):
-            return jsonify({
-                "success": False,
-                "message": f"GitHub 用户不存在: {p2_username}"
-            }), 404
 
-        print(f"  ✓ 红方: {p1_data.get('username')} (战力: {p1_data.get('power_score', 0)})")
-        print(f"  ✓ 蓝方: {p2_data.get('username')} (战力: {p2_data.get('power_score', 0)})")
+@battle_bp.route('/analyze/stream', methods=['POST'])
+@validate_battle_request
+def analyze_battle_stream():
+    """
+    对战分析的流式版本（Server-Sent Events），请求参数与 /analyze 相同。
+    选手数据获取失败时与 /analyze 返回相同的 JSON 错误；成功后依次推送：
+    - players:    选手卡片数据 {"player1", "player2"}
+    - commentary: 解说文本增量 {"delta"}
+    - fallback:   AI 中途失败时的完整备用解说 {"commentary"}，客户端应替换已显示的内容
+    - done:       {"cached", "analysis_time", "stage_times"}
+    """
+    start_time = time.time()
+    data = request.json
+    p1_username = data.get('player1').strip()
+    p2_username = data.get('player2').strip()
+    refresh = request.args.get('refresh') == '1'
+    cache_key = battle_cache_key(p1_username, p2_username)
+
+    print(f"\n[Battle Stream] {p1_username} VS {p2_username}")
+
+    # 与 /analyze 一致：过期的结果先返回，再在后台重新生成
+    if not refresh:
+        cached, stale = battle_result_cache.get(cache_key)
+        if cached is not None:
+            if stale:
+                app = current_app._get_current_object()
+                battle_result_cache.revalidate(
+                    cache_key, lambda: _revalidate_battle(app, p1_username, p2_username)
+                )
+            print(f"[Battle Stream Cache] 命中{'（已过期，后台刷新中）' if stale else ''}")
+            body = _from_cached_result(cached, p1_username, p2_username, start_time)
+            battle_stats_service.record(body['players']['player1'], body['players']['player2'], cached=True)
+
+            def replay():
+                yield sse('players', body['players'])
+                yield sse('commentary', {'delta': body['commentary']})
+                yield sse('done', {'cached': True, 'analysis_time': body['analysis_time'], 'stage_times': {}})
+
+            return sse_response(replay())
+
+    # 选手数据在返回响应之前同步获取，失败时保持与非流式接口一致的错误响应
+    try:
+        prepared = _prepare_players(p1_username, p2_username, refresh)
+    except Exception as e:
+        print(f"\n[Fatal Error] Battle analysis failed: {e}")
+        return jsonify({
+            "success": False,
+            "message": "服务器内部错误，对战分析失败，请稍后重试"
+        }), 500
+    if prepared[0] is None:
+        return jsonify(prepared[1]), prepared[2]
+    p1_enhanced, p2_enhanced, stage_times, fetch_timings = prepared
+    battle_stats_service.record(p1_enhanced, p2_enhanced)
 
-        # 3. 数据预处理和增强
-        print("[Step 2/3] 数据增强...")
-        p1_enhanced = _enhance_player_data(p1_data)
-        p2_enhanced = _enhance_player_data(p2_data)
-        print(f"  ✓ 数据增强完成")
+    def generate():
+        yield sse('players', {'player1': p1_enhanced, 'player2': p2_enhanced})
 
-        # 4. 调用 AI 生成深度解说
-        print("[Step 3/3] AI 生成解说...")
+        stage_start = time.time()
+        parts = []
         try:
-            ai_commentary = llm_service.analyze_battle(p1_enhanced, p2_enhanced)
-            print(f"  ✓ AI 解说生成成功 (长度: {len(ai_commentary)} 字)")
+            for delta in llm_service.stream_battle(p1_enhanced, p2_enhanced):
+                if not parts:
+                    stage_times['llm_first_token'] = round(time.time() - stage_start, 2)
+                parts.append(delta)
+                yield sse('commentary', {'delta': delta})
+            commentary = ''.join(parts).strip()
+            if not commentary:
+                raise Exception("AI 返回了空解说")
         except Exception as e:
-            print(f"[Warning] AI analysis failed: {e}")
-            # AI 失败时返回默认解说
-            ai_commentary = _generate_fallback_commentary(p1_enhanced, p2_enhanced)
-            print(f"  ⚠ 使用备用解说")
+            print(f"[Warning] AI stream failed after {len(parts)} chunks: {e}")
+            commentary = None
+            yield sse('fallback', {'commentary': _generate_fallback_commentary(p1_enhanced, p2_enhanced)})
+        stage_times['llm'] = round(time.time() - stage_start, 2)
+        stage_times['github_calls'] = {key: round(seconds, 2) for key, seconds in fetch_timings.items()}
+
+        if commentary:
+            battle_result_cache.set(cache_key, {
+                "players": {
+                    p1_username.lower(): p1_enhanced,
+                    p2_username.lower(): p2_enhanced
+                },
+                "commentary": commentary,
+                "timestamp": int(time.time())
+            })
 
-        # 5. 计算分析耗时
         analysis_time = round(time.time() - start_time, 2)
-        print(f"\n[Battle Complete] 分析耗时: {analysis_time}s")
-        print(f"{'=' * 60}\n")
+        print(f"[Battle Stream Complete] 分析耗时: {analysis_time}s {stage_times}")
+        yield sse('done', {'cached': False, 'analysis_time': analysis_time, 'stage_times': stage_times})
 
-        # 6. 返回完整结果
-        return jsonify({
-            "success": True,
-            "players": {
-                "player1": p1_enhanced,
-                "player2": p2_enhanced
-            },
-            "commentary": ai_commentary,
-            "analysis_time": analysis_time,
-            "timestamp": int(time.time())
-        }), 200
+    return sse_response(generate())
 
+
+def _run_battle(p1_username, p2_username, start_time, refresh=False):
+    """
+    执行一次完整的对战分析。
+    返回 (响应体, HTTP 状态码, 是否可缓存)；只有成功且由 AI 生成解说的结果才会被缓存。
+    """
+    prepared = _prepare_players(p1_username, p2_username, refresh)
+    if prepared[0] is None:
+        return prepared[1], prepared[2], False
+    p1_enhanced, p2_enhanced, stage_times, fetch_timings = prepared
+
+    # 4. 调用 AI 生成深度解说
+    print("[Step 3/3] AI 生成解说...")
+    stage_start = time.time()
+    ai_generated = True
+    try:
+        ai_commentary = llm_service.analyze_battle(p1_enhanced, p2_enhanced, use_fallback=False)
+        print(f"  ✓ AI 解说生成成功 (长度: {len(ai_commentary)} 字)")
     except Exception as e:
-        print(f"\n[Fatal Error] Battle analysis failed: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"[Warning] AI analysis failed: {e}")
+        # AI 失败时返回默认解说（不写入缓存，下次请求重新尝试 AI）
+        ai_commentary = _generate_fallback_commentary(p1_enhanced, p2_enhanced)
+        ai_generated = False
+        print(f"  ⚠ 使用备用解说")
+    stage_times['llm'] = round(time.time() - stage_start, 2)
+
+    # 5. 计算分析耗时
+    analysis_time = round(time.time() - start_time, 2)
+    stage_times['github_calls'] = {key: round(seconds, 2) for key, seconds in fetch_timings.items()}
+    print(f"\n[Battle Complete] 分析耗时: {analysis_time}s {stage_times}")
+    print(f"{'=' * 60}\n")
+
+    # 6. 返回完整结果
+    return {
+        "success": True,
+        "players": {
+            "player1": p1_enhanced,
+            "player2": p2_enhanced
+        },
+        "commentary": ai_commentary,
+        "cached": False,
+        "analysis_time": analysis_time,
+        "stage_times": stage_times,
+        "timestamp": int(time.time())
+    }, 200, ai_generated
 
-        return jsonify({
+
+def _prepare_players(p1_username, p2_username, refresh=False):
+    """
+    对战分析的前三步：获取选手数据、校验、数据增强。
+    成功返回 (p1_enhanced, p2_enhanced, stage_times, fetch_timings)；
+    失败返回 (None, 错误响应体, HTTP 状态码)
+    """
+    # 各阶段耗时（秒）
+    stage_times = {}
+
+    # 1. 并发获取两名选手数据（6 个 GitHub 请求同时发出，共用一个截止时间）
+    print("[Step 1/3] 获取选手数据...")
+    stage_start = time.time()
+    (p1_data, p2_data), fetch_timings = battle_service.get_players_data([p1_username, p2_username], refresh=refresh)
+    stage_times['github_fetch'] = round(time.time() - stage_start, 2)
+
+    for username, player_data in ((p1_username, p1_data), (p2_username, p2_data)):
+        if isinstance(player_data, Exception):
+            print(f"[Error] Failed to fetch {username} data: {player_data}")
+            return None, {
+                "success": False,
+                "message": f"获取选手 {username} 数据失败，请检查用户名是否正确"
+            }, 404
+
+    # 2. 验证数据有效性
+    if not p1_data.get('found'):
+        return None, {
             "success": False,
-            "message": "服务器内部错误，对战分析失败，请稍后重试"
-        }), 500
+            "message": f"GitHub 用户不存在: {p1_username}"
+        }, 404
+
+    if not p2_data.get('found'):
+        return None, {
+            "success": False,
+            "message": f"GitHub 用户不存在: {p2_username}"
+        }, 404
+
+    print(f"  ✓ 红方: {p1_data.get('username')} (战力: {p1_data.get('power_score', 0)})")
+    print(f"  ✓ 蓝方: {p2_data.get('username')} (战力: {p2_data.get('power_score', 0)})")
+
+    # 3. 数据预处理和增强
+    print("[Step 2/3] 数据增强...")
+    stage_start = time.time()
+    p1_enhanced = _enhance_player_data(p1_data)
+    p2_enhanced = _enhance_player_data(p2_data)
+    stage_times['enhance'] = round(time.time() - stage_start, 2)
+    _record_power_scores([p1_enhanced, p2_enhanced])
+    print(f"  ✓ 数据增强完成")
+
+    return p1_enhanced, p2_enhanced, stage_times, fetch_timings
+
+
+def _to_cached_result(body, p1_username, p2_username):
+    """缓存中按小写用户名保存选手数据，命中时可以按请求中的红蓝顺序还原"""
+    return {
+        "players": {
+            p1_username.lower(): body['players']['player1'],
+            p2_username.lower(): body['players']['player2']
+        },
+        "commentary": body['commentary'],
+        "timestamp": body['timestamp']
+    }
+
+
+def _from_cached_result(cached, p1_username, p2_username, start_time):
+    return {
+        "success": True,
+        "players": {
+            "player1": cached['players'][p1_username.lower()],
+            "player2": cached['players'][p2_username.lower()]
+        },
+        "commentary": cached['commentary'],
+        "cached": True,
+        "analysis_time": round(time.time() - start_time, 3),
+        "stage_times": {},
+        "timestamp": cached['timestamp']
+    }
+
+
+def _revalidate_battle(app, p1_username, p2_username):
+    """后台重新生成过期的对战结果；失败或使用了备用解说时返回 None，保留旧结果"""
+    with app.app_context():
+        body, _, cacheable = _run_battle(p1_username, p2_username, time.time(), refresh=True)
+        return _to_cached_result(body, p1_username, p2_username) if cacheable else None
 
 
 # ============ 辅助函数 ============
-def _enhance_player_data(player_data):
+# 战力值权重（加权算法）：(数据分组, 字段, 权重)
+# 权重设计：活跃度 > 质量 > 数量
+POWER_SCORE_WEIGHTS = (
+    ('github_data', 'repos', 5),  # 仓库数
+    ('github_data', 'followers', 3),  # 粉丝数
+    ('github_data', 'stars', 2),  # 获赞数
+    ('github_data', 'commits_weekly', 10),  # 周提交（最重要）
+    ('internal_data', 'wishes_count', 8),  # 心愿数
+    ('internal_data', 'score', 1),  # 积分
+)
+
+
+def _power_scores(players):
+    """
+    向量化计算多名选手的战力值：特征矩阵 (N × 6) 与权重向量相乘，一次得到所有人的结果
+    """
+    features = np.array([
+        [(player.get(section) or {}).get(key, 0) or 0 for section, key, _ in POWER_SCORE_WEIGHTS]
+        for player in players
+    ], dtype=np.int64).reshape(len(players), len(POWER_SCORE_WEIGHTS))
+    weights = np.array([weight for _, _, weight in POWER_SCORE_WEIGHTS], dtype=np.int64)
+    return features @ weights
+
+
+def _enhance_player_data(player_data, power_score=None):
     """
     增强选手数据，添加计算字段和战力评分
+    power_score 已由 _power_scores 批量算好时直接传入
     """
     github = player_data.get('github_data', {})
     internal = player_data.get('internal_data', {})
 
-    # 计算综合战力值（加权算法）
-    # 权重设计：活跃度 > 质量 > 数量
-    power_score = (
-            github.get('repos', 0) * 5 +  # 仓库数
-            github.get('followers', 0) * 3 +  # 粉丝数
-            github.get('stars', 0) * 2 +  # 获赞数
-            github.get('commits_weekly', 0) * 10 +  # 周提交（最重要）
-            internal.get('wishes_count', 0) * 8 +  # 心愿数
-            internal.get('score', 0) * 1  # 积分
-    )
+    # 计算综合战力值
+    if power_score is None:
+        power_score = sum(
+            ((player_data.get(section) or {}).get(key, 0) or 0) * weight
+            for section, key, weight in POWER_SCORE_WEIGHTS
+        )
+    power_score = int(power_score)
 
     # 判定等级和徽章
     rank, rank_emoji = _calculate_rank(power_score)
@@ -216,6 +421,15 @@ def _enhance_player_data(player_data):
     return player_data
 
 
+def _record_power_scores(players):
+    """把增强后的选手战力写入排行榜；排行榜异常不影响对战本身"""
+    try:
+        for player in players:
+            leaderboard_service.record(player)
+    except Exception as e:
+        print(f"[Warning] 更新战力排行榜失败: {e}")
+
+
 def _calculate_rank(power_score):
     """
     根据战力值计算等级
@@ -314,6 +528,204 @@ def _generate_fallback_commentary(p1, p2):
     return f"{intro}\n\n{comparison}\n\n{conclusion}"
 
 
+# ============ 锦标赛模式 ============
+@battle_bp.route('/tournament', methods=['POST'])
+def tournament():
+    """
+    多人锦标赛：每名选手只获取一次数据（全部并发），一次性算出所有人的战力值，
+    按战力排名生成单败淘汰赛对阵表，最后只调用一次 AI 生成整场赛事的总结解说。
+    前端发送 JSON: { "players": ["github_id_1", "github_id_2", ...] }
+    查询参数: ?refresh=1 跳过选手数据缓存
+    返回: {
+        "success": true,
+        "ranking": [{"position", "seed", "username", "power_score", "rank", ...}],
+        "bracket": [{"round": 1, "matches": [{"player1", "player2", "winner", ...}]}, ...],
+        "champion": "github_id",
+        "skipped": [{"username", "reason"}],
+        "commentary": "AI解说文本",
+        "stage_times": {...}
+    }
+    """
+    start_time = time.time()
+    stage_times = {}
+    max_players = int(current_app.config.get('TOURNAMENT_MAX_PLAYERS') or 32)
+
+    data = request.json or {}
+    raw_players = data.get('players')
+    if not isinstance(raw_players, list):
+        return jsonify({"success": False, "message": "players 必须是 GitHub 用户名列表"}), 400
+
+    # 去重（不区分大小写）并校验用户名格式
+    usernames, seen = [], set()
+    for name in raw_players:
+        name = (name or '').strip() if isinstance(name, str) else ''
+        if not _is_valid_github_username(name):
+            return jsonify({"success": False, "message": f"无效的 GitHub 用户名格式: {name}"}), 400
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            usernames.append(name)
+
+    if len(usernames) < 2:
+        return jsonify({"success": False, "message": "锦标赛至少需要两名不同的选手"}), 400
+    if len(usernames) > max_players:
+        return jsonify({"success": False, "message": f"锦标赛最多支持 {max_players} 名选手"}), 400
+
+    print(f"\n[Tournament] {len(usernames)} 名选手: {', '.join(usernames)}")
+
+    try:
+        # 1. 所有选手的 GitHub 请求一起并发发出
+        stage_start = time.time()
+        results, _ = battle_service.get_players_data(usernames, refresh=request.args.get('refresh') == '1')
+        stage_times['github_fetch'] = round(time.time() - stage_start, 2)
+
+        players, skipped = [], []
+        for username, result in zip(usernames, results):
+            if isinstance(result, Exception):
+                skipped.append({"username": username, "reason": "获取数据失败"})
+            elif not result.get('found'):
+                skipped.append({"username": username, "reason": "GitHub 用户不存在"})
+            else:
+                players.append(result)
+
+        if len(players) < 2:
+            return jsonify({
+                "success": False,
+                "message": "有效选手不足两名，无法开始锦标赛",
+                "skipped": skipped
+            }), 404
+
+        # 2. 一次向量化计算出所有人的战力值，再按战力排名
+        stage_start = time.time()
+        scores = _power_scores(players)
+        for player, score in zip(players, scores):
+            _enhance_player_data(player, score)
+        _record_power_scores(players)
+
+        order = np.argsort(-scores, kind='stable')
+        ranking = []
+        for position, index in enumerate(order, start=1):
+            player = players[index]
+            player['seed'] = position
+            ranking.append({
+                "position": position,
+                "seed": position,
+                "username": player['username'],
+                "avatar": player.get('avatar'),
+                "power_score": player['power_score'],
+                "rank": player['rank'],
+                "rank_emoji": player['rank_emoji'],
+                "strengths": player['strengths']
+            })
+
+        bracket = _build_bracket([players[index] for index in order])
+        champion = bracket[-1]['matches'][0]['winner']
+        stage_times['ranking'] = round(time.time() - stage_start, 2)
+
+        # 3. 整场赛事只调用一次 AI
+        stage_start = time.time()
+        try:
+            commentary = llm_service.analyze_tournament(ranking, bracket, champion, use_fallback=False)
+        except Exception as e:
+            print(f"[Warning] AI tournament commentary failed: {e}")
+            commentary = _generate_tournament_fallback(ranking, champion)
+        stage_times['llm'] = round(time.time() - stage_start, 2)
+
+        analysis_time = round(time.time() - start_time, 2)
+        print(f"[Tournament Complete] 冠军: {champion}，耗时: {analysis_time}s {stage_times}")
+
+        return jsonify({
+            "success": True,
+            "ranking": ranking,
+            "bracket": bracket,
+            "champion": champion,
+            "skipped": skipped,
+            "commentary": commentary,
+            "analysis_time": analysis_time,
+            "stage_times": stage_times,
+            "timestamp": int(time.time())
+        }), 200
+
+    except Exception as e:
+        print(f"\n[Fatal Error] Tournament failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+        return jsonify({
+            "success": False,
+            "message": "服务器内部错误，锦标赛生成失败，请稍后重试"
+        }), 500
+
+
+def _seed_order(size):
+    """
+    标准种子对阵顺序：size=8 时为 [1, 8, 4, 5, 2, 7, 3, 6]，
+    保证 1 号和 2 号种子只可能在决赛相遇
+    """
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+def _build_bracket(seeded_players):
+    """
+    按种子顺序生成单败淘汰赛对阵表。人数不是 2 的幂时，排名靠前的种子首轮轮空。
+    每场比赛战力值高者胜，战力相同时种子靠前者胜。
+    """
+    size = 1
+    while size < len(seeded_players):
+        size *= 2
+
+    slots = [seeded_players[seed - 1] if seed <= len(seeded_players) else None for seed in _seed_order(size)]
+
+    bracket = []
+    round_number = 1
+    while len(slots) > 1:
+        matches, winners = [], []
+        for i in range(0, len(slots), 2):
+            p1, p2 = slots[i], slots[i + 1]
+            if p2 is None or p1 is None:
+                winner = p1 or p2
+                matches.append({
+                    "player1": winner['username'],
+                    "player2": None,
+                    "winner": winner['username'],
+                    "bye": True
+                })
+            else:
+                winner = p1 if (p1['power_score'], -p1['seed']) >= (p2['power_score'], -p2['seed']) else p2
+                matches.append({
+                    "player1": p1['username'],
+                    "player2": p2['username'],
+                    "score1": p1['power_score'],
+                    "score2": p2['power_score'],
+                    "winner": winner['username'],
+                    "bye": False
+                })
+            winners.append(winner)
+
+        bracket.append({"round": round_number, "matches": matches})
+        slots = winners
+        round_number += 1
+
+    return bracket
+
+
+def _generate_tournament_fallback(ranking, champion):
+    """AI 失败时的锦标赛总结（规则引擎）"""
+    top = ranking[:3]
+    podium = "、".join(f"{p['username']}（{p['rank']}，战力 {p['power_score']}）" for p in top)
+    gap = ranking[0]['power_score'] - ranking[1]['power_score']
+
+    intro = f"🏆 代码竞技场锦标赛落下帷幕！{len(ranking)} 名选手同场竞技，最终 {champion} 登顶！"
+    if gap > ranking[1]['power_score'] * 0.5:
+        body = f"冠军以 {gap} 点战力的巨大优势一骑绝尘。前三名依次是：{podium}。"
+    else:
+        body = f"冠亚军之争仅差 {gap} 点战力，堪称神仙打架！前三名依次是：{podium}。"
+    return f"{intro}\n\n{body}\n\n感谢所有选手的精彩表现，下届再战！💪"
+
+
 # ============ 健康检查路由 ============
 @battle_bp.route('/health', methods=['GET'])
 def health_check():
@@ -326,14 +738,65 @@ def health_check():
     }), 200
 
 
+# ============ 排行榜接口 ============
+@battle_bp.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    """
+    战力排行榜，数据来自每次对战 / 锦标赛获取的选手战力。
+    - 默认：前 limit 名（支持 offset 分页）
+    - ?username=xxx：该用户的名次，以及前后各 around 名
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        around = min(max(int(request.args.get('around', 5)), 0), 50)
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "message": "limit / offset / around 必须是整数"
+        }), 400
+
+    username = (request.args.get('username') or '').strip()
+    if username:
+        if not _is_valid_github_username(username):
+            return jsonify({
+                "success": False,
+                "message": f"无效的 GitHub 用户名: {username}"
+            }), 400
+
+        me = leaderboard_service.rank_of(username)
+        if me is None:
+            return jsonify({
+                "success": False,
+                "message": f"排行榜中暂无该用户，请先发起一次对战: {username}"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "data": {
+                "total": leaderboard_service.total(),
+                "me": me,
+                "entries": leaderboard_service.around(username, around)
+            }
+        }), 200
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "total": leaderboard_service.total(),
+            "entries": leaderboard_service.top(limit, offset)
+        }
+    }), 200
+
+
 # ============ 统计接口 ============
 @battle_bp.route('/stats', methods=['GET'])
 def get_stats():
     """
-    获取对战统计数据（可选功能）
+    获取对战统计数据：总对战次数、被挑战最多的选手、胜场榜（含胜率）、等级分布。
+    数据来自定时写入的汇总表，最近几秒内的对战可能尚未计入（见 pending）。
     """
-    # TODO: 实现统计逻辑，如总对战次数、热门选手等
     return jsonify({
         "success": True,
-        "message": "统计功能开发中..."
-    }), 200
\ No newline at end of file
+        "data": battle_stats_service.get_stats()
+    }), 200
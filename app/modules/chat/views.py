@@ -1,7 +1,6 @@
 from flask import Blueprint, request, jsonify
-import os
-import requests
 import logging
+from app.services.moonshot_client import moonshot_client, MoonshotError
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -18,10 +17,7 @@ def send_chat():
         if not user_message and not user_image:
             return jsonify({"error": "Message cannot be empty"}), 400
 
-        api_key = os.environ.get('MOONSHOT_API_KEY')
-        base_url = os.environ.get('MOONSHOT_BASE_URL', "https://api.moonshot.cn/v1")
-
-        if not api_key:
+        if not moonshot_client.configured:
             return jsonify({"error": "后端未配置 MOONSHOT_API_KEY"}), 500
 
         # -------------------------------------------------------------
@@ -76,35 +72,15 @@ def send_chat():
             "temperature": 0.3
         }
 
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(
-            f"{base_url}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-
-        # 错误处理
-        if response.status_code != 200:
-            error_detail = response.text
-            try:
-                error_json = response.json()
-                error_detail = error_json.get('error', {}).get('message', error_detail)
-            except:
-                pass
-            logging.error(f"Moonshot API Error: {response.status_code} - {response.text}")
-            return jsonify({"error": f"AI 服务异常: {error_detail}"}), response.status_code
-
-        result = response.json()
-        reply = result['choices'][0]['message']['content']
+        reply = moonshot_client.complete('chat', payload)
 
         return jsonify({"reply": reply})
 
-    except requests.exceptions.RequestException as e:
+    except MoonshotError as e:
+        # 有状态码说明服务端返回了错误（重试后仍失败），否则是网络层面的失败
+        if e.status:
+            logging.error(f"Moonshot API Error: {e.status} - {e.detail}")
+            return jsonify({"error": f"AI 服务异常: {e.detail}"}), e.status
         logging.error(f"API Request Error: {str(e)}")
         return jsonify({"error": "AI 服务连接失败"}), 502
     except Exception as e:
@@ -0,0 +1,8 @@
+from flask import Blueprint
+
+# 创建一个名为 'items' 的蓝图
+# url_prefix='/api/items' 意味着这个蓝图下的所有路由都以 /api/items 开头
+items_bp = Blueprint('items', __name__, url_prefix='/api/items')
+
+# 导入 views 文件，将路由注册到蓝图上
+from . import views
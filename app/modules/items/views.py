@@ -0,0 +1,42 @@
+from flask import request, jsonify
+from app.modules.items import items_bp
+from app.models import Item
+from app.services.price_history_service import price_history_service
+
+
+# --------------------
+# 路由：获取商品的降采样价格历史 (用于前端图表)
+# GET /api/items/<item_id>/history?range=30d&mode=ohlc&resolution=auto
+# GET /api/items/<item_id>/history?range=1y&mode=lttb&points=500
+# --------------------
+@items_bp.route('/<int:item_id>/history', methods=['GET'])
+def get_price_history(item_id):
+    """
+    返回列式结构的价格序列：
+    - ohlc 模式: series = {t, o, h, l, c, n}
+    - lttb 模式: series = {t, p}
+    t 为 UTC 秒级时间戳。
+    """
+    item = Item.query.get(item_id)
+    if not item:
+        return jsonify({'message': '商品不存在'}), 404
+
+    try:
+        history = price_history_service.get_history(
+            item_id,
+            range_key=request.args.get('range', '30d'),
+            mode=request.args.get('mode', 'ohlc'),
+            resolution=request.args.get('resolution', 'auto'),
+            points=int(request.args.get('points', 500))
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # history 是缓存中共享的对象，不能原地修改
+    response = jsonify({
+        'message': '价格历史获取成功',
+        'data': {**history, 'title': item.title}
+    })
+    # 价格每个监控周期才会变化一次，允许浏览器短时间复用
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response, 200
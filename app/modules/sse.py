@@ -0,0 +1,17 @@
+import json
+
+from flask import current_app
+
+
+def sse(event: str, data) -> str:
+    """格式化一条 SSE 事件，data 序列化为 JSON（保留中文）"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(stream):
+    """把生成器包装成 text/event-stream 响应"""
+    response = current_app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 等反向代理的响应缓冲，事件才能立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,8 @@
+from flask import Blueprint
+
+# 创建一个名为 'system' 的蓝图，用于暴露运行状态和内部组件的统计数据
+# url_prefix='/api/system' 意味着这个蓝图下的所有路由都以 /api/system 开头
+system_bp = Blueprint('system', __name__, url_prefix='/api/system')
+
+# 导入 views 文件，将路由注册到蓝图上
+from . import views
@@ -0,0 +1,52 @@
+import hmac
+from functools import wraps
+
+from flask import jsonify, request, current_app
+from app.modules.system import system_bp
+from app.services.mail_transport import mail_transport
+from app.services.outbox_service import outbox_service
+from app.services.event_bus import event_bus
+from app.services.battle_service import battle_service, battle_result_cache
+from app.services.moonshot_client import moonshot_client
+from app.services.llm_cache import llm_cache
+from app.services.analysis_job_service import analysis_job_service
+
+
+def ops_token_required(f):
+    """检查请求头 X-Ops-Token 是否与配置的 OPS_TOKEN 一致；未配置 OPS_TOKEN 时拒绝所有请求"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        expected = current_app.config.get('OPS_TOKEN')
+        if not expected:
+            return jsonify({'message': '未配置 OPS_TOKEN，运维接口已关闭'}), 403
+        if not hmac.compare_digest(request.headers.get('X-Ops-Token', ''), expected):
+            return jsonify({'message': '未授权，运维令牌无效'}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+# --------------------
+# 路由：获取内部组件的运行统计
+# GET /api/system/stats（需要请求头 X-Ops-Token）
+# --------------------
+@system_bp.route('/stats', methods=['GET'])
+@ops_token_required
+def get_system_stats():
+    """
+    返回各内部组件的统计数据，便于观察发送速率、延迟等指标。
+    """
+    return jsonify({
+        'message': '获取成功',
+        'data': {
+            'mail': mail_transport.stats(),
+            'outbox': outbox_service.stats(),
+            'events': event_bus.stats(),
+            'battle_result_cache': battle_result_cache.stats(),
+            'battle_player_cache': battle_service.player_cache.stats(),
+            'moonshot': moonshot_client.stats(),
+            'llm_cache': llm_cache.stats(),
+            'analysis_jobs': analysis_job_service.stats()
+        }
+    }), 200
@@ -1,6 +1,12 @@
-from flask import request, jsonify, session
+import csv
+import io
+import json
+
+from flask import request, jsonify, session, current_app
 from app.modules.wishlist import wishlist_bp
 from app.services.wishlist_service import WishlistService
+from app.services.event_bus import event_bus
+from app.modules.sse import sse_response
 from app.modules.user.views import login_required  # 导入我们之前写的登录验证装饰器
 
 
@@ -11,10 +17,45 @@ from app.modules.user.views import login_required  # 导入我们之前写的登
 @login_required
 def get_all_wishes():
     user_id = session.get('user_id')
-    wishes = WishlistService.get_wishes_by_user(user_id)
+    etag, wishes = WishlistService.get_wishlist_snapshot(user_id)
+
+    # 客户端持有的版本未变化时直接返回 304，不再序列化和传输列表
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify({
+            'message': '心愿单列表获取成功',
+            'data': wishes
+        })
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# --------------------
+# 路由：增量同步
+# GET /api/wishlist/changes?since=<cursor>
+# --------------------
+@wishlist_bp.route('/changes', methods=['GET'])
+@login_required
+def get_wish_changes():
+    """
+    返回游标之后变化过的心愿（完整行）和已删除的心愿 ID，以及新的游标。
+    不带 since 或游标已过期时返回完整心愿单（reset=true），客户端应以其替换本地数据。
+    """
+    user_id = session.get('user_id')
+
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({'message': 'since 必须是整数游标'}), 400
+
     return jsonify({
-        'message': '心愿单列表获取成功',
-        'data': wishes
+        'message': '获取成功',
+        'data': WishlistService.get_changes(user_id, since)
     }), 200
 
 
@@ -49,14 +90,157 @@ def add_wish():
         target_value=target_value)
 
     if new_wish:
-        return jsonify({'message': msg, 'wish_id': new_wish.id}), 201
+        # 商品信息仍在后台补全时返回 202，前端可轮询 /<wish_id>/status 获取最终结果
+        enrich_status = new_wish.item.enrich_status
+        status_code = 201 if enrich_status == 'ready' else 202
+        return jsonify({'message': msg, 'wish_id': new_wish.id, 'enrich_status': enrich_status}), status_code
     else:
         # msg 包含了失败原因
         return jsonify({'message': msg}), 400
 
-    # --------------------
+
+# --------------------
+# 路由：批量导入心愿单
+# --------------------
+@wishlist_bp.route('/import', methods=['POST'])
+@login_required
+def import_wishes():
+    """
+    批量导入心愿，支持三种输入：
+    1. JSON: {"items": [{"url": ..., "target_price": ...}, ...]}
+    2. JSON: {"urls": [...], "target_price": 统一的期望价格}
+    3. 上传文件 (字段名 file)：CSV（表头 url,target_price[,condition_type,target_value]）或同结构的 JSON
+    """
+    try:
+        entries = _parse_import_entries()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not entries:
+        return jsonify({'message': '导入列表为空'}), 400
+
+    max_entries = current_app.config.get('BULK_IMPORT_MAX_ENTRIES', 1000)
+    if len(entries) > max_entries:
+        return jsonify({'message': f'单次最多导入 {max_entries} 条'}), 400
+
+    user_id = session.get('user_id')
+    report = WishlistService.bulk_add_wishes(user_id, entries)
+
+    return jsonify({
+        'message': f"导入完成：新增 {report['created']} 条，已存在 {report['exists']} 条，"
+                   f"重复 {report['duplicate']} 条，无效 {report['invalid']} 条，失败 {report['failed']} 条",
+        'data': report
+    }), 200
+
+
+def _parse_import_entries() -> list:
+    """把请求体或上传文件解析成统一的条目列表"""
+    upload = request.files.get('file')
+    if upload:
+        raw = upload.read().decode('utf-8-sig', errors='ignore')
+        if upload.filename and upload.filename.lower().endswith('.json'):
+            try:
+                payload = json.loads(raw)
+            except json.JSONDecodeError:
+                raise ValueError('JSON 文件格式不正确')
+        else:
+            reader = csv.DictReader(io.StringIO(raw))
+            if not reader.fieldnames or 'url' not in reader.fieldnames:
+                raise ValueError('CSV 文件缺少 url 列')
+            return [dict(row) for row in reader]
+    else:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            raise ValueError('请求体不能为空')
+
+    # 支持直接上传条目数组
+    if isinstance(payload, list):
+        payload = {'items': payload}
+    if not isinstance(payload, dict):
+        raise ValueError('导入数据格式不正确')
+
+    default_price = payload.get('target_price')
+    if 'items' in payload:
+        entries = []
+        for entry in payload.get('items') or []:
+            if isinstance(entry, str):
+                entry = {'url': entry}
+            if not isinstance(entry, dict):
+                raise ValueError('导入条目格式不正确')
+            entries.append({'target_price': default_price, **entry})
+        return entries
+
+    return [{'url': url, 'target_price': default_price} for url in payload.get('urls') or []]
+
+
+# --------------------
+# 路由：查询单个心愿的商品信息补全状态
+# --------------------
+@wishlist_bp.route('/<int:wish_id>/status', methods=['GET'])
+@login_required
+def get_wish_status(wish_id):
+    user_id = session.get('user_id')
+
+    status = WishlistService.get_wish_status(user_id, wish_id)
+    if not status:
+        return jsonify({'message': '心愿单项目不存在或不属于该用户'}), 404
+
+    return jsonify({
+        'message': '获取成功',
+        'data': status
+    }), 200
 
 
+# --------------------
+# 路由：订阅当前用户的实时事件（Server-Sent Events）
+# GET /api/wishlist/stream
+# --------------------
+@wishlist_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    """
+    推送当前用户心愿的价格变化 (price)、解锁 (unlock) 和商品信息补全 (item_ready) 事件。
+    断线重连时浏览器会自动带上 Last-Event-ID，也可以用 ?cursor= 显式指定；
+    收到 reset 事件时说明错过的事件已无法补发，客户端应重新拉取 /api/wishlist/。
+    """
+    user_id = session.get('user_id')
+    heartbeat = float(current_app.config.get('SSE_HEARTBEAT_SECONDS') or 15)
+
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    try:
+        cursor = int(cursor)
+    except (TypeError, ValueError):
+        # 首次连接只接收之后的新事件
+        cursor = event_bus.last_id
+
+    def generate():
+        nonlocal cursor
+        event_bus.subscribe(user_id)
+        try:
+            yield f"retry: 5000\nid: {cursor}\n\n"
+            while True:
+                events, reset = event_bus.wait(user_id, cursor, heartbeat)
+                if reset:
+                    # 客户端会重新拉取完整列表，之前的事件不再补发
+                    cursor = event_bus.last_id
+                    yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+                    continue
+
+                if not events:
+                    # 心跳：保持连接并让代理 / 客户端尽快发现断线
+                    yield ": ping\n\n"
+                    continue
+
+                for seq, event, data in events:
+                    cursor = seq
+                    yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            event_bus.unsubscribe(user_id)
+
+    return sse_response(generate())
+
+
+# --------------------
 # 路由：删除心愿单项目
 # --------------------
 @wishlist_bp.route('/<int:wish_id>', methods=['DELETE'])
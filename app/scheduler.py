@@ -55,6 +55,62 @@ def init_scheduler(app: Flask):
         replace_existing=True
     )
 
+    # 通知投递任务：从发件箱中领取到期通知并发送，价格监控和请求线程都不再直接等待 SMTP
+    from app.services.outbox_service import run_outbox_delivery
+
+    scheduler.add_job(
+        func=run_outbox_delivery,
+        trigger='interval',
+        seconds=app.config.get('OUTBOX_POLL_SECONDS', 10),
+        id='notification_outbox_delivery',
+        max_instances=1,
+        coalesce=True,
+        kwargs={'config_name': config_name},
+        replace_existing=True
+    )
+
+    # 心愿变更日志压缩：每天清理一次超过保留期的旧日志
+    from app.services.change_log_service import run_change_log_compaction
+
+    scheduler.add_job(
+        func=run_change_log_compaction,
+        trigger='interval',
+        hours=24,
+        id='wish_change_log_compaction',
+        max_instances=1,
+        coalesce=True,
+        kwargs={'config_name': config_name},
+        replace_existing=True
+    )
+
+    # 对战统计写入任务：把内存缓冲区中的对战记录批量写入数据库并更新汇总表
+    from app.services.battle_stats_service import run_battle_stats_flush
+
+    scheduler.add_job(
+        func=run_battle_stats_flush,
+        trigger='interval',
+        seconds=app.config.get('BATTLE_STATS_FLUSH_SECONDS', 10),
+        id='battle_stats_flush',
+        max_instances=1,
+        coalesce=True,
+        kwargs={'config_name': config_name},
+        replace_existing=True
+    )
+
+    # AI 分析任务恢复：重新提交排队中的任务和执行超时（进程崩溃）的任务
+    from app.services.analysis_job_service import run_analysis_job_recovery
+
+    scheduler.add_job(
+        func=run_analysis_job_recovery,
+        trigger='interval',
+        minutes=1,
+        id='analysis_job_recovery',
+        max_instances=1,
+        coalesce=True,
+        kwargs={'config_name': config_name},
+        replace_existing=True
+    )
+
 
 def create_scheduler_tables(app: Flask):
     """
@@ -0,0 +1,37 @@
+from sqlalchemy import inspect, text
+
+from app.database import db
+
+# db.create_all() 只创建缺失的表，不会修改已有的表。
+# 已有部署升级时，给已存在的表补上后来新增的列和索引：(表名, 列名, 列定义)、(表名, 索引名, 索引列)
+ADDED_COLUMNS = (
+    ('items', 'enrich_status', "VARCHAR(20) NOT NULL DEFAULT 'ready'"),
+    ('analysis_jobs', 'heartbeat_at', "DATETIME"),
+)
+ADDED_INDEXES = (
+    ('items', 'ix_items_enrich_status', ('enrich_status',)),
+    ('price_history', 'ix_price_history_item_timestamp', ('item_id', 'timestamp')),
+)
+
+
+def upgrade_schema() -> list:
+    """
+    创建缺失的表，并为已有的表补齐新增的列和索引；已经存在的跳过，可重复执行。
+    必须在 app_context 中调用。返回本次执行的变更说明列表。
+    """
+    db.create_all()
+
+    applied = []
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, column, definition in ADDED_COLUMNS:
+            if column not in {c['name'] for c in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                applied.append(f"{table}.{column}")
+
+        for table, name, columns in ADDED_INDEXES:
+            if name not in {i['name'] for i in inspector.get_indexes(table)}:
+                conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+                applied.append(f"{table}: {name}")
+
+    return applied
@@ -0,0 +1,311 @@
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.database import db
+from app.ai_models import AnalysisJob, GitHubAnalysis
+from app.services.github_service import github_service
+from app.services.llm_analysis import llm_service
+from app.services.prompt_builder import readme_extract
+
+# 分析报告的有效期：期间内重复请求直接返回已有报告
+ANALYSIS_CACHE_HOURS = 24
+# 单个任务最多尝试的次数（进程在执行中崩溃也算一次），超过后标记为失败
+MAX_ATTEMPTS = 3
+# 执行中的任务每隔这么久刷新一次心跳（秒）
+HEARTBEAT_SECONDS = 30
+# 执行中的任务超过该时间没有刷新心跳，视为执行它的进程已崩溃。
+# 任务在大模型调度器中排队、多次重试期间心跳照常刷新，因此不需要按最长执行时间估算
+STALE_HEARTBEAT_SECONDS = 180
+
+
+def get_recent_analysis(username: str):
+    """有效期内的分析报告，返回 (报告, 头像 URL)；没有时返回 None"""
+    cached = GitHubAnalysis.query.filter_by(github_username=username).order_by(GitHubAnalysis.timestamp.desc()).first()
+
+    if cached and cached.timestamp > datetime.utcnow() - timedelta(hours=ANALYSIS_CACHE_HOURS):
+        try:
+            return json.loads(cached.analysis_json), cached.avatar_url
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def collect_analysis_inputs(username: str):
+    """
+    获取 GitHub 数据并整理成 AI 输入。
+    成功返回 (profile, detailed_repos, simple_repos_data)；失败返回 (None, 错误信息, HTTP 状态码)
+    """
+    profile = github_service.fetch_user_profile(username)
+    if not profile:
+        return None, f'GitHub 用户 {username} 不存在或 API 受限', 404
+
+    repos = github_service.fetch_user_repos(username)
+    if not repos:
+        return None, '该用户没有公开仓库，无法分析', 400
+
+    sorted_repos = sorted(repos, key=lambda r: (r.get('stars', 0), r.get('updated_at', '')), reverse=True)
+    simple_repos_data = []
+    for r in sorted_repos:
+        simple_repos_data.append({
+            'name': r.get('name'),
+            'description': r.get('description'),
+            'updated_at': r.get('updated_at'),
+            'language': r.get('language'),
+            'stars': r.get('stars')
+        })
+
+    top_repos = sorted_repos[:5]
+    detailed_repos = []
+
+    for repo in top_repos:
+        repo_name = repo['name']
+        langs = github_service.fetch_repo_languages(username, repo_name)
+        # 清洗后的 README（去掉徽章、HTML、代码块），长度由提示词预算统一控制
+        readme_content = readme_extract(*github_service.fetch_repo_readme_blob(username, repo_name))
+        detailed_repos.append({
+            'name': repo_name,
+            'description': repo['description'],
+            'stars': repo['stars'],
+            'updated_at': repo['updated_at'],
+            'language': repo['language'],
+            'languages_stats': langs,
+            'readme': readme_content
+        })
+
+    return profile, detailed_repos, simple_repos_data
+
+
+def save_analysis(username: str, profile: dict, ai_result: dict):
+    """保存分析报告，返回记录 ID；保存失败时返回 None"""
+    try:
+        analysis_json_str = json.dumps(ai_result, ensure_ascii=False)
+        new_record = GitHubAnalysis(
+            github_username=username, avatar_url=profile.get('avatar_url'), analysis_json=analysis_json_str
+        )
+        db.session.add(new_record)
+        db.session.commit()
+        return new_record.id
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error saving AI analysis to DB: {e}")
+        return None
+
+
+class AnalysisJobService:
+    """
+    GitHub 用户 AI 分析任务队列：
+    - 入队：同一用户已有排队中 / 执行中的任务时直接返回该任务，不重复分析
+    - 执行：固定大小的线程池，限制同时进行的分析数量，Web 工作线程不再等待 GitHub 和大模型
+    - 心跳：执行期间由单独的线程定期刷新 heartbeat_at
+    - 恢复：resume 重新提交数据库中排队中的任务，以及执行中但心跳已中断（进程崩溃）的任务
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-analysis')
+        self._lock = threading.Lock()
+        # 本进程中已提交到线程池的任务：小写用户名 -> 任务 ID
+        self._inflight = {}
+
+    def enqueue(self, username: str, app=None):
+        """
+        为该用户创建（或复用）分析任务，返回 AnalysisJob；队列已满时返回 None。
+        必须在 app_context 中调用，或显式传入 app 实例。
+        """
+        app = app or current_app._get_current_object()
+        key = username.lower()
+
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                job = db.session.get(AnalysisJob, job_id)
+                if job is not None:
+                    return job
+
+            # 其他进程创建的、尚未完成的任务
+            job = AnalysisJob.query.filter(
+                AnalysisJob.github_username == username,
+                AnalysisJob.status.in_(('queued', 'running'))
+            ).order_by(AnalysisJob.created_at.desc()).first()
+            if job is not None:
+                return job
+
+            if len(self._inflight) >= self.max_pending:
+                return None
+
+            job = AnalysisJob(id=str(uuid.uuid4()), github_username=username, status='queued', attempts=0)
+            db.session.add(job)
+            db.session.commit()
+            self._submit_locked(app, job.id, key)
+            return job
+
+    def _submit_locked(self, app, job_id: str, key: str):
+        self._inflight[key] = job_id
+        future = self._executor.submit(self._run, app, job_id)
+        future.add_done_callback(lambda _: self._forget(key, job_id))
+
+    def _forget(self, key: str, job_id: str):
+        with self._lock:
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+
+    def resume(self, app) -> int:
+        """重新提交未完成的任务，返回提交的任务数。进程启动时和定时任务中调用"""
+        with app.app_context():
+            stale_before = datetime.utcnow() - timedelta(seconds=STALE_HEARTBEAT_SECONDS)
+            AnalysisJob.query.filter(
+                AnalysisJob.status == 'running',
+                db.func.coalesce(AnalysisJob.heartbeat_at, AnalysisJob.started_at) < stale_before
+            ).update({'status': 'queued'}, synchronize_session=False)
+            db.session.commit()
+
+            jobs = db.session.query(AnalysisJob.id, AnalysisJob.github_username).filter(
+                AnalysisJob.status == 'queued'
+            ).order_by(AnalysisJob.created_at.asc()).all()
+
+            submitted = 0
+            with self._lock:
+                for job_id, username in jobs:
+                    key = username.lower()
+                    if key in self._inflight or job_id in self._inflight.values():
+                        continue
+                    self._submit_locked(app, job_id, key)
+                    submitted += 1
+            return submitted
+
+    def _run(self, app, job_id: str):
+        # 后台线程没有请求上下文，需要手动推入 app_context 才能访问数据库
+        with app.app_context():
+            # 带 status 条件的 UPDATE 领取任务：多个进程同时恢复同一任务时只有一个能领取成功
+            claimed = AnalysisJob.query.filter(
+                AnalysisJob.id == job_id,
+                AnalysisJob.status == 'queued'
+            ).update({
+                'status': 'running',
+                'started_at': datetime.utcnow(),
+                'heartbeat_at': datetime.utcnow(),
+                'attempts': AnalysisJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                return
+
+            stop_heartbeat = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(app, job_id, stop_heartbeat),
+                             name=f'ai-analysis-heartbeat-{job_id[:8]}', daemon=True).start()
+
+            job = db.session.get(AnalysisJob, job_id)
+            username = job.github_username
+            try:
+                if job.attempts > MAX_ATTEMPTS:
+                    self._finish(job, error='多次执行均未完成，已放弃', error_code=500)
+                    return
+
+                # 排队期间可能已经有其他请求完成了分析
+                recent = GitHubAnalysis.query.filter(
+                    GitHubAnalysis.github_username == username,
+                    GitHubAnalysis.timestamp > datetime.utcnow() - timedelta(hours=ANALYSIS_CACHE_HOURS)
+                ).order_by(GitHubAnalysis.timestamp.desc()).first()
+                if recent is not None:
+                    self._finish(job, analysis_id=recent.id)
+                    return
+
+                inputs = collect_analysis_inputs(username)
+                if inputs[0] is None:
+                    self._finish(job, error=inputs[1], error_code=inputs[2])
+                    return
+                profile, detailed_repos, simple_repos_data = inputs
+
+                print(f"--- [AI Job] 开始分析 {username} ({job_id}) ---")
+                ai_result = llm_service.analyze_github_user(username, profile, detailed_repos, simple_repos_data)
+                if "error" in ai_result:
+                    self._finish(job, error=ai_result['error'], error_code=500)
+                    return
+
+                analysis_id = save_analysis(username, profile, ai_result)
+                if analysis_id is None:
+                    self._finish(job, error='保存分析报告失败', error_code=500)
+                    return
+                self._finish(job, analysis_id=analysis_id)
+                print(f"--- [AI Job] ✅ {username} 分析完成 ({job_id}) ---")
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ [AI Job] 分析任务 {job_id} 执行失败: {e}")
+                try:
+                    self._finish(db.session.get(AnalysisJob, job_id), error=str(e), error_code=500)
+                except Exception:
+                    db.session.rollback()
+            finally:
+                stop_heartbeat.set()
+
+    @staticmethod
+    def _heartbeat(app, job_id: str, stop: threading.Event):
+        """任务执行期间定期刷新 heartbeat_at，直到 stop 被设置；使用独立的 app_context（即独立的数据库会话）"""
+        with app.app_context():
+            while not stop.wait(HEARTBEAT_SECONDS):
+                try:
+                    AnalysisJob.query.filter(
+                        AnalysisJob.id == job_id,
+                        AnalysisJob.status == 'running'
+                    ).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ [AI Job] 刷新任务 {job_id} 心跳失败: {e}")
+
+    @staticmethod
+    def _finish(job: AnalysisJob, analysis_id: int = None, error: str = None, error_code: int = None):
+        job.status = 'failed' if error else 'succeeded'
+        job.analysis_id = analysis_id
+        job.error = (error or '')[:512] or None
+        job.error_code = error_code
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def stats(self) -> dict:
+        """本进程的任务数和数据库中各状态的任务数"""
+        with self._lock:
+            inflight = len(self._inflight)
+        rows = db.session.query(AnalysisJob.status, db.func.count(AnalysisJob.id)).group_by(AnalysisJob.status).all()
+        return {
+            'workers': self.max_workers,
+            'inflight': inflight,
+            'max_pending': self.max_pending,
+            'jobs': {status: count for status, count in rows}
+        }
+
+
+# 实例化任务队列
+analysis_job_service = AnalysisJobService(
+    max_workers=int(os.environ.get('ANALYSIS_WORKERS') or 2),
+    max_pending=int(os.environ.get('ANALYSIS_MAX_PENDING') or 100)
+)
+
+# 后台任务使用的 App 实例缓存，避免每次运行都重新创建
+_apps = {}
+
+
+def run_analysis_job_recovery(config_name: str):
+    """
+    分析任务恢复。由 APScheduler 定期调用，重新提交排队中和执行超时的任务。
+    """
+    from app import create_app
+
+    app = _apps.get(config_name)
+    if app is None:
+        app = _apps[config_name] = create_app(config_name)
+
+    try:
+        submitted = analysis_job_service.resume(app)
+        if submitted:
+            print(f"--- 🔁 已重新提交 {submitted} 个 AI 分析任务 ---")
+    except Exception as e:
+        print(f"❌ AI 分析任务恢复失败: {e}")
@@ -25,6 +25,24 @@ class BasePlatformService(ABC):
         """
         raise NotImplementedError
 
+    def canonicalize_url(self, url: str) -> str:
+        """
+        将商品 URL 规范化，去掉追踪参数、语言路径等无关部分。
+        默认只去除首尾空白，具体平台可覆盖此方法。
+        """
+        return url.strip()
+
+    def fetch_prices_batch(self, item_ids: list) -> dict:
+        """
+        批量获取多个商品的当前价格，返回 {item_id: price}，价格为负表示获取失败。
+        默认逐个调用 fetch_item_details，支持批量接口的平台应覆盖此方法。
+        """
+        prices = {}
+        for item_id in item_ids:
+            data = self.fetch_item_details(item_id, None)
+            prices[item_id] = data.get('current_price', -1)
+        return prices
+
     def get_standard_item_data(self, item_id: str, url: str) -> dict:
         """
         调用 fetch_item_details，并返回最终标准化的数据结构。
@@ -1,26 +1,137 @@
 # app/services/battle_service.py
 
+import copy
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+
 from app.models import User
+from app.services.cache_service import SWRCache
 from app.services.github_service import github_service
 
+# 每名选手需要的三项 GitHub 数据，彼此独立，可以并发获取
+GITHUB_CALLS = (
+    ('profile', github_service.fetch_user_profile),
+    ('stars', github_service.get_total_stars),
+    ('commits', github_service.get_user_weekly_commit_count),
+)
+
+
+def _timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
 class BattleService:
     """
     对战服务：负责聚合 GitHub 数据和本地数据库数据，
     为 AI 分析和前端雷达图提供标准的'战斗力'数据。
     """
 
-    @staticmethod
-    def get_player_data(username: str) -> dict:
+    def __init__(self, max_workers: int = 12, player_ttl: float = 120, player_stale_ttl: float = 600):
+        # GitHub 请求只做网络 I/O，不访问数据库，可以放心放到线程池中执行
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='battle-fetch')
+        # 选手数据缓存（按小写用户名），过期后先返回旧数据再后台刷新
+        self.player_cache = SWRCache(maxsize=2048, ttl=player_ttl, stale_ttl=player_stale_ttl)
+
+    def get_player_data(self, username: str) -> dict:
         """
         获取单个选手的完整战斗数据 (GitHub + 本地心愿单)
         参数:
             username: 前端传入的 GitHub 用户名
+        获取失败时抛出异常
+        """
+        results, _ = self.get_players_data([username])
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+
+    def get_players_data(self, usernames: list, timeout: float = None, refresh: bool = False) -> tuple:
         """
-        
-        # === 1. 获取 GitHub 维度数据 ===
-        # 调用现有的 github_service 获取基础信息
-        profile = github_service.fetch_user_profile(username)
-        
+        并发获取多名选手的数据：所有选手的所有 GitHub 请求同时发出，共用一个截止时间。
+        返回 (results, timings)：
+        - results[i] 为第 i 名选手的数据字典；个人资料请求失败或超时时为异常对象
+        - timings 为每个请求的耗时（秒），键为 "用户名.请求名"；命中缓存的选手没有记录
+        Star 数和周提交数超时时按 0 处理（与它们自身出错时的行为一致）。
+        refresh=True 时跳过缓存直接请求 GitHub。
+        必须在 app_context 中调用（本地数据库查询在调用线程中完成）。
+        """
+        cached = {}
+        if not refresh:
+            for username in usernames:
+                value, stale = self.player_cache.get(username.lower())
+                if value is None:
+                    continue
+                # 调用方会在返回的字典上追加字段，这里交出副本
+                cached[username] = copy.deepcopy(value)
+                if stale:
+                    app = current_app._get_current_object()
+                    self.player_cache.revalidate(username.lower(), lambda u=username: self._reload_player(app, u))
+
+        missing = [username for username in usernames if username not in cached]
+        fetched, timings = self._fetch_players(missing, timeout) if missing else ({}, {})
+        return [cached.get(username) or fetched[username] for username in usernames], timings
+
+    def _reload_player(self, app, username: str):
+        """后台刷新单个选手的缓存数据，失败时返回 None 保留旧数据"""
+        with app.app_context():
+            fetched, _ = self._fetch_players([username])
+            result = fetched[username]
+            return None if isinstance(result, Exception) else result
+
+    def _fetch_players(self, usernames: list, timeout: float = None) -> tuple:
+        """并发请求 GitHub 并整合本地数据，成功找到的选手写入缓存。返回 ({username: 数据或异常}, timings)"""
+        if timeout is None:
+            timeout = float(current_app.config.get('BATTLE_FETCH_TIMEOUT') or 30)
+        deadline = time.time() + timeout
+
+        futures = {}
+        for username in usernames:
+            for name, func in GITHUB_CALLS:
+                futures[(username, name)] = self._executor.submit(_timed, func, username)
+
+        wait(futures.values(), timeout=max(0, deadline - time.time()))
+
+        values, timings = {}, {}
+        for (username, name), future in futures.items():
+            key = f"{username}.{name}"
+            if not future.done():
+                future.cancel()
+                values[(username, name)] = TimeoutError(f"获取 {key} 超时")
+                print(f"[Warning] {key} 在 {timeout}s 内未返回")
+                continue
+            try:
+                values[(username, name)], timings[key] = future.result()
+            except Exception as e:
+                values[(username, name)] = e
+                print(f"[Warning] {key} 获取失败: {e}")
+
+        results = {}
+        for username in usernames:
+            profile = values[(username, 'profile')]
+            if isinstance(profile, Exception):
+                results[username] = profile
+                continue
+
+            stars = values[(username, 'stars')]
+            commits = values[(username, 'commits')]
+            player = self._build_player_data(
+                username,
+                profile,
+                0 if isinstance(stars, Exception) else stars,
+                0 if isinstance(commits, Exception) else commits
+            )
+            if player['found']:
+                self.player_cache.set(username.lower(), copy.deepcopy(player))
+            results[username] = player
+        return results, timings
+
+    @staticmethod
+    def _build_player_data(username: str, profile: dict, total_stars: int, weekly_commits: int) -> dict:
+        """把 GitHub 数据与本地数据库数据整合成选手数据"""
         # 如果 GitHub 上查无此人，直接返回错误标记
         # 注意：这里我们认为如果是无效的 GitHub 用户，连对战资格都没有
         if not profile:
@@ -32,13 +143,6 @@ class BattleService:
                 "internal_data": {}
             }
 
-        # 获取更详细的 GitHub 战力指标
-        # 获取 Star 总数
-        total_stars = github_service.get_total_stars(username)
-        
-        # 获取最近一周的提交数 (活跃度指标)
-        weekly_commits = github_service.get_user_weekly_commit_count(username)
-
         github_stats = {
             "repos": profile.get('public_repos', 0),
             "followers": profile.get('followers', 0),
@@ -101,4 +205,19 @@ class BattleService:
         }
 
 # 实例化服务
-battle_service = BattleService()
\ No newline at end of file
+battle_service = BattleService(
+    max_workers=int(os.environ.get('BATTLE_FETCH_WORKERS') or 12),
+    player_ttl=float(os.environ.get('BATTLE_PLAYER_CACHE_TTL') or 120),
+    player_stale_ttl=float(os.environ.get('BATTLE_PLAYER_STALE_TTL') or 600)
+)
+
+# 对战结果缓存：键为规范化（小写、排序）后的选手对，同一对选手无论谁是红方都命中同一条
+battle_result_cache = SWRCache(
+    maxsize=1024,
+    ttl=float(os.environ.get('BATTLE_RESULT_CACHE_TTL') or 600),
+    stale_ttl=float(os.environ.get('BATTLE_RESULT_STALE_TTL') or 3600)
+)
+
+
+def battle_cache_key(player1: str, player2: str) -> tuple:
+    return tuple(sorted((player1.lower(), player2.lower())))
\ No newline at end of file
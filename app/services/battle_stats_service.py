@@ -0,0 +1,195 @@
+import threading
+from collections import Counter
+from datetime import datetime
+
+from app.database import db
+from app.battle_models import BattleLog, BattlePlayerStats, BattleRankStats, BattleCounter
+from app.services.leaderboard_service import leaderboard_service
+
+# 缓冲区上限：数据库长时间不可用时丢弃最旧的记录，避免内存无限增长
+MAX_BUFFERED = 50000
+# 热门选手榜单长度
+TOP_N = 10
+
+
+class BattleStatsService:
+    """
+    对战统计服务（write-behind）：
+    - 请求线程只把对战结果追加到内存缓冲区，不访问数据库
+    - 定时任务把缓冲区批量写入 battle_log，并把增量累加到汇总表
+    - /api/battle/stats 只读取汇总表（带索引的 TOP N 查询），与对战总数无关
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def record(self, player1: dict, player2: dict, cached: bool = False):
+        """记录一次对战；player1 / player2 为增强后的选手数据（含 power_score 和 rank）"""
+        p1_name = (player1.get('username') or '').lower()
+        p2_name = (player2.get('username') or '').lower()
+        p1_score = int(player1.get('power_score', 0))
+        p2_score = int(player2.get('power_score', 0))
+
+        if p1_score == p2_score:
+            winner = None
+        else:
+            winner = p1_name if p1_score > p2_score else p2_name
+
+        entry = {
+            'player1': p1_name,
+            'player2': p2_name,
+            'player1_score': p1_score,
+            'player2_score': p2_score,
+            'player1_rank': player1.get('rank'),
+            'player2_rank': player2.get('rank'),
+            'winner': winner,
+            'cached': cached,
+            'created_at': datetime.utcnow()
+        }
+
+        with self._lock:
+            self._buffer.append(entry)
+            if len(self._buffer) > MAX_BUFFERED:
+                del self._buffer[0]
+                self._dropped += 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """
+        把缓冲区写入数据库，返回写入的对战数。必须在 app_context 中调用。
+        写入失败时记录会放回缓冲区，下次再试。
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if not entries:
+            return 0
+
+        try:
+            db.session.bulk_insert_mappings(BattleLog, entries)
+            self._apply_rollups(entries)
+            db.session.commit()
+            return len(entries)
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                self._buffer = entries + self._buffer
+            print(f"❌ 对战统计写入失败，{len(entries)} 条记录将在下次重试: {e}")
+            return 0
+
+    @staticmethod
+    def _apply_rollups(entries: list):
+        """
+        在内存中先合并增量，每个选手 / 等级只执行一条 UPDATE（或 INSERT）。
+        其他进程并发插入同一主键时整批提交失败，记录放回缓冲区，下次写入时走 UPDATE 分支。
+        """
+        players = {}
+        ranks = Counter()
+
+        for entry in entries:
+            for side in ('player1', 'player2'):
+                name = entry[side]
+                delta = players.setdefault(name, {
+                    'battles': 0, 'wins': 0, 'losses': 0, 'draws': 0, 'challenged': 0,
+                    'last_rank': None, 'last_power_score': None
+                })
+                delta['battles'] += 1
+                if entry['winner'] is None:
+                    delta['draws'] += 1
+                elif entry['winner'] == name:
+                    delta['wins'] += 1
+                else:
+                    delta['losses'] += 1
+                if side == 'player2':
+                    delta['challenged'] += 1
+                delta['last_rank'] = entry[f'{side}_rank']
+                delta['last_power_score'] = entry[f'{side}_score']
+                ranks[entry[f'{side}_rank']] += 1
+
+        now = datetime.utcnow()
+        for name, delta in players.items():
+            updated = BattlePlayerStats.query.filter_by(username=name).update({
+                'battles': BattlePlayerStats.battles + delta['battles'],
+                'wins': BattlePlayerStats.wins + delta['wins'],
+                'losses': BattlePlayerStats.losses + delta['losses'],
+                'draws': BattlePlayerStats.draws + delta['draws'],
+                'challenged': BattlePlayerStats.challenged + delta['challenged'],
+                'last_rank': delta['last_rank'],
+                'last_power_score': delta['last_power_score'],
+                'updated_at': now
+            }, synchronize_session=False)
+            if not updated:
+                db.session.add(BattlePlayerStats(username=name, updated_at=now, **delta))
+
+        for rank, count in ranks.items():
+            if rank is None:
+                continue
+            updated = BattleRankStats.query.filter_by(rank=rank).update({
+                'appearances': BattleRankStats.appearances + count
+            }, synchronize_session=False)
+            if not updated:
+                db.session.add(BattleRankStats(rank=rank, appearances=count))
+
+        updated = BattleCounter.query.filter_by(name='total_battles').update({
+            'value': BattleCounter.value + len(entries)
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(BattleCounter(name='total_battles', value=len(entries)))
+
+    def get_stats(self) -> dict:
+        """读取汇总表；每项都是带索引的 LIMIT 查询或固定行数的小表"""
+        total = db.session.get(BattleCounter, 'total_battles')
+
+        most_challenged = BattlePlayerStats.query.filter(BattlePlayerStats.challenged > 0).order_by(
+            BattlePlayerStats.challenged.desc()
+        ).limit(TOP_N).all()
+        top_winners = BattlePlayerStats.query.filter(BattlePlayerStats.wins > 0).order_by(
+            BattlePlayerStats.wins.desc()
+        ).limit(TOP_N).all()
+        rank_rows = BattleRankStats.query.all()
+
+        return {
+            'total_battles': total.value if total else 0,
+            'most_challenged': [row.to_dict() for row in most_challenged],
+            'top_winners': [row.to_dict() for row in top_winners],
+            'rank_distribution': {row.rank: row.appearances for row in rank_rows},
+            'pending': self.pending()
+        }
+
+
+# 实例化服务
+battle_stats_service = BattleStatsService()
+
+# 后台任务使用的 App 实例缓存，避免每次运行都重新创建
+_apps = {}
+
+
+def run_battle_stats_flush(config_name: str):
+    """
+    对战统计写入任务。由 APScheduler 按 BATTLE_STATS_FLUSH_SECONDS 间隔调用。
+    同时把排行榜中待写入的选手战力写入 player_power_scores，并按需重新加载排行榜索引。
+    """
+    from app import create_app
+
+    app = _apps.get(config_name)
+    if app is None:
+        app = _apps[config_name] = create_app(config_name)
+
+    with app.app_context():
+        written = battle_stats_service.flush()
+        if written:
+            print(f"--- 📊 对战统计已写入 {written} 条 ---")
+
+        scores = leaderboard_service.flush()
+        if scores:
+            print(f"--- 🏆 选手战力已写入 {scores} 条 ---")
+
+        try:
+            leaderboard_service.refresh()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 战力排行榜重新加载失败: {e}")
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TTLCache:
+    """
+    线程安全的进程内缓存：每个条目有过期时间，超过容量时按 LRU 淘汰最久未使用的条目。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SWRCache:
+    """
+    支持 stale-while-revalidate 的缓存：
+    - 写入后 ttl 秒内为新鲜数据，直接返回
+    - 之后 stale_ttl 秒内仍返回旧数据，同时由调用方通过 revalidate 触发一次后台刷新
+    - 同一个 key 同时最多只有一个后台刷新任务
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, stale_ttl: float = 3600, max_workers: int = 2):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swr-refresh')
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+
+    def get(self, key):
+        """返回 (value, is_stale)；未命中时返回 (None, False)"""
+        entry = self._cache.get(key)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None, False
+
+            value, stored_at = entry
+            stale = time.time() - stored_at > self.ttl
+            if stale:
+                self._stale_hits += 1
+            else:
+                self._hits += 1
+            return value, stale
+
+    def set(self, key, value):
+        self._cache.set(key, (value, time.time()))
+
+    def pop(self, key):
+        entry = self._cache.pop(key)
+        return entry[0] if entry else None
+
+    def revalidate(self, key, loader):
+        """
+        在后台调用 loader() 刷新 key；loader 返回 None 表示本次刷新失败，保留旧数据。
+        loader 在线程池中执行，需要数据库时应自行推入 app_context。
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._refreshes += 1
+
+        def run():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value)
+            except Exception as e:
+                print(f"❌ 缓存后台刷新失败 ({key}): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'refreshes': self._refreshes,
+            }
+
+
+class WishlistCache:
+    """
+    按用户缓存序列化后的心愿单，并附带 ETag。
+    同时维护 item_id -> user_id 的反向索引，监控任务记录新价格时只需按商品失效相关用户。
+    为避免“查询期间发生失效，随后又把旧结果写回缓存”，写入前会校验查询开始时拿到的版本令牌。
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._users_by_item = {}
+        self._user_versions = {}
+        # 全局失效序号，以及每个商品最近一次失效时的序号
+        self._seq = 0
+        self._item_changed_at = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compute_etag(data) -> str:
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, user_id: int):
+        """返回 (etag, data)，未命中时返回 None"""
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        etag, data, _ = entry
+        return etag, data
+
+    def begin(self, user_id: int) -> tuple:
+        """在查询数据库之前调用，返回写回缓存时需要的版本令牌"""
+        with self._lock:
+            return self._user_versions.get(user_id, 0), self._seq
+
+    def set(self, user_id: int, data: list, token: tuple = None) -> str:
+        etag = self.compute_etag(data)
+        item_ids = {row['item_id'] for row in data}
+
+        with self._lock:
+            if token is not None:
+                user_version, seq = token
+                if self._user_versions.get(user_id, 0) != user_version:
+                    return etag
+                if any(self._item_changed_at.get(item_id, 0) > seq for item_id in item_ids):
+                    return etag
+
+            self._cache.set(user_id, (etag, data, item_ids))
+            for item_id in item_ids:
+                self._users_by_item.setdefault(item_id, set()).add(user_id)
+
+        return etag
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+            self._drop_locked(user_id)
+
+    def invalidate_item(self, item_id: int):
+        """商品价格或信息变化时，失效所有收藏了该商品的用户缓存"""
+        with self._lock:
+            self._seq += 1
+            self._item_changed_at[item_id] = self._seq
+            for user_id in self._users_by_item.pop(item_id, set()):
+                self._drop_locked(user_id)
+
+    def _drop_locked(self, user_id: int):
+        entry = self._cache.pop(user_id)
+        if entry is None:
+            return
+        for item_id in entry[2]:
+            users = self._users_by_item.get(item_id)
+            if users:
+                users.discard(user_id)
+                if not users:
+                    del self._users_by_item[item_id]
+
+
+# 实例化缓存，在服务层和监控任务中直接导入使用
+wishlist_cache = WishlistCache()
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.database import db
+from app.models import Wish, WishChangeLog
+
+
+class ChangeLogService:
+    """
+    心愿变更日志服务，支撑 /api/wishlist/changes 增量同步。
+    - 写入端：record_* 只把日志加入当前数据库会话，由调用方与变更本身一起 commit
+    - 读取端：get_changes 根据游标找出变化过的心愿 ID 和已删除的心愿 ID
+    - 游标：id 自增，但并发事务的提交顺序不保证与 id 顺序一致（较小的 id 可能晚提交）。
+      返回给客户端的游标只推进到安全延迟之前写入的日志，延迟窗口内的变更会在下次同步时再返回一次
+    - 压缩：compact 删除超过保留期的旧日志，游标早于保留范围的客户端需要全量同步
+    """
+
+    @staticmethod
+    def record_wish(user_id: int, wish_id: int, item_id: int = None, change_type: str = 'upsert'):
+        db.session.add(WishChangeLog(user_id=user_id, wish_id=wish_id, item_id=item_id, change_type=change_type))
+
+    @staticmethod
+    def record_item(item_id: int):
+        """商品价格或信息变化：每个商品只记一条，不按收藏用户展开"""
+        db.session.add(WishChangeLog(item_id=item_id, change_type='item'))
+
+    @staticmethod
+    def head() -> int:
+        """当前最新的游标；没有任何日志时为 0"""
+        return db.session.query(db.func.max(WishChangeLog.id)).scalar() or 0
+
+    @staticmethod
+    def safe_cursor(lag_seconds: int = None) -> int:
+        """
+        可以交给客户端的游标：lag_seconds 秒之前写入的日志都已提交，id 不大于它的日志不会再出现。
+        取最近写入的日志中最小的 id 减一（走 created_at 索引，只扫描延迟窗口内的几行）；窗口内没有日志时等于 head。
+        """
+        if lag_seconds is None:
+            lag_seconds = int(current_app.config.get('WISH_CHANGELOG_SAFETY_LAG_SECONDS') or 0)
+        cutoff = datetime.utcnow() - timedelta(seconds=lag_seconds)
+        recent = db.session.query(db.func.min(WishChangeLog.id)).filter(WishChangeLog.created_at > cutoff).scalar()
+        if recent is not None:
+            return recent - 1
+        return ChangeLogService.head()
+
+    @staticmethod
+    def get_changes(user_id: int, since: int):
+        """
+        返回 (cursor, reset, changed_wish_ids, deleted_wish_ids)。
+        reset 为 True 表示 since 之后的日志已被压缩，调用方应返回完整心愿单。
+        返回的是 since 之后所有已提交的变更，但 cursor 只推进到 safe_cursor()，不会越过可能还未提交的日志。
+        """
+        head = ChangeLogService.head()
+        if since == head:
+            return since, False, set(), set()
+        if since > head:
+            # 游标比现有日志还新（数据库被重建过），只能全量同步
+            return min(ChangeLogService.safe_cursor(), head), True, set(), set()
+
+        cursor = max(since, min(ChangeLogService.safe_cursor(), head))
+        oldest = db.session.query(db.func.min(WishChangeLog.id)).scalar() or 0
+        if since + 1 < oldest:
+            return cursor, True, set(), set()
+
+        changed, deleted = set(), set()
+
+        # 1. 该用户自己的心愿变更，按顺序重放，同一心愿以最后一次变更为准
+        wish_rows = db.session.query(WishChangeLog.wish_id, WishChangeLog.change_type).filter(
+            WishChangeLog.user_id == user_id,
+            WishChangeLog.id > since,
+            WishChangeLog.id <= head
+        ).order_by(WishChangeLog.id.asc()).all()
+        for wish_id, change_type in wish_rows:
+            if change_type == 'delete':
+                changed.discard(wish_id)
+                deleted.add(wish_id)
+            else:
+                deleted.discard(wish_id)
+                changed.add(wish_id)
+
+        # 2. 商品级变更，关联到该用户当前收藏了这些商品的心愿
+        changed_items = db.select(WishChangeLog.item_id).where(
+            WishChangeLog.change_type == 'item',
+            WishChangeLog.id > since,
+            WishChangeLog.id <= head
+        )
+        changed.update(row[0] for row in db.session.query(Wish.id).filter(
+            Wish.user_id == user_id,
+            Wish.item_id.in_(changed_items)
+        ).all())
+
+        return cursor, False, changed - deleted, deleted
+
+    @staticmethod
+    def compact(retention_days: int, batch_size: int = 5000) -> int:
+        """
+        删除早于保留期的日志，返回删除的行数。
+        始终保留最新的一条，保证 head 和最早游标可以被正确计算。
+        """
+        head = ChangeLogService.head()
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        removed = 0
+
+        while True:
+            ids = [row[0] for row in db.session.query(WishChangeLog.id).filter(
+                WishChangeLog.id < head,
+                WishChangeLog.created_at < cutoff
+            ).order_by(WishChangeLog.id.asc()).limit(batch_size).all()]
+            if not ids:
+                break
+
+            # 按 id 前缀删除，保证剩余日志是连续的一段
+            WishChangeLog.query.filter(WishChangeLog.id <= ids[-1]).delete(synchronize_session=False)
+            db.session.commit()
+            removed += len(ids)
+
+        return removed
+
+
+# 实例化服务
+change_log_service = ChangeLogService()
+
+# 后台任务使用的 App 实例缓存，避免每次运行都重新创建
+_apps = {}
+
+
+def run_change_log_compaction(config_name: str):
+    """
+    变更日志压缩任务。由 APScheduler 每天调用一次。
+    """
+    from app import create_app
+
+    app = _apps.get(config_name)
+    if app is None:
+        app = _apps[config_name] = create_app(config_name)
+
+    with app.app_context():
+        try:
+            removed = change_log_service.compact(int(app.config.get('WISH_CHANGELOG_RETENTION_DAYS') or 30))
+            if removed:
+                print(f"--- 🧹 心愿变更日志压缩完成，删除 {removed} 条 ---")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 心愿变更日志压缩失败: {e}")
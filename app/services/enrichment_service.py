@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.database import db
+from app.models import Item, ItemPriceStats, Wish
+from app.services.platform_router import get_service_by_url
+from app.services.cache_service import wishlist_cache
+from app.services.price_history_service import price_history_service
+from app.services.price_stats_service import price_stats_service
+from app.services.event_bus import event_bus
+from app.services.change_log_service import change_log_service
+
+
+class EnrichmentQueue:
+    """
+    商品信息补全队列：在后台线程中调用平台 API，为占位商品填充标题、图片和首次价格。
+    同一 URL 的补全任务在进程内去重，并发添加同一商品只会触发一次外部请求。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrich')
+        self._lock = threading.Lock()
+        # 正在处理中的任务：original_url -> Future
+        self._inflight = {}
+
+    def submit(self, item_id: int, url: str, app=None):
+        """
+        提交一个补全任务。如果该 URL 已在队列中，直接返回已有的 Future。
+        必须在 app_context 中调用，或显式传入 app 实例。
+        """
+        app = app or current_app._get_current_object()
+
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is not None:
+                return future
+
+            future = self._executor.submit(self._run, app, item_id, url)
+            self._inflight[url] = future
+
+        future.add_done_callback(lambda _: self._forget(url))
+        return future
+
+    def is_pending(self, url: str) -> bool:
+        with self._lock:
+            return url in self._inflight
+
+    def _forget(self, url: str):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def _run(self, app, item_id: int, url: str):
+        # 后台线程没有请求上下文，需要手动推入 app_context 才能访问数据库
+        with app.app_context():
+            try:
+                item = Item.query.get(item_id)
+                if not item or item.enrich_status == 'ready':
+                    return
+
+                service = get_service_by_url(url)
+                if not service:
+                    item.enrich_status = 'failed'
+                    db.session.commit()
+                    return
+
+                item_data = service.get_standard_item_data(item.platform_item_id, url)
+                current_price = item_data.get('current_price')
+
+                # 与监控任务保持一致：价格为负表示获取失败，保留占位信息，等待监控任务重试
+                if current_price is None or current_price < 0:
+                    item.enrich_status = 'failed'
+                    db.session.commit()
+                    print(f"   -> WARNING: 商品 {url} 信息补全失败，等待监控任务重试。")
+                    return
+
+                item.title = item_data['title']
+                item.image_url = item_data['image_url']
+                item.enrich_status = 'ready'
+
+                # 记录首次价格历史（批量导入时可能已经通过批量价格接口写入过）
+                if not db.session.get(ItemPriceStats, item.id):
+                    price_stats_service.record_price(item.id, current_price)
+                change_log_service.record_item(item.id)
+                db.session.commit()
+                wishlist_cache.invalidate_item(item.id)
+                price_history_service.invalidate_item(item.id)
+
+                user_ids = [row[0] for row in db.session.query(Wish.user_id).filter(Wish.item_id == item.id).all()]
+                event_bus.publish(user_ids, 'item_ready', {
+                    'item_id': item.id,
+                    'title': item.title,
+                    'image_url': item.image_url,
+                    'latest_price': current_price
+                })
+                print(f"   -> ✅ 商品信息补全完成: {item.title}")
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"   -> CRITICAL ERROR: 补全商品 {url} 时发生错误: {e}")
+
+
+# 实例化队列，供 WishlistService 直接导入使用
+enrichment_queue = EnrichmentQueue(max_workers=int(os.environ.get('ENRICHMENT_WORKERS', 4)))
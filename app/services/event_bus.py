@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    """
+    进程内的按用户发布 / 订阅总线，供 SSE 推送使用。
+    - 所有事件写入一个定长环形缓冲区，并分配单调递增的序号（即 SSE 的 event id）
+    - 客户端断线重连时带上最后收到的序号（Last-Event-ID），从缓冲区补发错过的事件；
+      序号已被挤出缓冲区时返回 reset，客户端应重新拉取完整心愿单
+    - 序号从进程启动时的微秒时间戳开始，重启后的序号总是大于重启前的，
+      客户端带着旧进程的序号重连时会因为“缓冲区中没有后续事件”而收到 reset
+    - 每个在线用户一个 Condition，发布事件只唤醒相关用户的连接
+    订阅者在 wait 中阻塞等待，本身不占用额外线程；配合 gevent worker 时每个连接只是一个协程。
+    注意：总线只在当前进程内有效，监控任务和 Web 请求需运行在同一进程中。
+    """
+
+    def __init__(self, buffer_size: int = 10000):
+        self._buffer = deque(maxlen=buffer_size)  # (seq, user_id, event, data, created_at)
+        self._seq = int(time.time() * 1_000_000)
+        self._lock = threading.Lock()
+        # user_id -> [Condition, 订阅连接数]
+        self._waiters = {}
+        self._published = 0
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def publish(self, user_ids, event: str, data: dict) -> int:
+        """
+        向一个或多个用户发布事件，返回最后一个事件的序号。
+        应在数据库事务提交之后调用，避免客户端收到事件时还查不到对应数据。
+        """
+        if isinstance(user_ids, int):
+            user_ids = (user_ids,)
+
+        with self._lock:
+            now = time.time()
+            for user_id in set(user_ids):
+                self._seq += 1
+                self._published += 1
+                self._buffer.append((self._seq, user_id, event, data, now))
+
+                waiter = self._waiters.get(user_id)
+                if waiter:
+                    waiter[0].notify_all()
+            return self._seq
+
+    def subscribe(self, user_id: int):
+        """登记一个订阅连接；必须与 unsubscribe 成对调用"""
+        with self._lock:
+            waiter = self._waiters.get(user_id)
+            if waiter is None:
+                waiter = self._waiters[user_id] = [threading.Condition(self._lock), 0]
+            waiter[1] += 1
+
+    def unsubscribe(self, user_id: int):
+        with self._lock:
+            waiter = self._waiters.get(user_id)
+            if waiter is None:
+                return
+            waiter[1] -= 1
+            if waiter[1] <= 0:
+                del self._waiters[user_id]
+
+    def wait(self, user_id: int, cursor: int, timeout: float):
+        """
+        返回 (events, reset)：序号大于 cursor 的该用户事件列表 [(seq, event, data), ...]。
+        没有新事件时最多阻塞 timeout 秒；reset 为 True 表示 cursor 之后的事件已部分丢失。
+        调用前需先 subscribe。
+        """
+        with self._lock:
+            events, reset = self._collect_locked(user_id, cursor)
+            if events or reset:
+                return events, reset
+
+            waiter = self._waiters.get(user_id)
+            if waiter is None:
+                return [], False
+            waiter[0].wait(timeout)
+            return self._collect_locked(user_id, cursor)
+
+    def _collect_locked(self, user_id: int, cursor: int):
+        if cursor > self._seq:
+            # 序号不是本进程分配的（例如时钟回拨后重启），无法判断错过了哪些事件
+            return [], True
+        if self._seq == cursor:
+            return [], False
+        if not self._buffer:
+            # cursor 来自重启前的进程，之间的事件都已丢失
+            return [], True
+
+        # 缓冲区最早的事件都比 cursor + 1 新，说明中间有事件被挤出
+        reset = self._buffer[0][0] > cursor + 1
+
+        events = []
+        # 新事件在缓冲区末尾，倒序扫描到 cursor 为止
+        for seq, uid, event, data, _ in reversed(self._buffer):
+            if seq <= cursor:
+                break
+            if uid == user_id:
+                events.append((seq, event, data))
+        events.reverse()
+        return events, reset
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'last_id': self._seq,
+                'published': self._published,
+                'buffered': len(self._buffer),
+                'buffer_size': self._buffer.maxlen,
+                'online_users': len(self._waiters),
+                'connections': sum(w[1] for w in self._waiters.values()),
+            }
+
+
+# 实例化事件总线，监控任务、解锁逻辑和 SSE 接口共享同一个实例
+event_bus = EventBus(buffer_size=int(os.environ.get('EVENT_BUFFER_SIZE') or 10000))
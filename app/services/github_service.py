@@ -6,7 +6,7 @@ import base64
 import time
 from .base_platform_service import BasePlatformService
 
-# GitHub API 的基础 URL
+# GitHub API 的基础 URL；实际地址由配置项 GITHUB_API_BASE 决定（create_app 中设置），可以指向本地模拟服务器
 GITHUB_API_BASE = "https://api.github.com"
 
 # 🚨🚨🚨 请在这里填入你申请的 GitHub Personal Access Token 🚨🚨🚨
@@ -18,6 +18,9 @@ GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 class GitHubService(BasePlatformService):
     """GitHub 开发者信息获取服务"""
 
+    def __init__(self, api_base: str = GITHUB_API_BASE):
+        self.api_base = api_base.rstrip('/')
+
     def get_platform_name(self) -> str:
         return 'github'
 
@@ -40,7 +43,7 @@ class GitHubService(BasePlatformService):
         """
         获取指定用户的所有仓库的基础列表（包含描述和更新日期）。
         """
-        url = f"{GITHUB_API_BASE}/users/{username}/repos"
+        url = f"{self.api_base}/users/{username}/repos"
 
         # 使用带 Token 的 headers
         headers = self._get_headers()
@@ -80,7 +83,7 @@ class GitHubService(BasePlatformService):
         """
         获取单个仓库的详细信息，包括贡献者和最新提交活动。
         """
-        repo_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}"
+        repo_url = f"{self.api_base}/repos/{owner}/{repo_name}"
         contributors_url = f"{repo_url}/contributors"
         commit_activity_url = f"{repo_url}/stats/commit_activity"
 
@@ -165,7 +168,7 @@ class GitHubService(BasePlatformService):
         """
         获取 GitHub 用户的基本个人资料（头像、Bio、粉丝数等）
         """
-        url = f"{GITHUB_API_BASE}/users/{username}"
+        url = f"{self.api_base}/users/{username}"
         # 使用带 Token 的 headers
         headers = self._get_headers()
 
@@ -195,14 +198,20 @@ class GitHubService(BasePlatformService):
         """
         获取仓库的 README.md 内容。
         """
-        url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/readme"
+        return self.fetch_repo_readme_blob(owner, repo_name)[1]
+
+    def fetch_repo_readme_blob(self, owner: str, repo_name: str) -> tuple:
+        """
+        获取仓库的 README，返回 (blob SHA, 内容)。没有 README 或读取失败时 SHA 为 None。
+        """
+        url = f"{self.api_base}/repos/{owner}/{repo_name}/readme"
         # 使用带 Token 的 headers
         headers = self._get_headers()
 
         try:
             response = requests.get(url, headers=headers, timeout=10)
             if response.status_code == 404:
-                return "该仓库没有 README 文档。"
+                return None, "该仓库没有 README 文档。"
 
             response.raise_for_status()
             data = response.json()
@@ -213,19 +222,19 @@ class GitHubService(BasePlatformService):
 
             if encoding == 'base64':
                 # 解码成字符串
-                return base64.b64decode(content_encoded).decode('utf-8', errors='ignore')
+                return data.get('sha'), base64.b64decode(content_encoded).decode('utf-8', errors='ignore')
             else:
-                return content_encoded
+                return data.get('sha'), content_encoded
 
         except Exception as e:
             print(f"获取 README 失败: {e}")
-            return "无法读取文档内容。"
+            return None, "无法读取文档内容。"
 
     def fetch_repo_languages(self, owner: str, repo_name: str) -> dict:
         """
         获取仓库的语言分布数据 (例如: {'Python': 1200, 'HTML': 300})
         """
-        url = f"{GITHUB_API_BASE}/repos/{owner}/{repo_name}/languages"
+        url = f"{self.api_base}/repos/{owner}/{repo_name}/languages"
         headers = self._get_headers()
 
         try:
@@ -259,7 +268,7 @@ class GitHubService(BasePlatformService):
         1. timeout 增加到 30秒，防止网络超时。
         2. 兼容 GitHub API 返回 size=0 的情况。
         """
-        url = f"{GITHUB_API_BASE}/users/{username}/events"
+        url = f"{self.api_base}/users/{username}/events"
         headers = self._get_headers()
 
         try:
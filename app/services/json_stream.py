@@ -0,0 +1,105 @@
+import json
+import re
+
+# 与 LLMAnalysisService._parse_json_content 一致：解析前去掉非法控制字符
+_ILLEGAL_JSON_CHARS = re.compile(r'[\x00-\x1f]')
+_WHITESPACE = ' \t\r\n'
+
+
+class IncrementalJSONObjectParser:
+    """
+    顶层 JSON 对象的增量解析器，用于流式读取大模型输出的 JSON：
+    逐段 feed 模型输出，每当一个顶层字段的值完整出现，就返回 (key, value)。
+    - 对象 / 数组 / 字符串类型的值在闭合括号或引号处立即返回；数字、true/false/null 在随后的 , 或 } 处返回
+    - 顶层对象之前的内容（例如 ```json 代码块开头）会被忽略
+    只跟踪嵌套深度和字符串状态，每个字符只扫描一次；完整的值交给 json.loads 解析。
+    """
+
+    def __init__(self):
+        self._text = []  # 已接收的全部文本片段
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self.finished = False
+
+        self._key = None  # 当前字段的键；None 表示正在等待下一个键
+        self._token = None  # 当前正在读取的顶层键 / 值的字符列表
+        self._expect_value = False
+
+    @property
+    def text(self) -> str:
+        """目前为止接收到的完整原始文本"""
+        return ''.join(self._text)
+
+    def feed(self, chunk: str) -> list:
+        """输入一段文本，返回这段文本中完成的顶层字段列表 [(key, value), ...]"""
+        self._text.append(chunk)
+        fields = []
+        if self.finished:
+            return fields
+
+        for ch in chunk:
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._token is not None:
+                self._token.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._close_string(fields)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._token is None:
+                    self._token = [ch]
+            elif ch in '{[':
+                if self._depth == 1 and self._token is None:
+                    self._token = [ch]
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 1:
+                    # 对象 / 数组类型的值刚好闭合
+                    self._emit(fields)
+                elif self._depth == 0:
+                    self._emit(fields, drop_last=True)
+                    self.finished = True
+                    break
+            elif self._depth == 1:
+                if ch == ':':
+                    self._expect_value = True
+                elif ch == ',':
+                    self._emit(fields, drop_last=True)
+                elif ch not in _WHITESPACE and self._token is None and self._expect_value:
+                    # 数字或 true / false / null 的开头
+                    self._token = [ch]
+
+        return fields
+
+    def _close_string(self, fields: list):
+        if self._key is None and not self._expect_value:
+            self._key = json.loads(_ILLEGAL_JSON_CHARS.sub('', ''.join(self._token)))
+            self._token = None
+        else:
+            self._emit(fields)
+
+    def _emit(self, fields: list, drop_last: bool = False):
+        """解析当前字段的值（drop_last 时去掉最后读入的分隔符），加入 fields 并重置状态"""
+        if self._key is not None and self._token is not None:
+            raw = ''.join(self._token[:-1] if drop_last else self._token)
+            fields.append((self._key, json.loads(_ILLEGAL_JSON_CHARS.sub('', raw))))
+        self._key = None
+        self._token = None
+        self._expect_value = False
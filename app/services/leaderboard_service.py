@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from app.database import db
+from app.battle_models import PlayerPowerScore
+
+# 持久化的字段（与 PlayerPowerScore 的列一致）
+FIELDS = ('username', 'display_name', 'avatar_url', 'power_score', 'rank', 'repos', 'followers', 'stars',
+          'commits_weekly', 'wishes_count', 'score', 'updated_at')
+
+
+class LeaderboardService:
+    """
+    战力排行榜：进程内维护一个按 (-战力值, 用户名) 升序排列的有序列表。
+    - 名次查询：二分查找，O(log n)
+    - 前 K 名 / 我的附近：二分定位后切片，O(log n + K)
+    - 更新：二分定位后在列表中插入 / 删除（内存移动，n 为十万级时仍在微秒级）
+    索引在首次使用时从 player_power_scores 表加载；之后由后台写入任务每隔 reload_seconds 调用 refresh 重新加载，
+    以合并其他进程写入的数据，请求线程不会执行全表加载。新数据先进入内存索引，再由定时任务批量写入数据库。
+    """
+
+    def __init__(self, reload_seconds: float = 300):
+        self.reload_seconds = reload_seconds
+        self._keys = []  # 升序排列的 (-power_score, username)
+        self._entries = {}  # username -> entry
+        self._pending = {}  # 尚未写入数据库的 entry
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def record(self, player: dict):
+        """记录一名增强后的选手数据（含 power_score）。必须在 app_context 中调用"""
+        github = player.get('github_data') or {}
+        internal = player.get('internal_data') or {}
+        display_name = player.get('username') or ''
+
+        entry = {
+            'username': display_name.lower(),
+            'display_name': display_name,
+            'avatar_url': player.get('avatar'),
+            'power_score': int(player.get('power_score', 0)),
+            'rank': player.get('rank'),
+            'repos': github.get('repos', 0) or 0,
+            'followers': github.get('followers', 0) or 0,
+            'stars': github.get('stars', 0) or 0,
+            'commits_weekly': github.get('commits_weekly', 0) or 0,
+            'wishes_count': internal.get('wishes_count', 0) or 0,
+            'score': internal.get('score', 0) or 0,
+            'updated_at': datetime.utcnow()
+        }
+
+        with self._lock:
+            self._ensure_loaded()
+            self._upsert_locked(entry)
+            self._pending[entry['username']] = entry
+
+    def _upsert_locked(self, entry: dict):
+        username = entry['username']
+        old = self._entries.get(username)
+        if old is not None:
+            index = bisect_left(self._keys, (-old['power_score'], username))
+            del self._keys[index]
+        insort(self._keys, (-entry['power_score'], username))
+        self._entries[username] = entry
+
+    def _ensure_loaded(self):
+        """只在首次使用时加载一次；定期重新加载由后台任务调用 refresh 完成"""
+        if self._loaded_at is None:
+            self._load()
+
+    def refresh(self, force: bool = False) -> bool:
+        """距上次加载超过 reload_seconds 时重新加载索引，返回是否加载。由后台任务调用，必须在 app_context 中调用"""
+        with self._lock:
+            loaded_at = self._loaded_at
+        if not force and loaded_at is not None and time.time() - loaded_at < self.reload_seconds:
+            return False
+        self._load()
+        return True
+
+    def _load(self):
+        # 全表查询不持有锁，期间请求线程可以照常读写索引
+        rows = db.session.query(*[getattr(PlayerPowerScore, field) for field in FIELDS]).all()
+        entries = {row.username: dict(zip(FIELDS, row)) for row in rows}
+
+        with self._lock:
+            # 内存中更新的数据优先：包括尚未写入数据库的更新，以及查询开始后才提交的更新
+            for username, entry in self._entries.items():
+                loaded = entries.get(username)
+                if loaded is None or (entry['updated_at'] and (loaded['updated_at'] is None
+                                                               or entry['updated_at'] > loaded['updated_at'])):
+                    entries[username] = entry
+            entries.update(self._pending)
+
+            self._entries = entries
+            self._keys = sorted((-entry['power_score'], username) for username, entry in entries.items())
+            self._loaded_at = time.time()
+
+    def flush(self) -> int:
+        """把待写入的战力数据写入数据库，返回写入条数。必须在 app_context 中调用"""
+        # 提交成功之前数据一直保留在 _pending 中，期间重新加载索引不会退回旧数据
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return 0
+
+        try:
+            for entry in pending.values():
+                db.session.merge(PlayerPowerScore(**entry))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 战力排行榜写入失败，{len(pending)} 条记录将在下次重试: {e}")
+            return 0
+
+        with self._lock:
+            # 只移除写入期间没有再次更新的选手
+            for username, entry in pending.items():
+                if self._pending.get(username) is entry:
+                    del self._pending[username]
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # 查询（都需要 app_context，首次调用时加载索引）
+    # ------------------------------------------------------------------
+    def total(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._keys)
+
+    def top(self, limit: int = 20, offset: int = 0) -> list:
+        with self._lock:
+            self._ensure_loaded()
+            return self._slice_locked(offset, offset + limit)
+
+    def rank_of(self, username: str):
+        """返回该用户的名次信息；不在榜单上时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            index = self._index_locked(username.lower())
+            if index is None:
+                return None
+            return self._to_dict(index, self._entries[username.lower()])
+
+    def around(self, username: str, radius: int = 5):
+        """返回该用户及其前后各 radius 名；不在榜单上时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            index = self._index_locked(username.lower())
+            if index is None:
+                return None
+            return self._slice_locked(max(0, index - radius), index + radius + 1)
+
+    def _index_locked(self, username: str):
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, (-entry['power_score'], username))
+
+    def _slice_locked(self, start: int, end: int) -> list:
+        return [self._to_dict(start + i, self._entries[username])
+                for i, (_, username) in enumerate(self._keys[start:end])]
+
+    @staticmethod
+    def _to_dict(index: int, entry: dict) -> dict:
+        return {
+            'position': index + 1,
+            'username': entry['display_name'] or entry['username'],
+            'avatar': entry['avatar_url'],
+            'power_score': entry['power_score'],
+            'rank': entry['rank'],
+            'inputs': {
+                'repos': entry['repos'],
+                'followers': entry['followers'],
+                'stars': entry['stars'],
+                'commits_weekly': entry['commits_weekly'],
+                'wishes_count': entry['wishes_count'],
+                'score': entry['score']
+            },
+            'updated_at': entry['updated_at'].isoformat() if entry['updated_at'] else None
+        }
+
+
+# 实例化服务
+leaderboard_service = LeaderboardService(reload_seconds=float(os.environ.get('LEADERBOARD_RELOAD_SECONDS') or 300))
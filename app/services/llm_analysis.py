@@ -1,9 +1,77 @@
-import requests
 import json
 import re
 import os
 from datetime import datetime
 from flask import current_app
+from app.services.moonshot_client import moonshot_client, MoonshotError
+from app.services.llm_cache import llm_cache
+from app.services.json_stream import IncrementalJSONObjectParser
+from app.services.prompt_builder import PromptBuilder, estimate_tokens, truncate_to_tokens, choose_model
+
+
+def clean_commentary(content: str) -> str:
+    """清理解说文本中的 Markdown 格式：去掉代码块和 # * _ ` 符号"""
+    content = re.sub(r'```.*?```', '', content, flags=re.DOTALL)
+    return re.sub(r'[#*_`]', '', content)
+
+
+class CommentaryCleaner:
+    """
+    clean_commentary 的增量版本，用于流式输出：逐段输入模型输出，返回可以立即发送的文本。
+    - 代码块内容先缓存，遇到闭合的 ``` 时丢弃；直到结束都未闭合时与整段清理一样保留其中的文字
+    - 末尾可能是 ``` 的一部分的反引号暂不处理，等下一段到来再判断
+    所有片段的输出拼接起来与对完整文本调用 clean_commentary 的结果一致（首尾空白除外）。
+    """
+
+    def __init__(self):
+        self._pending = ''
+        self._code = None  # 未闭合代码块中的内容；None 表示不在代码块中
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        text = self._pending + text
+        self._pending = ''
+
+        out = []
+        i = 0
+        while i < len(text):
+            if text.startswith('```', i):
+                if self._code is None:
+                    self._code = []
+                else:
+                    self._code = None
+                i += 3
+                continue
+
+            # 结尾是 1~2 个反引号：可能是被切开的 ```，留到下一段
+            if text[i] == '`' and text[i:] == '`' * (len(text) - i):
+                self._pending = text[i:]
+                break
+
+            (self._code if self._code is not None else out).append(text[i])
+            i += 1
+
+        return self._emit(''.join(out))
+
+    def flush(self) -> str:
+        rest = ''.join(self._code or []) + self._pending
+        self._code = None
+        self._pending = ''
+        return self._emit(rest)
+
+    def _emit(self, text: str) -> str:
+        text = re.sub(r'[#*_`]', '', text)
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+
+def _render_simple_repo(repo: dict) -> str:
+    """仓库列表每行一个仓库，比原始 JSON 节省大量 Token"""
+    description = (repo.get('description') or '').replace('\n', ' ')
+    return f"{repo.get('name')} | {repo.get('language') or '-'} | {repo.get('stars') or 0} | " \
+           f"{(repo.get('updated_at') or '')[:10]} | {description[:120]}"
 
 
 class LLMAnalysisService:
@@ -12,8 +80,8 @@ class LLMAnalysisService:
     """
 
     def __init__(self):
-        self.api_key = os.environ.get('MOONSHOT_API_KEY')
-        self.base_url = os.environ.get('MOONSHOT_BASE_URL', "https://api.moonshot.cn/v1")
+        # 对战解说使用的模型（输出只有 200 字左右，8k 上下文足够）
+        self.model = os.environ.get('MOONSHOT_BATTLE_MODEL', "moonshot-v1-8k")
 
     def analyze_github_user(self, username: str, profile_data: dict, detailed_repos_data: list,
                             simple_repos_data: list) -> dict:
@@ -21,17 +89,86 @@ class LLMAnalysisService:
         调用 LLM 对用户进行全方位分析。
         """
 
-        if not self.api_key:
+        if not moonshot_client.configured:
             return {"error": "后端未配置 MOONSHOT_API_KEY"}
 
-        current_date = datetime.now().strftime("%Y-%m-%d")
+        payload = self._build_user_analysis_payload(username, profile_data, detailed_repos_data, simple_repos_data)
+
+        try:
+            print(f"--- [AI] 正在请求 Kimi 深度分析 {username}... ---")
+            # 最多输出 16000 Token 的长报告，单独放宽超时
+            parsed_result = self._complete_cached('analyze_user', payload, self._parse_json_content, timeout=180)
+            return self._finalize_user_report(parsed_result)
+
+        except json.JSONDecodeError as e:
+            print(f"\n❌ [CRITICAL ERROR] JSON 解析失败: {e}")
+            print(f"Error context: {e.doc[max(0, e.pos - 50):min(len(e.doc), e.pos + 50)]}")
+            return {"error": f"JSON解析失败: {str(e)}"}
+        except Exception as e:
+            print(f"AI Service Error: {e}")
+            return {"error": str(e)}
+
+    def stream_github_user(self, username: str, profile_data: dict, detailed_repos_data: list,
+                           simple_repos_data: list):
+        """
+        analyze_github_user 的流式版本，依次 yield：
+        - ('field', key, value)：模型输出中某个顶层字段刚完整出现（radar_scores、overall_score、tech_stack 通常最先到达）
+        - ('result', report)：最终报告，与 analyze_github_user 的返回值完全一致
+        与非流式版本共用提示词、响应缓存和结果后处理；出错时直接抛出异常。
+        """
+        if not moonshot_client.configured:
+            raise MoonshotError("后端未配置 MOONSHOT_API_KEY")
+
+        payload = self._build_user_analysis_payload(username, profile_data, detailed_repos_data, simple_repos_data)
+        key = llm_cache.make_key(payload)
+
+        content = llm_cache.get('analyze_user', key)
+        if content is not None:
+            try:
+                parsed_result = self._parse_json_content(content)
+            except ValueError:
+                llm_cache.delete(key)
+            else:
+                print("[AI] analyze_user 命中响应缓存")
+                for field, value in parsed_result.items():
+                    yield 'field', field, value
+                yield 'result', self._finalize_user_report(parsed_result)
+                return
+
+        print(f"--- [AI] 正在流式请求 Kimi 深度分析 {username}... ---")
+        parser = IncrementalJSONObjectParser()
+        parts = []
+        usage = {}
+        for delta in moonshot_client.stream('analyze_user_stream', payload, timeout=(10, 180), usage_out=usage):
+            parts.append(delta)
+            if parser is None:
+                continue
+            try:
+                for field, value in parser.feed(delta):
+                    yield 'field', field, value
+            except ValueError as e:
+                # 某个字段无法单独解析：停止增量推送，结果以最终的整体解析为准
+                print(f"[AI] 增量解析失败，等待完整输出: {e}")
+                parser = None
+
+        content = ''.join(parts)
+        parsed_result = self._parse_json_content(content)
+        llm_cache.set('analyze_user', key, payload.get('model'), content, usage)
+        yield 'result', self._finalize_user_report(parsed_result)
+
+    @staticmethod
+    def _build_user_analysis_payload(username: str, profile_data: dict, detailed_repos_data: list,
+                                     simple_repos_data: list) -> dict:
+        """构造用户深度分析的请求参数，流式和非流式调用共用，保证缓存键一致"""
+        # 只精确到月份：日期写进提示词会让缓存键每天变化，输入数据不变时也无法命中缓存
+        current_date = datetime.now().strftime("%Y-%m")
 
         # ---------------------------------------------------------------------
         # [修改] System Prompt: 区分网页端深度评语(summary)和简历摘要(resume_summary)
         # ---------------------------------------------------------------------
         system_prompt = f"""
         你是一个资深技术专家和CTO。你的任务是基于 GitHub 数据对候选人进行深度技术评估。
-        当前日期: {current_date}
+        当前月份: {current_date}
 
         【任务目标】
         请生成两份不同用途的分析文案：
@@ -68,82 +205,71 @@ class LLMAnalysisService:
         注意：必须处理我提供的【所有】仓库，不要遗漏，也不要中途截断 JSON。
         """
 
-        # 2. 构造 User Prompt
-        limited_simple_repos = simple_repos_data[:30]
+        # 2. 构造 User Prompt：按优先级在固定预算内分配（个人资料 > 核心仓库 > 仓库列表）
+        budget = int(current_app.config.get('AI_USER_PROMPT_TOKEN_BUDGET') or 6000)
+        builder = PromptBuilder(budget)
+        builder.add_text('profile', json.dumps(profile_data, ensure_ascii=False), priority=0, max_tokens=600)
+        # 每个核心仓库的 README 单独限额，避免某一个长文档挤掉其余仓库
+        builder.add_items('detailed', [
+            dict(repo, readme=truncate_to_tokens(repo.get('readme') or '', 500)) for repo in detailed_repos_data
+        ], priority=1, max_tokens=int(budget * 0.6))
+        builder.add_items('simple', simple_repos_data[:30], priority=2, render=_render_simple_repo)
+        sections = builder.build()
 
         user_prompt = f"""
         请分析开发者 '{username}'。
 
         【个人资料】:
-        {json.dumps(profile_data, ensure_ascii=False)}
+        {sections['profile']}
 
-        【待分析仓库列表】:
-        {json.dumps(limited_simple_repos, ensure_ascii=False)}
+        【待分析仓库列表】(每行: 名称 | 语言 | Stars | 更新时间 | 描述):
+        {sections['simple']}
 
-        【核心仓库深度数据】(用于点评):
-        {json.dumps(detailed_repos_data, ensure_ascii=False)}
+        【核心仓库深度数据】(用于点评，每行一个仓库):
+        {sections['detailed']}
 
         请生成 JSON 报告。
         """
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # 输出长度随仓库数量增长：固定部分（评分、评语、摘要）+ 每个仓库一条简介
+        repo_count = len(sections['simple'].splitlines())
+        output_tokens = min(16000, 2000 + 100 * repo_count)
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        model = choose_model(prompt_tokens, output_tokens)
+        print(f"[AI] 用户分析提示词约 {prompt_tokens} tokens {builder.used}，使用 {model}")
 
         # 参数设置
         payload = {
-            "model": "moonshot-v1-32k",
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             # 稍微调高温度以生成更丰富的长文本
             "temperature": 0.4,
-            "max_tokens": 16000,
+            "max_tokens": output_tokens,
             "response_format": {"type": "json_object"}
         }
-
-        try:
-            print(f"--- [AI] 正在请求 Kimi 深度分析 {username}... ---")
-            response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=payload, timeout=180)
-            response.raise_for_status()
-
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-
-            # 数据清洗
-            if content.strip().startswith("```"):
-                content = re.sub(r'^```json\s*|\s*```$', '', content.strip(), flags=re.MULTILINE)
-
-            illegal_json_chars = re.compile(r'[\x00-\x1f]')
-            content = illegal_json_chars.sub(r'', content)
-
-            parsed_result = json.loads(content)
-
-            # 兜底补全
-            if 'repositories' not in parsed_result: parsed_result['repositories'] = []
-            if 'radar_scores' not in parsed_result:
-                parsed_result['radar_scores'] = {k: 60 for k in
-                                                 ["code_quality", "activity", "documentation", "influence",
-                                                  "tech_breadth"]}
-            if 'overall_score' not in parsed_result: parsed_result['overall_score'] = 60
-
-            # [新增] 确保 resume_summary 存在，如果 AI 未生成则截取 summary
-            if 'resume_summary' not in parsed_result:
-                raw_summary = parsed_result.get('summary', '')
-                clean_text = raw_summary.replace('#', '').replace('*', '')
-                parsed_result['resume_summary'] = clean_text[:150] + "..."
-
-            return parsed_result
-
-        except json.JSONDecodeError as e:
-            print(f"\n❌ [CRITICAL ERROR] JSON 解析失败: {e}")
-            print(f"Error context: {content[max(0, e.pos - 50):min(len(content), e.pos + 50)]}")
-            return {"error": f"JSON解析失败: {str(e)}"}
-        except Exception as e:
-            print(f"AI Service Error: {e}")
-            return {"error": str(e)}
+        return payload
+
+    @staticmethod
+    def _finalize_user_report(parsed_result: dict) -> dict:
+        """补全模型可能遗漏的字段"""
+        # 兜底补全
+        if 'repositories' not in parsed_result: parsed_result['repositories'] = []
+        if 'radar_scores' not in parsed_result:
+            parsed_result['radar_scores'] = {k: 60 for k in
+                                             ["code_quality", "activity", "documentation", "influence",
+                                              "tech_breadth"]}
+        if 'overall_score' not in parsed_result: parsed_result['overall_score'] = 60
+
+        # [新增] 确保 resume_summary 存在，如果 AI 未生成则截取 summary
+        if 'resume_summary' not in parsed_result:
+            raw_summary = parsed_result.get('summary', '')
+            clean_text = raw_summary.replace('#', '').replace('*', '')
+            parsed_result['resume_summary'] = clean_text[:150] + "..."
+
+        return parsed_result
 
     def analyze_specific_repo(self, repo_details: dict, readme_content: str) -> dict:
         """
@@ -151,10 +277,13 @@ class LLMAnalysisService:
         要求 AI 输出数值型数据，用于前端渲染图表。
         """
 
-        if not self.api_key:
+        if not moonshot_client.configured:
             return {"error": "未配置 API KEY"}
 
-        safe_readme = readme_content[:8000] + "..." if len(readme_content) > 8000 else readme_content
+        budget = int(current_app.config.get('AI_REPO_PROMPT_TOKEN_BUDGET') or 3000)
+        sections = PromptBuilder(budget).add_text(
+            'details', json.dumps(repo_details, ensure_ascii=False), priority=0, max_tokens=800
+        ).add_text('readme', readme_content, priority=1).build()
 
         # --- 修改点：Prompt 改为请求 JSON 数据，而非 Markdown 文本 ---
         system_prompt = """
@@ -190,56 +319,89 @@ class LLMAnalysisService:
 
         user_prompt = f"""
         【仓库元数据】:
-        {json.dumps(repo_details, ensure_ascii=False)}
+        {sections['details']}
 
         【README 文档片段】:
-        {safe_readme}
+        {sections['readme']}
 
         请生成可视化分析数据。
         """
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # 输出只是一小段 JSON
+        output_tokens = 1024
+        model = choose_model(estimate_tokens(system_prompt) + estimate_tokens(user_prompt), output_tokens)
+
         payload = {
-            "model": "moonshot-v1-32k",
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             "temperature": 0.2,
+            "max_tokens": output_tokens,
             "response_format": {"type": "json_object"}
         }
 
         try:
-            response = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-
-            content = response.json()['choices'][0]['message']['content']
-            if content.strip().startswith("```"):
-                content = re.sub(r'^```json\s*|\s*```$', '', content.strip(), flags=re.MULTILINE)
-
-            return json.loads(content)
+            return self._complete_cached('analyze_repo', payload, self._parse_json_content)
 
         except Exception as e:
             print(f"Repo Analysis Error: {e}")
             return {"error": str(e)}
 
-    def analyze_battle(self, player1_data: dict, player2_data: dict) -> str:
+    @staticmethod
+    def _complete_cached(endpoint: str, payload: dict, parse, timeout=None):
+        """
+        带持久化缓存的调用：相同的 payload 直接复用缓存中的输出，不再调用大模型。
+        parse 把输出文本转换为结果，解析失败时抛出异常；只有解析成功的输出才会写入缓存。
+        """
+        key = llm_cache.make_key(payload)
+        content = llm_cache.get(endpoint, key)
+        if content is not None:
+            try:
+                print(f"[AI] {endpoint} 命中响应缓存")
+                return parse(content)
+            except ValueError:
+                llm_cache.delete(key)
+
+        result = moonshot_client.chat(endpoint, payload, timeout)
+        try:
+            content = result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise MoonshotError("API 返回格式异常")
+
+        parsed = parse(content)
+        llm_cache.set(endpoint, key, payload.get('model'), content, result.get('usage'))
+        return parsed
+
+    @staticmethod
+    def _parse_json_content(content: str):
+        """去掉 ```json 代码块包裹和非法控制字符后解析 JSON"""
+        if content.strip().startswith("```"):
+            content = re.sub(r'^```json\s*|\s*```$', '', content.strip(), flags=re.MULTILINE)
+
+        illegal_json_chars = re.compile(r'[\x00-\x1f]')
+        content = illegal_json_chars.sub(r'', content)
+
+        return json.loads(content)
+
+    def analyze_battle(self, player1_data: dict, player2_data: dict, use_fallback: bool = True) -> str:
         """
         核心对战解说生成方法
 
         Args:
             player1_data: 红方选手数据（包含 GitHub 和平台数据）
             player2_data: 蓝方选手数据（包含 GitHub 和平台数据）
+            use_fallback: AI 不可用时是否返回规则引擎生成的备用解说；为 False 时直接抛出异常
 
         Returns:
             str: AI 生成的解说文本
         """
 
         # 1. 检查 API 配置
-        if not self.api_key:
+        if not moonshot_client.configured:
+            if not use_fallback:
+                raise Exception("后端未配置 MOONSHOT_API_KEY")
             return self._generate_fallback_commentary(player1_data, player2_data)
 
         # 2. 智能判定对战场景
@@ -255,8 +417,75 @@ class LLMAnalysisService:
             return commentary
         except Exception as e:
             print(f"[AI Error] {e}")
+            if not use_fallback:
+                raise
             return self._generate_fallback_commentary(player1_data, player2_data)
 
+    def stream_battle(self, player1_data: dict, player2_data: dict):
+        """
+        流式生成对战解说：逐段 yield 清理后的文本。
+        与 analyze_battle 不同，出错时直接抛出异常（可能已经输出了一部分），由调用方决定如何降级。
+        """
+        if not moonshot_client.configured:
+            raise Exception("后端未配置 MOONSHOT_API_KEY")
+
+        battle_scene = self._identify_battle_scene(player1_data, player2_data)
+        system_prompt = self._build_system_prompt(battle_scene)
+        user_prompt = self._build_user_prompt(player1_data, player2_data, battle_scene)
+
+        cleaner = CommentaryCleaner()
+        for delta in self._stream_moonshot_api(system_prompt, user_prompt):
+            text = cleaner.feed(delta)
+            if text:
+                yield text
+
+        tail = cleaner.flush()
+        if tail:
+            yield tail
+
+    def analyze_tournament(self, ranking: list, bracket: list, champion: str, use_fallback: bool = True) -> str:
+        """
+        锦标赛总结解说：整场赛事只调用一次 AI，而不是每场对战各调用一次。
+        use_fallback 为 False 时出错直接抛出异常，由调用方生成备用解说。
+        """
+        if not moonshot_client.configured:
+            if not use_fallback:
+                raise Exception("后端未配置 MOONSHOT_API_KEY")
+            return f"🏆 锦标赛冠军：{champion}！"
+
+        system_prompt = """你是《代码竞技场》的金牌解说员，风格幽默风趣、充满激情。
+现在要为一整场多人锦标赛做赛后总结。
+
+【输出规范】
+1. **格式**：纯文本，不使用 Markdown 或特殊符号
+2. **字数**：严格控制在 250-350 字之间
+3. **结构**：开场（点出参赛人数和冠军）→ 关键对决回顾（挑 2-3 场，必须引用战力数据）→ 黑马与遗憾 → 结语
+4. **语气**：热血、幽默、专业，适当使用 Emoji
+5. **禁止**：过度贬低任何一方、编造输入中没有的数据"""
+
+        lines = [f"参赛人数: {len(ranking)}，冠军: {champion}", "", "【最终排名】"]
+        for p in ranking:
+            lines.append(f"{p['position']}. {p['username']} {p['rank']}{p['rank_emoji']} 战力 {p['power_score']} "
+                         f"特长: {', '.join(p['strengths'])}")
+        lines += ["", "【对阵结果】"]
+        for rnd in bracket:
+            results = []
+            for m in rnd['matches']:
+                if m['bye']:
+                    results.append(f"{m['player1']} 轮空晋级")
+                else:
+                    results.append(f"{m['player1']}({m['score1']}) vs {m['player2']}({m['score2']}) → {m['winner']}")
+            lines.append(f"第 {rnd['round']} 轮: " + "；".join(results))
+        lines += ["", "请生成一段精彩的赛后总结（250-350字，纯文本）："]
+
+        try:
+            return self._call_moonshot_api(system_prompt, "\n".join(lines), endpoint='tournament')
+        except Exception as e:
+            print(f"[AI Error] {e}")
+            if not use_fallback:
+                raise
+            return f"🏆 锦标赛冠军：{champion}！"
+
     def _identify_battle_scene(self, p1: dict, p2: dict) -> str:
         """
         智能识别对战场景类型
@@ -400,55 +629,47 @@ VS
 请生成一段精彩的解说词（180-220字，纯文本）：
 """
 
-    def _call_moonshot_api(self, system_prompt: str, user_prompt: str) -> str:
+    def _call_moonshot_api(self, system_prompt: str, user_prompt: str, endpoint: str = 'battle') -> str:
         """
-        调用 Moonshot AI API
+        调用 Moonshot AI API，返回清理后的解说文本。失败时抛出 MoonshotError
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.8,  # 提高创造力
+            "max_tokens": 1000,
+            "top_p": 0.9
         }
 
+        print(f"[AI] 正在生成对战解说...")
+        content = moonshot_client.complete(endpoint, payload).strip()
+
+        # 清理可能的 Markdown 格式
+        content = clean_commentary(content)
+
+        print(f"[AI] 解说生成成功，长度: {len(content)} 字")
+        return content
+
+    def _stream_moonshot_api(self, system_prompt: str, user_prompt: str):
+        """
+        以流式方式调用 Moonshot AI API，逐个 yield 模型输出的文本增量
+        """
         payload = {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            "temperature": 0.8,  # 提高创造力
+            "temperature": 0.8,
             "max_tokens": 1000,
             "top_p": 0.9
         }
 
-        try:
-            print(f"[AI] 正在生成对战解说...")
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            response.raise_for_status()
-
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
-
-            # 清理可能的 Markdown 格式
-            content = re.sub(r'```.*?```', '', content, flags=re.DOTALL)
-            content = re.sub(r'[#*_`]', '', content)
-
-            print(f"[AI] 解说生成成功，长度: {len(content)} 字")
-            return content
-
-        except requests.exceptions.Timeout:
-            print("[AI] 请求超时")
-            raise Exception("AI 响应超时")
-        except requests.exceptions.RequestException as e:
-            print(f"[AI] 网络请求失败: {e}")
-            raise Exception(f"网络错误: {str(e)}")
-        except KeyError:
-            print("[AI] API 返回格式错误")
-            raise Exception("API 返回格式异常")
+        print("[AI] 正在流式生成对战解说...")
+        yield from moonshot_client.stream('battle_stream', payload)
 
     def _generate_fallback_commentary(self, p1: dict, p2: dict) -> str:
         """
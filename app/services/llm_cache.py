@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.database import db
+from app.ai_models import LLMResponseCache
+
+# 每写入多少条记录检查一次容量并淘汰
+EVICT_EVERY = 50
+
+
+class LLMCache:
+    """
+    大模型响应的持久化缓存（llm_response_cache 表）：
+    - 键：请求 payload（模型、提示词、温度等参数）规范化后的 SHA-256，输入逐字节相同才会命中
+    - TTL：按调用方配置（LLM_CACHE_TTLS），未配置或为 0 的调用方不缓存
+    - 容量：超过 LLM_CACHE_MAX_ENTRIES 时删除过期记录和最久未访问的记录（LRU）
+    所有方法都需要在 app_context 中调用；数据库异常只打印日志，不影响正常调用大模型。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+        self._tokens_saved = 0
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def ttl_for(endpoint: str) -> int:
+        return int((current_app.config.get('LLM_CACHE_TTLS') or {}).get(endpoint) or 0)
+
+    def get(self, endpoint: str, key: str):
+        """返回缓存的模型输出文本；未命中、已过期或该调用方未开启缓存时返回 None"""
+        if not self.ttl_for(endpoint):
+            return None
+
+        now = datetime.utcnow()
+        try:
+            entry = db.session.get(LLMResponseCache, key)
+            if entry is None or entry.expires_at <= now:
+                with self._lock:
+                    self._misses += 1
+                return None
+
+            LLMResponseCache.query.filter_by(cache_key=key).update({
+                'hits': LLMResponseCache.hits + 1,
+                'last_accessed_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+
+            with self._lock:
+                self._hits += 1
+                self._tokens_saved += (entry.prompt_tokens or 0) + (entry.completion_tokens or 0)
+            return entry.content
+        except Exception as e:
+            db.session.rollback()
+            print(f"[LLM Cache] 读取缓存失败: {e}")
+            return None
+
+    def set(self, endpoint: str, key: str, model: str, content: str, usage: dict = None):
+        ttl = self.ttl_for(endpoint)
+        if not ttl:
+            return
+
+        usage = usage or {}
+        now = datetime.utcnow()
+        try:
+            db.session.merge(LLMResponseCache(
+                cache_key=key,
+                endpoint=endpoint,
+                model=model,
+                content=content,
+                prompt_tokens=usage.get('prompt_tokens', 0) or 0,
+                completion_tokens=usage.get('completion_tokens', 0) or 0,
+                hits=0,
+                created_at=now,
+                expires_at=now + timedelta(seconds=ttl),
+                last_accessed_at=now
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[LLM Cache] 写入缓存失败: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def delete(self, key: str):
+        try:
+            LLMResponseCache.query.filter_by(cache_key=key).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[LLM Cache] 删除缓存失败: {e}")
+
+    def evict(self) -> int:
+        """删除过期记录；仍超过容量上限时按最久未访问淘汰。返回删除的行数"""
+        max_entries = int(current_app.config.get('LLM_CACHE_MAX_ENTRIES') or 5000)
+        try:
+            removed = LLMResponseCache.query.filter(
+                LLMResponseCache.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+
+            overflow = db.session.query(db.func.count(LLMResponseCache.cache_key)).scalar() - max_entries
+            if overflow > 0:
+                keys = [row[0] for row in db.session.query(LLMResponseCache.cache_key).order_by(
+                    LLMResponseCache.last_accessed_at.asc()
+                ).limit(overflow).all()]
+                removed += LLMResponseCache.query.filter(
+                    LLMResponseCache.cache_key.in_(keys)
+                ).delete(synchronize_session=False)
+
+            db.session.commit()
+            return removed
+        except Exception as e:
+            db.session.rollback()
+            print(f"[LLM Cache] 淘汰缓存失败: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / total, 3) if total else None,
+                'tokens_saved': self._tokens_saved,
+            }
+
+
+# 实例化缓存，AI 分析服务直接导入使用
+llm_cache = LLMCache()
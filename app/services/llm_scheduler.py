@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class LLMOverloaded(Exception):
+    """请求被调度器拒绝（队列已满或排队超时）"""
+
+
+class _TokenBucket:
+    """每分钟额度的令牌桶，按秒平滑补充；余额允许为负（实际用量超过预估时在后续请求中扣回）"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) / self.rate) if self.rate else float('inf')
+
+
+class _PriorityClass:
+    def __init__(self, name: str, priority: int, max_concurrency: int, max_queue: int, max_wait: float,
+                 reserve: float):
+        self.name = name
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # 该等级只能使用额度中高于 reserve 比例的部分，剩余额度留给更高优先级的请求
+        self.reserve = reserve
+
+        self.queue = deque()  # 排队中的请求票据
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.waits = deque(maxlen=500)
+
+    def to_dict(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            'priority': self.priority,
+            'queued': len(self.queue),
+            'in_flight': self.in_flight,
+            'max_concurrency': self.max_concurrency,
+            'admitted': self.admitted,
+            'shed': self.shed,
+            'wait_avg_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+            'wait_p95_ms': round(waits[int(len(waits) * 0.95) - 1] * 1000, 1) if waits else None,
+        }
+
+
+class LLMScheduler:
+    """
+    大模型调用的准入调度器，所有 Moonshot 请求都要先在这里领取名额：
+    - 优先级等级：interactive（聊天）> standard（对战解说、仓库分析等用户在等待的请求）> background（后台分析任务）
+    - 限制：全局并发数、每个等级的并发数，以及全局 RPM / TPM 令牌桶
+    - 调度：额度不足时按优先级放行，同一等级内先到先得；低优先级等级为高优先级保留一部分额度
+    - 降级：某等级排队数达到上限时直接拒绝新请求，排队超过该等级的最长等待时间也会被拒绝
+    被拒绝时抛出 LLMOverloaded。
+    """
+
+    def __init__(self, max_concurrency: int = 8, rpm: int = 200, tpm: int = 128000, classes: dict = None):
+        self.max_concurrency = max_concurrency
+        self._rpm = _TokenBucket(rpm)
+        self._tpm = _TokenBucket(tpm)
+        self._classes = {
+            name: _PriorityClass(name, **settings) for name, settings in (classes or DEFAULT_CLASSES).items()
+        }
+        self._cond = threading.Condition()
+        self._in_flight = 0
+
+    def acquire(self, class_name: str, tokens: int):
+        """
+        为一次调用领取名额，tokens 为预估的 Token 数（提示词 + 最大输出）。
+        返回票据，调用结束后必须传给 release。
+        """
+        cls = self._classes.get(class_name) or self._classes['standard']
+        # 单次预估超过该等级可用的全部额度时按可用额度计，避免永远无法放行
+        tokens = min(tokens, self._tpm.capacity * (1 - cls.reserve))
+        ticket = object()
+        start = time.monotonic()
+
+        with self._cond:
+            if len(cls.queue) >= cls.max_queue:
+                cls.shed += 1
+                raise LLMOverloaded(f"{cls.name} 队列已满")
+
+            cls.queue.append(ticket)
+            deadline = start + cls.max_wait
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._rpm.refill(now)
+                    self._tpm.refill(now)
+
+                    if cls.queue[0] is ticket and not self._yield_to_higher(cls) and self._admissible(cls, tokens):
+                        cls.queue.popleft()
+                        cls.in_flight += 1
+                        cls.admitted += 1
+                        cls.waits.append(now - start)
+                        self._in_flight += 1
+                        self._rpm.level -= 1
+                        self._tpm.level -= tokens
+                        # 队列中的下一个请求可能也可以放行了
+                        self._cond.notify_all()
+                        return cls.name, tokens
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        cls.shed += 1
+                        raise LLMOverloaded(f"{cls.name} 排队超时")
+
+                    # 额度不足时最多睡到额度补足；并发名额由 release 唤醒
+                    self._cond.wait(min(remaining, max(0.05, self._seconds_until_budget(cls, tokens))))
+            except BaseException:
+                if ticket in cls.queue:
+                    cls.queue.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+    def release(self, ticket, actual_tokens: int = None):
+        """归还名额；actual_tokens 为实际用量，与预估的差额在 TPM 令牌桶中补回或扣除"""
+        class_name, estimated = ticket
+        with self._cond:
+            cls = self._classes[class_name]
+            cls.in_flight -= 1
+            self._in_flight -= 1
+            if actual_tokens is not None:
+                self._tpm.level = min(self._tpm.capacity, self._tpm.level + estimated - actual_tokens)
+            self._cond.notify_all()
+
+    def _yield_to_higher(self, cls: _PriorityClass) -> bool:
+        """更高优先级的等级有请求在排队、且没有被其自身的并发上限卡住时，让它先走"""
+        for other in self._classes.values():
+            if other.priority < cls.priority and other.queue and other.in_flight < other.max_concurrency:
+                return True
+        return False
+
+    def _admissible(self, cls: _PriorityClass, tokens: float) -> bool:
+        return (self._in_flight < self.max_concurrency
+                and cls.in_flight < cls.max_concurrency
+                and self._rpm.level >= 1 + cls.reserve * self._rpm.capacity
+                and self._tpm.level >= tokens + cls.reserve * self._tpm.capacity)
+
+    def _seconds_until_budget(self, cls: _PriorityClass, tokens: float) -> float:
+        return max(self._rpm.seconds_until(1 + cls.reserve * self._rpm.capacity),
+                   self._tpm.seconds_until(tokens + cls.reserve * self._tpm.capacity))
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self._rpm.refill(now)
+            self._tpm.refill(now)
+            return {
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'rpm_available': int(self._rpm.level),
+                'rpm_limit': int(self._rpm.capacity),
+                'tpm_available': int(self._tpm.level),
+                'tpm_limit': int(self._tpm.capacity),
+                'classes': {name: cls.to_dict() for name, cls in self._classes.items()},
+            }
+
+
+def _class_settings(name: str, priority: int, max_concurrency: int, max_queue: int, max_wait: float,
+                    reserve: float) -> dict:
+    """等级参数，可用 LLM_<等级>_CONCURRENCY / _MAX_QUEUE / _MAX_WAIT_SECONDS 环境变量覆盖"""
+    prefix = f'LLM_{name.upper()}_'
+    return {
+        'priority': priority,
+        'max_concurrency': int(os.environ.get(prefix + 'CONCURRENCY') or max_concurrency),
+        'max_queue': int(os.environ.get(prefix + 'MAX_QUEUE') or max_queue),
+        'max_wait': float(os.environ.get(prefix + 'MAX_WAIT_SECONDS') or max_wait),
+        'reserve': reserve,
+    }
+
+
+DEFAULT_CLASSES = {
+    # 聊天：用户逐条等待回复，排队超过 20 秒不如直接报错
+    'interactive': _class_settings('interactive', 0, 4, 50, 20, 0.0),
+    # 对战解说、锦标赛、仓库分析、流式用户分析：用户在页面上等待，但可以接受稍长的等待
+    'standard': _class_settings('standard', 1, 4, 50, 60, 0.1),
+    # 后台分析任务：可以长时间排队，且始终为前台请求保留 30% 的 RPM / TPM 额度
+    'background': _class_settings('background', 2, 2, 200, 600, 0.3),
+}
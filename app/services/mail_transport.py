@@ -0,0 +1,206 @@
+import smtplib
+import threading
+import time
+import queue
+from collections import deque
+
+from flask import current_app
+
+
+class _PooledConnection:
+    """连接池中的一条已登录的 SMTP 连接"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    邮件发送组件：维护少量已登录的 SMTP 连接，在同一连接上连续发送多封邮件，
+    避免每封邮件都重新握手 TLS 和登录。连接断开时自动重连并重试一次。
+
+    本地调试时可以把 SMTP_SERVER/SMTP_PORT 指向调试服务器（例如 `python -m aiosmtpd -n -l localhost:1025`），
+    并设置 SMTP_USE_SSL=false；服务器不支持 AUTH 时会跳过登录。
+    """
+
+    def __init__(self):
+        self._settings = None
+        self._idle = queue.LifoQueue()
+        self._slots = None
+        self._lock = threading.Lock()
+
+        # 统计数据
+        self._sent = 0
+        self._failed = 0
+        self._reconnects = 0
+        self._opened = 0
+        self._latencies = deque(maxlen=1000)
+        self._sent_times = deque(maxlen=10000)
+
+    # ------------------------------------------------------------------
+    # 配置
+    # ------------------------------------------------------------------
+    def _ensure_configured(self):
+        """从当前 app 配置读取 SMTP 参数；配置变化时丢弃旧连接"""
+        config = current_app.config
+        settings = (
+            config.get('SMTP_SERVER'),
+            int(config.get('SMTP_PORT') or 465),
+            config.get('SMTP_USER'),
+            config.get('SMTP_PASSWORD'),
+            bool(config.get('SMTP_USE_SSL', True)),
+            int(config.get('SMTP_POOL_SIZE') or 3),
+            float(config.get('SMTP_TIMEOUT') or 30),
+            int(config.get('SMTP_MAX_MESSAGES_PER_CONNECTION') or 100),
+            float(config.get('SMTP_MAX_IDLE_SECONDS') or 60),
+        )
+
+        with self._lock:
+            if settings == self._settings:
+                return settings
+            self._close_idle()
+            self._settings = settings
+            self._slots = threading.BoundedSemaphore(settings[5])
+            return settings
+
+    # ------------------------------------------------------------------
+    # 连接管理
+    # ------------------------------------------------------------------
+    def _connect(self, settings) -> _PooledConnection:
+        server, port, user, password, use_ssl, _, timeout, _, _ = settings
+        if use_ssl:
+            smtp = smtplib.SMTP_SSL(server, port, timeout=timeout)
+        else:
+            smtp = smtplib.SMTP(server, port, timeout=timeout)
+
+        smtp.ehlo()
+        if user and password and smtp.has_extn('auth'):
+            smtp.login(user, password)
+
+        with self._lock:
+            self._opened += 1
+        return _PooledConnection(smtp)
+
+    def _checkout(self, settings) -> _PooledConnection:
+        max_idle = settings[8]
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(settings)
+
+            # 空闲太久的连接可能已被服务器关闭，用 NOOP 探测一下
+            if time.time() - conn.last_used > max_idle:
+                try:
+                    if conn.smtp.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected('NOOP failed')
+                except Exception:
+                    conn.close()
+                    continue
+            return conn
+
+    def _checkin(self, conn: _PooledConnection, settings):
+        # 单条连接发送过多邮件后主动回收，避免触发服务商的单连接限额
+        if conn.sent >= settings[7]:
+            conn.close()
+            return
+        conn.last_used = time.time()
+        self._idle.put(conn)
+
+    def _close_idle(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+    def send_message(self, msg) -> bool:
+        """
+        发送一封已构造好的 MIME 邮件（使用 msg['From'] / msg['To']）。
+        成功返回 True；失败时打印错误并返回 False，调用方无需处理异常。
+        """
+        settings = self._ensure_configured()
+        slots = self._slots
+        from_addr = msg['From']
+        to_addrs = [addr.strip() for addr in msg['To'].split(',')]
+        payload = msg.as_string()
+
+        start = time.time()
+        slots.acquire()
+        try:
+            for attempt in range(2):
+                conn = None
+                try:
+                    conn = self._checkout(settings)
+                    conn.smtp.sendmail(from_addr, to_addrs, payload)
+                    conn.sent += 1
+                    self._checkin(conn, settings)
+                    self._record_success(time.time() - start)
+                    return True
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                    # 连接级错误：丢弃该连接，重新建立后重试一次
+                    if conn:
+                        conn.close()
+                    if attempt == 0:
+                        with self._lock:
+                            self._reconnects += 1
+                        continue
+                    print(f"❌ 邮件发送失败给 {', '.join(to_addrs)}: {e}")
+                except smtplib.SMTPException as e:
+                    # 收件人被拒绝等业务错误：连接仍然可用，放回池中
+                    if conn:
+                        self._checkin(conn, settings)
+                    print(f"❌ 邮件发送失败给 {', '.join(to_addrs)}: {e}")
+                break
+        finally:
+            slots.release()
+
+        with self._lock:
+            self._failed += 1
+        return False
+
+    def _record_success(self, latency: float):
+        with self._lock:
+            self._sent += 1
+            self._latencies.append(latency)
+            self._sent_times.append(time.time())
+
+    def stats(self) -> dict:
+        """发送速率、延迟和连接统计"""
+        now = time.time()
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sent_last_minute = sum(1 for t in self._sent_times if t > now - 60)
+            return {
+                'sent': self._sent,
+                'failed': self._failed,
+                'reconnects': self._reconnects,
+                'connections_opened': self._opened,
+                'idle_connections': self._idle.qsize(),
+                'send_rate_per_minute': sent_last_minute,
+                'latency_avg_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                'latency_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+            }
+
+    def close(self):
+        with self._lock:
+            self._close_idle()
+
+
+# 实例化邮件发送组件，通知服务直接导入使用
+mail_transport = SMTPConnectionPool()
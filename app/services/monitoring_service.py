@@ -1,9 +1,14 @@
 # 导入创建 App 的工厂函数
 from app import create_app
 from app.database import db
-from app.models import Item, Wish, PriceHistory
+from app.models import Item, Wish, ItemPriceStats
 from app.services.platform_router import get_service_by_url
-from app.services.notification_service import send_price_alert
+from app.services.outbox_service import outbox_service
+from app.services.cache_service import wishlist_cache
+from app.services.price_history_service import price_history_service
+from app.services.price_stats_service import price_stats_service
+from app.services.event_bus import event_bus
+from app.services.change_log_service import change_log_service
 # 导入 Flask，但仅用于类型提示，不用于创建实例
 from flask import Flask
 
@@ -50,31 +55,64 @@ def run_price_monitoring(config_name: str):
                     print(f"   -> ERROR: 价格获取失败，跳过记录和通知。")
                     continue
 
-                # 5. 记录最新价格
-                latest_history = PriceHistory(
-                    item_id=item.id,
-                    price=new_price
-                )
-                db.session.add(latest_history)
-                db.session.commit()
-                print(f"   -> 最新价格已记录: ¥{new_price:.2f}")
+                # 占位商品（后台补全失败或进程重启时遗留）在这里顺带补全标题和图片
+                item_changed = False
+                if item.enrich_status != 'ready':
+                    item.title = item_data['title']
+                    item.image_url = item_data['image_url']
+                    item.enrich_status = 'ready'
+                    item_changed = True
+
+                # 5. 记录最新价格，并在同一事务中增量更新价格统计
+                previous_stats = db.session.get(ItemPriceStats, item.id)
+                previous_price = previous_stats.last_price if previous_stats else None
+                # record_price 会原地修改同一个统计对象，必须先取出旧的对外统计数据
+                previous_summary = price_stats_service.to_dict(previous_stats)
+                stats = price_stats_service.record_price(item.id, new_price)
+                price_changed = previous_price != new_price
+                is_all_time_low = new_price <= stats.all_time_low
+                price_summary = price_stats_service.to_dict(stats)
+
+                # 心愿行里带有均价、近期最低价等统计数据，价格不变时它们也会漂移；
+                # 价格、统计数据或商品信息真正变化时才写变更日志，增量同步不会因为每轮监控而返回全部心愿
+                if price_changed or item_changed or price_summary != previous_summary:
+                    change_log_service.record_item(item.id)
 
-                # 6. 检查并触发通知
+                # 6. 检查并写入通知发件箱（与价格记录同一事务提交，由后台投递任务发送邮件）
                 wishes_for_item = Wish.query.filter_by(item_id=item.id, is_active=True).all()
                 for wish in wishes_for_item:
                     if new_price <= wish.target_price:
                         print(f"   -> 🔔 触发通知: {item.title} 图片URL: {item.image_url}")  # 增加调试日志
 
-                        # 🚨 关键修改：传入 image_url
-                        send_price_alert(
+                        outbox_service.enqueue_price_alert(
                             user_id=wish.user_id,
+                            item_id=item.id,
                             item_title=item.title,
                             current_price=new_price,
                             target_price=wish.target_price,
-                            image_url=item.image_url,  # <--- 确保这里取到了值
-                            item_url=item.original_url
+                            image_url=item.image_url,
+                            item_url=item.original_url,
+                            is_all_time_low=is_all_time_low,
+                            percent_below_usual=price_summary['percent_below_usual']
                         )
 
+                db.session.commit()
+                wishlist_cache.invalidate_item(item.id)
+                price_history_service.invalidate_item(item.id)
+
+                # 提交后再推送实时事件，客户端收到事件时数据已可查询
+                for wish in (wishes_for_item if price_changed else []):
+                    event_bus.publish(wish.user_id, 'price', {
+                        'wish_id': wish.id,
+                        'item_id': item.id,
+                        'latest_price': new_price,
+                        'target_price': wish.target_price,
+                        'reached': new_price <= wish.target_price,
+                        'is_all_time_low': is_all_time_low,
+                        **price_summary
+                    })
+                print(f"   -> 最新价格已记录: ¥{new_price:.2f}")
+
             except Exception as e:
                 # 在事务失败时进行回滚
                 db.session.rollback()
@@ -0,0 +1,298 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.llm_scheduler import LLMScheduler, LLMOverloaded
+from app.services.prompt_builder import estimate_tokens
+
+# 这些状态码表示限流或服务端临时故障，可以退避后重试
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 调用方 -> 调度优先级等级（见 LLMScheduler），未列出的调用方按 standard 处理
+ENDPOINT_CLASSES = {
+    'chat': 'interactive',
+    'battle': 'standard',
+    'battle_stream': 'standard',
+    'tournament': 'standard',
+    'analyze_repo': 'standard',
+    'analyze_user_stream': 'standard',
+    'analyze_user': 'background',
+}
+# 请求未指定 max_tokens 时预估的输出 Token 数
+DEFAULT_OUTPUT_TOKENS = 1024
+
+
+class MoonshotError(Exception):
+    """Moonshot API 调用失败；status 为 HTTP 状态码（网络错误时为 None），detail 为服务端返回的错误信息"""
+
+    def __init__(self, message: str, status: int = None, detail: str = None):
+        super().__init__(message)
+        self.status = status
+        self.detail = detail or message
+
+
+class _EndpointStats:
+    """单个调用方（endpoint）的累计用量和延迟"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=500)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens,
+            'latency_avg_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            'latency_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+        }
+
+
+class MoonshotClient:
+    """
+    Moonshot（Kimi）API 客户端，所有大模型调用共用：
+    - 一个带连接池的 requests.Session，复用 TLS 连接
+    - 遇到 429 / 5xx / 网络错误时指数退避重试（优先遵循 Retry-After）
+    - 所有请求先经过 LLMScheduler 准入：按调用方的优先级排队，受并发数和 RPM / TPM 额度限制，
+      过载时低优先级请求先被拒绝（抛出 status 为 429 的 MoonshotError）
+    - 按调用方（endpoint）汇总调用次数、重试、Token 用量和延迟，见 stats()
+    流式调用只在收到响应头之前重试，已经开始输出后出错直接抛出。
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 60, max_retries: int = 2,
+                 backoff_base: float = 1.0, backoff_max: float = 20, max_concurrency: int = 8, rpm: int = 200,
+                 tpm: int = 128000):
+        self.api_key = api_key
+        self.base_url = (base_url or "https://api.moonshot.cn/v1").rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self.scheduler = LLMScheduler(max_concurrency=max_concurrency, rpm=rpm, tpm=tpm)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    # ------------------------------------------------------------------
+    # 调用
+    # ------------------------------------------------------------------
+    def chat(self, endpoint: str, payload: dict, timeout=None) -> dict:
+        """
+        非流式调用 /chat/completions，返回解析后的完整响应 JSON。
+        endpoint 是调用方名称，仅用于统计。失败时抛出 MoonshotError。
+        """
+        ticket = self._acquire(endpoint, payload)
+        start = time.time()
+        usage = None
+        try:
+            response = self._post(endpoint, payload, timeout or self.timeout)
+            try:
+                result = response.json()
+            except ValueError:
+                raise MoonshotError("API 返回格式异常", response.status_code)
+            usage = result.get('usage')
+            self._record(endpoint, start, usage)
+            return result
+        except MoonshotError:
+            self._record(endpoint, start, error=True)
+            raise
+        finally:
+            self._release(ticket, usage)
+
+    def complete(self, endpoint: str, payload: dict, timeout=None) -> str:
+        """chat 的便捷版本：只返回第一条回复的文本"""
+        result = self.chat(endpoint, payload, timeout)
+        try:
+            return result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise MoonshotError("API 返回格式异常")
+
+    def stream(self, endpoint: str, payload: dict, timeout=(10, 60), usage_out: dict = None):
+        """
+        流式调用（stream=True），逐个 yield 模型输出的文本增量。
+        timeout 为 (连接超时, 两段数据之间的最长间隔)。生成器结束前一直占用一个并发名额。
+        传入 usage_out 时，正常结束后会把本次调用的 Token 用量写入其中。
+        """
+        payload = dict(payload, stream=True)
+        ticket = self._acquire(endpoint, payload)
+        start = time.time()
+        usage = None
+
+        try:
+            response = self._post(endpoint, payload, timeout, stream=True)
+            with response:
+                # 响应体是 SSE 格式：每行 "data: {...}"，以 "data: [DONE]" 结束。
+                # 按字节读取后自行用 UTF-8 解码：Content-Type 不带 charset 时 requests 会按 ISO-8859-1 解码，中文变成乱码
+                for raw in response.iter_lines():
+                    line = raw.decode('utf-8')
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        self._record(endpoint, start, usage)
+                        if usage_out is not None and usage:
+                            usage_out.update(usage)
+                        return
+
+                    chunk = json.loads(data)
+                    choice = chunk['choices'][0]
+                    # 最后一个数据块携带本次调用的 Token 用量
+                    usage = chunk.get('usage') or choice.get('usage') or usage
+                    delta = choice.get('delta', {}).get('content')
+                    if delta:
+                        yield delta
+
+            raise MoonshotError("AI 响应流意外结束")
+        except requests.exceptions.Timeout:
+            self._record(endpoint, start, usage, error=True)
+            raise MoonshotError("AI 响应超时")
+        except requests.exceptions.RequestException as e:
+            self._record(endpoint, start, usage, error=True)
+            raise MoonshotError(f"网络错误: {str(e)}")
+        except (KeyError, IndexError, ValueError):
+            self._record(endpoint, start, usage, error=True)
+            raise MoonshotError("API 返回格式异常")
+        except MoonshotError:
+            self._record(endpoint, start, usage, error=True)
+            raise
+        finally:
+            self._release(ticket, usage)
+
+    def _post(self, endpoint: str, payload: dict, timeout, stream: bool = False) -> requests.Response:
+        """发送请求并在可重试的错误上退避重试；返回状态码为 200 的响应"""
+        if not self.api_key:
+            raise MoonshotError("后端未配置 MOONSHOT_API_KEY")
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = self._session.post(f"{self.base_url}/chat/completions", headers=headers, json=payload,
+                                              timeout=timeout, stream=stream)
+                if response.status_code == 200:
+                    return response
+
+                error = self._to_error(response)
+                if response.status_code not in RETRY_STATUS:
+                    raise error
+                retry_after = response.headers.get('Retry-After')
+                response.close()
+            except requests.exceptions.Timeout:
+                error = MoonshotError("AI 响应超时")
+            except requests.exceptions.RequestException as e:
+                error = MoonshotError(f"网络错误: {str(e)}")
+
+            if attempt >= self.max_retries:
+                raise error
+
+            attempt += 1
+            with self._lock:
+                self._endpoint_locked(endpoint).retries += 1
+            delay = self._backoff(attempt, retry_after)
+            print(f"[AI] {endpoint} 调用失败（{error}），{delay:.1f} 秒后第 {attempt} 次重试")
+            time.sleep(delay)
+
+    @staticmethod
+    def _to_error(response: requests.Response) -> MoonshotError:
+        detail = response.text
+        try:
+            detail = response.json().get('error', {}).get('message', detail)
+        except (ValueError, AttributeError):
+            pass
+        return MoonshotError(f"AI 服务异常 ({response.status_code}): {detail}", response.status_code, detail)
+
+    def _backoff(self, attempt: int, retry_after) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        # 加入随机抖动，避免多个请求同时重试
+        return delay * random.uniform(0.5, 1.0)
+
+    # ------------------------------------------------------------------
+    # 准入调度与统计
+    # ------------------------------------------------------------------
+    def _acquire(self, endpoint: str, payload: dict):
+        """按调用方的优先级等级领取名额；被调度器拒绝时抛出 MoonshotError(status=429)"""
+        tokens = sum(estimate_tokens(m['content'] if isinstance(m.get('content'), str) else json.dumps(m.get('content')))
+                     for m in payload.get('messages', []))
+        tokens += payload.get('max_tokens') or DEFAULT_OUTPUT_TOKENS
+        try:
+            return self.scheduler.acquire(ENDPOINT_CLASSES.get(endpoint, 'standard'), tokens)
+        except LLMOverloaded as e:
+            print(f"[AI] {endpoint} 请求被限流: {e}")
+            raise MoonshotError(f"AI 服务繁忙，请稍后再试（{e}）", 429, "AI 服务繁忙，请稍后再试")
+
+    def _release(self, ticket, usage: dict = None):
+        actual = usage.get('total_tokens') if usage else None
+        self.scheduler.release(ticket, actual)
+
+    def _endpoint_locked(self, endpoint: str) -> _EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats()
+        return stats
+
+    def _record(self, endpoint: str, start: float, usage: dict = None, error: bool = False):
+        with self._lock:
+            stats = self._endpoint_locked(endpoint)
+            stats.calls += 1
+            stats.latencies.append(time.time() - start)
+            if error:
+                stats.errors += 1
+            if usage:
+                stats.prompt_tokens += usage.get('prompt_tokens', 0) or 0
+                stats.completion_tokens += usage.get('completion_tokens', 0) or 0
+
+    def stats(self) -> dict:
+        """调度器状态（各优先级等级的排队数、等待时间），以及按调用方汇总的调用次数、Token 用量和延迟"""
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in self._endpoints.items()}
+        return {
+            'scheduler': self.scheduler.stats(),
+            'endpoints': endpoints,
+        }
+
+
+# 实例化客户端，AI 分析服务和聊天接口共享同一个实例；base_url 由 create_app 按配置项 MOONSHOT_BASE_URL 设置
+moonshot_client = MoonshotClient(
+    api_key=os.environ.get('MOONSHOT_API_KEY'),
+    timeout=float(os.environ.get('MOONSHOT_TIMEOUT') or 60),
+    max_retries=int(os.environ.get('MOONSHOT_MAX_RETRIES') or 2),
+    backoff_base=float(os.environ.get('MOONSHOT_BACKOFF_BASE_SECONDS') or 1),
+    backoff_max=float(os.environ.get('MOONSHOT_BACKOFF_MAX_SECONDS') or 20),
+    max_concurrency=int(os.environ.get('MOONSHOT_MAX_CONCURRENCY') or 8),
+    rpm=int(os.environ.get('MOONSHOT_RPM_LIMIT') or 200),
+    tpm=int(os.environ.get('MOONSHOT_TPM_LIMIT') or 128000)
+)
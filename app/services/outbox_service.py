@@ -0,0 +1,306 @@
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.database import db
+from app.models import NotificationOutbox
+from app.services.notification_service import (
+    send_price_alert, send_unlock_notification, send_price_digest, load_recipients
+)
+
+# 领取后超过该时间仍未完成的通知视为投递任务中途崩溃，重新放回待发送队列
+STALE_CLAIM_MINUTES = 10
+
+
+class OutboxService:
+    """
+    通知发件箱服务。
+    - 写入端：enqueue_* 只把通知加入当前数据库会话，由调用方与触发事件一起 commit
+    - 投递端：deliver_due 领取到期的通知，交给线程池并发发送，失败后指数退避重试，重试耗尽进入死信
+    - 汇总模式（NOTIFICATION_DIGEST_ENABLED）：降价提醒延迟一个汇总窗口再发送，
+      届时同一用户所有待发送的降价提醒合并成一封邮件
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._executor_size = None
+
+    # ------------------------------------------------------------------
+    # 写入端
+    # ------------------------------------------------------------------
+    @staticmethod
+    def enqueue(user_id: int, kind: str, payload: dict, delay_seconds: int = 0) -> NotificationOutbox:
+        entry = NotificationOutbox(
+            user_id=user_id,
+            kind=kind,
+            payload=json.dumps(payload, ensure_ascii=False),
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay_seconds)
+        )
+        db.session.add(entry)
+        return entry
+
+    @staticmethod
+    def enqueue_price_alert(user_id: int, item_id: int, item_title: str, current_price: float, target_price: float,
+                            image_url: str = None, item_url: str = None, is_all_time_low: bool = False,
+                            percent_below_usual: float = None) -> NotificationOutbox:
+        # 汇总模式下延迟一个窗口，让同一用户在窗口内的其他降价提醒有机会合并
+        config = current_app.config
+        delay = int(config.get('NOTIFICATION_DIGEST_WINDOW_SECONDS') or 0) \
+            if config.get('NOTIFICATION_DIGEST_ENABLED') else 0
+
+        return OutboxService.enqueue(user_id, 'price_alert', {
+            'item_id': item_id,
+            'item_title': item_title,
+            'current_price': current_price,
+            'target_price': target_price,
+            'image_url': image_url,
+            'item_url': item_url,
+            'is_all_time_low': is_all_time_low,
+            'percent_below_usual': percent_below_usual
+        }, delay_seconds=delay)
+
+    @staticmethod
+    def enqueue_unlock_notification(user_id: int, item_title: str, item_url: str, condition_desc: str,
+                                    image_url: str = None) -> NotificationOutbox:
+        return OutboxService.enqueue(user_id, 'unlock', {
+            'item_title': item_title,
+            'item_url': item_url,
+            'condition_desc': condition_desc,
+            'image_url': image_url
+        })
+
+    # ------------------------------------------------------------------
+    # 投递端
+    # ------------------------------------------------------------------
+    def deliver_due(self, app=None) -> int:
+        """
+        持续领取并发送到期的通知，直到队列中没有到期条目。返回本次处理的条目数。
+        必须在 app_context 中调用，或显式传入 app 实例。
+        """
+        app = app or current_app._get_current_object()
+        config = app.config
+        batch_size = int(config.get('OUTBOX_BATCH_SIZE') or 100)
+        digest_enabled = bool(config.get('NOTIFICATION_DIGEST_ENABLED'))
+        executor = self._get_executor(int(config.get('OUTBOX_WORKERS') or 4))
+
+        with app.app_context():
+            self._release_stale_claims()
+
+            processed = 0
+            while True:
+                entries = self._claim_batch(batch_size, digest_enabled)
+                if not entries:
+                    break
+
+                # 收件人一次性批量加载，工作线程中不再逐封查询 User
+                recipients = load_recipients(entry.user_id for entry in entries)
+                groups = self._group_entries(entries, digest_enabled)
+
+                # 每个工作线程独立推入 app_context，拥有自己的数据库会话
+                list(executor.map(
+                    lambda group: self._deliver_group(app, group[0], recipients.get(group[1]), group[2]),
+                    groups
+                ))
+                processed += len(entries)
+
+            return processed
+
+    def _get_executor(self, size: int) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_size != size:
+            self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='outbox')
+            self._executor_size = size
+        return self._executor
+
+    @staticmethod
+    def _release_stale_claims():
+        deadline = datetime.utcnow() - timedelta(minutes=STALE_CLAIM_MINUTES)
+        NotificationOutbox.query.filter(
+            NotificationOutbox.status == 'sending',
+            NotificationOutbox.claimed_at < deadline
+        ).update({'status': 'pending', 'claim_token': None}, synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def _claim_batch(batch_size: int, digest_enabled: bool = False) -> list:
+        """
+        领取一批到期通知：先查出候选 ID，再用带 status 条件的 UPDATE 打上本次的领取标记，
+        多个投递任务并发运行时，同一条通知只会被其中一个领取成功。
+        汇总模式下，只要某用户有一条降价提醒到期，就把该用户所有待发送的降价提醒一起领取。
+        返回领取到的 NotificationOutbox 列表。
+        """
+        now = datetime.utcnow()
+        due = db.session.query(NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.kind).filter(
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.id.asc()).limit(batch_size).all()
+
+        if not due:
+            return []
+
+        candidate_ids = [row[0] for row in due]
+        if digest_enabled:
+            digest_users = {row[1] for row in due if row[2] == 'price_alert'}
+            if digest_users:
+                candidate_ids += [row[0] for row in db.session.query(NotificationOutbox.id).filter(
+                    NotificationOutbox.status == 'pending',
+                    NotificationOutbox.kind == 'price_alert',
+                    NotificationOutbox.user_id.in_(digest_users),
+                    NotificationOutbox.attempts == 0
+                ).all()]
+
+        token = str(uuid.uuid4())
+        NotificationOutbox.query.filter(
+            NotificationOutbox.id.in_(set(candidate_ids)),
+            NotificationOutbox.status == 'pending'
+        ).update({'status': 'sending', 'claim_token': token, 'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+
+        return NotificationOutbox.query.filter(
+            NotificationOutbox.claim_token == token
+        ).order_by(NotificationOutbox.id.asc()).all()
+
+    @staticmethod
+    def _group_entries(entries: list, digest_enabled: bool) -> list:
+        """
+        把领取到的通知分组为发送任务：[(kind, user_id, [entry_id, ...]), ...]
+        汇总模式下同一用户的降价提醒合并为一个 'price_digest' 任务，其余通知各自独立发送。
+        """
+        groups = []
+        digests = {}
+        for entry in entries:
+            if digest_enabled and entry.kind == 'price_alert':
+                digests.setdefault(entry.user_id, []).append(entry.id)
+            else:
+                groups.append((entry.kind, entry.user_id, [entry.id]))
+
+        for user_id, entry_ids in digests.items():
+            kind = 'price_digest' if len(entry_ids) > 1 else 'price_alert'
+            groups.append((kind, user_id, entry_ids))
+        return groups
+
+    def _deliver_group(self, app, kind: str, recipient, entry_ids: list):
+        with app.app_context():
+            entries = NotificationOutbox.query.filter(
+                NotificationOutbox.id.in_(entry_ids),
+                NotificationOutbox.status == 'sending'
+            ).order_by(NotificationOutbox.id.asc()).all()
+            if not entries:
+                return
+
+            try:
+                result = self._send(kind, entries, recipient)
+                error = None if result is not False else 'SMTP 发送失败'
+            except Exception as e:
+                result, error = False, str(e)
+
+            try:
+                for entry in entries:
+                    if result is None:
+                        entry.status = 'skipped'
+                        entry.last_error = '收件人不存在或未设置邮箱'
+                    elif result:
+                        entry.status = 'sent'
+                        entry.sent_at = datetime.utcnow()
+                    else:
+                        self._schedule_retry(entry, error, app.config)
+                    entry.claim_token = None
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ 更新通知 {entry_ids} 状态失败: {e}")
+
+    @staticmethod
+    def _send(kind: str, entries: list, recipient):
+        if recipient is None:
+            return None
+
+        if kind == 'price_digest':
+            # 同一商品在窗口内可能被多次提醒，只保留最新的一条
+            latest_by_item = {}
+            for entry in entries:
+                payload = json.loads(entry.payload)
+                latest_by_item[payload.get('item_id') or entry.id] = payload
+            return send_price_digest(recipient.id, list(latest_by_item.values()), user=recipient)
+
+        entry = entries[0]
+        payload = json.loads(entry.payload)
+
+        if kind == 'price_alert':
+            return send_price_alert(
+                user_id=entry.user_id,
+                item_title=payload['item_title'],
+                current_price=payload['current_price'],
+                target_price=payload['target_price'],
+                image_url=payload.get('image_url'),
+                item_url=payload.get('item_url'),
+                is_all_time_low=payload.get('is_all_time_low', False),
+                percent_below_usual=payload.get('percent_below_usual'),
+                user=recipient
+            )
+        if kind == 'unlock':
+            return send_unlock_notification(
+                entry.user_id,
+                payload['item_title'],
+                payload['item_url'],
+                payload['condition_desc'],
+                payload.get('image_url'),
+                user=recipient
+            )
+
+        raise ValueError(f"未知的通知类型: {kind}")
+
+    @staticmethod
+    def _schedule_retry(entry: NotificationOutbox, error: str, config):
+        max_attempts = int(config.get('OUTBOX_MAX_ATTEMPTS') or 6)
+        base = int(config.get('OUTBOX_BACKOFF_BASE_SECONDS') or 30)
+        cap = int(config.get('OUTBOX_BACKOFF_MAX_SECONDS') or 3600)
+
+        entry.attempts = (entry.attempts or 0) + 1
+        entry.last_error = (error or '')[:512]
+
+        if entry.attempts >= max_attempts:
+            entry.status = 'dead'
+            print(f"☠️ 通知 {entry.id} 重试 {entry.attempts} 次仍失败，已转入死信: {error}")
+            return
+
+        delay = min(cap, base * (2 ** (entry.attempts - 1)))
+        entry.status = 'pending'
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    @staticmethod
+    def stats() -> dict:
+        """各状态的通知数量"""
+        rows = db.session.query(NotificationOutbox.status, db.func.count(NotificationOutbox.id)).group_by(
+            NotificationOutbox.status
+        ).all()
+        return {status: count for status, count in rows}
+
+
+# 实例化服务
+outbox_service = OutboxService()
+
+# 后台任务使用的 App 实例缓存，避免每次轮询都重新创建
+_apps = {}
+
+
+def run_outbox_delivery(config_name: str):
+    """
+    通知投递任务。由 APScheduler 按 OUTBOX_POLL_SECONDS 间隔调用。
+    """
+    from app import create_app
+
+    app = _apps.get(config_name)
+    if app is None:
+        app = _apps[config_name] = create_app(config_name)
+
+    try:
+        processed = outbox_service.deliver_due(app)
+        if processed:
+            print(f"--- 📮 通知投递完成，本轮处理 {processed} 条 ---")
+    except Exception as e:
+        print(f"❌ 通知投递任务执行失败: {e}")
@@ -0,0 +1,205 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.database import db
+from app.models import PriceHistory
+from app.services.cache_service import TTLCache
+
+# 支持的时间范围
+RANGES = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+    '90d': timedelta(days=90),
+    '1y': timedelta(days=365),
+    'all': None,
+}
+
+# 支持的 OHLC 分桶粒度（秒）
+RESOLUTIONS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600,
+    '4h': 4 * 3600,
+    '1d': 86400,
+    '1w': 7 * 86400,
+}
+
+# resolution=auto 时的目标桶数量
+AUTO_TARGET_BUCKETS = 500
+# LTTB 模式允许的最大目标点数
+MAX_LTTB_POINTS = 5000
+
+
+class PriceHistoryService:
+    """
+    价格历史查询服务：从数据库取出原始价格序列，在服务端降采样后返回给前端图表。
+    支持两种模式：
+    - ohlc: 按时间桶聚合出 开/高/低/收 四个价格
+    - lttb: Largest-Triangle-Three-Buckets 算法，保留曲线形状的同时压缩到目标点数
+    """
+
+    def __init__(self, cache_ttl: float = 600):
+        self._cache = TTLCache(maxsize=2048, ttl=cache_ttl)
+        # 每个商品的数据版本，记录新价格时递增，旧版本的缓存条目自然失效
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def invalidate_item(self, item_id: int):
+        with self._lock:
+            self._versions[item_id] = self._versions.get(item_id, 0) + 1
+
+    def get_history(self, item_id: int, range_key: str = '30d', mode: str = 'ohlc',
+                    resolution: str = 'auto', points: int = 500) -> dict:
+        """
+        返回降采样后的价格历史（列式结构，体积更小）。
+        参数错误时抛出 ValueError。
+        """
+        if range_key not in RANGES:
+            raise ValueError(f"不支持的时间范围: {range_key}，可选值: {', '.join(RANGES)}")
+        if mode not in ('ohlc', 'lttb'):
+            raise ValueError("mode 只能是 ohlc 或 lttb")
+        if mode == 'ohlc' and resolution != 'auto' and resolution not in RESOLUTIONS:
+            raise ValueError(f"不支持的粒度: {resolution}，可选值: auto, {', '.join(RESOLUTIONS)}")
+        if mode == 'lttb':
+            points = max(3, min(int(points), MAX_LTTB_POINTS))
+
+        with self._lock:
+            version = self._versions.get(item_id, 0)
+        cache_key = (item_id, version, range_key, mode, resolution if mode == 'ohlc' else points)
+
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        timestamps, prices = self._fetch_series(item_id, RANGES[range_key])
+
+        result = {
+            'item_id': item_id,
+            'range': range_key,
+            'mode': mode,
+            'raw_count': int(len(prices)),
+        }
+
+        if mode == 'ohlc':
+            bucket_seconds = self._pick_bucket(timestamps, resolution)
+            result['resolution'] = self._resolution_name(bucket_seconds)
+            result['series'] = self.ohlc(timestamps, prices, bucket_seconds)
+        else:
+            result['points'] = points
+            t, p = self.lttb(timestamps, prices, points)
+            result['series'] = {'t': t.tolist(), 'p': p.tolist()}
+
+        self._cache.set(cache_key, result)
+        return result
+
+    def _fetch_series(self, item_id: int, span):
+        """按时间顺序取出 (时间戳秒数, 价格) 两个 NumPy 数组"""
+        query = db.session.query(PriceHistory.timestamp, PriceHistory.price).filter(
+            PriceHistory.item_id == item_id,
+            PriceHistory.price >= 0
+        )
+        if span is not None:
+            query = query.filter(PriceHistory.timestamp >= datetime.utcnow() - span)
+
+        rows = query.order_by(PriceHistory.timestamp.asc()).all()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        timestamps = np.array([row[0] for row in rows], dtype='datetime64[s]').astype(np.int64)
+        prices = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return timestamps, prices
+
+    @staticmethod
+    def _pick_bucket(timestamps, resolution: str) -> int:
+        if resolution != 'auto':
+            return RESOLUTIONS[resolution]
+        if len(timestamps) < 2:
+            return RESOLUTIONS['1h']
+
+        # 选择能让桶数不超过 AUTO_TARGET_BUCKETS 的最细粒度
+        span = int(timestamps[-1] - timestamps[0])
+        for seconds in sorted(RESOLUTIONS.values()):
+            if span / seconds <= AUTO_TARGET_BUCKETS:
+                return seconds
+        return RESOLUTIONS['1w']
+
+    @staticmethod
+    def _resolution_name(bucket_seconds: int) -> str:
+        for name, seconds in RESOLUTIONS.items():
+            if seconds == bucket_seconds:
+                return name
+        return f"{bucket_seconds}s"
+
+    @staticmethod
+    def ohlc(timestamps, prices, bucket_seconds: int) -> dict:
+        """
+        向量化的时间桶 OHLC 聚合。要求 timestamps 已按升序排列。
+        返回列式字典：t(桶起始时间) / o / h / l / c / n(桶内样本数)
+        """
+        if len(prices) == 0:
+            return {'t': [], 'o': [], 'h': [], 'l': [], 'c': [], 'n': []}
+
+        bucket_ids = timestamps // bucket_seconds
+        # 桶编号发生变化的位置即为新桶的起点
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket_ids)) + 1))
+        ends = np.concatenate((starts[1:], [len(prices)]))
+
+        return {
+            't': (bucket_ids[starts] * bucket_seconds).tolist(),
+            'o': prices[starts].tolist(),
+            'h': np.maximum.reduceat(prices, starts).tolist(),
+            'l': np.minimum.reduceat(prices, starts).tolist(),
+            'c': prices[ends - 1].tolist(),
+            'n': (ends - starts).tolist(),
+        }
+
+    @staticmethod
+    def lttb(timestamps, prices, threshold: int):
+        """
+        Largest-Triangle-Three-Buckets 降采样，返回 (timestamps, prices) 两个数组。
+        每个桶内的三角形面积计算是向量化的，循环次数只与目标点数有关。
+        """
+        n = len(prices)
+        if threshold >= n or n <= 2:
+            return timestamps, prices
+
+        x = timestamps.astype(np.float64)
+        y = prices
+        selected = np.empty(threshold, dtype=np.int64)
+        selected[0] = 0
+        selected[-1] = n - 1
+
+        # 除去首尾两个点，剩余的点均分到 threshold - 2 个桶中
+        edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+        a = 0
+        for i in range(threshold - 2):
+            start, end = edges[i], edges[i + 1]
+            if end <= start:
+                end = start + 1
+
+            # 下一个桶的平均点（最后一个桶使用终点）
+            next_start = end
+            next_end = edges[i + 2] if i + 2 < len(edges) else n
+            if next_end <= next_start:
+                next_end = min(next_start + 1, n)
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+            # 选出与上一个选中点、下一个桶平均点构成最大三角形面积的点
+            areas = np.abs(
+                (x[a] - avg_x) * (y[start:end] - y[a]) -
+                (x[a] - x[start:end]) * (avg_y - y[a])
+            )
+            a = start + int(np.argmax(areas))
+            selected[i + 1] = a
+
+        return timestamps[selected], prices[selected]
+
+
+# 实例化服务
+price_history_service = PriceHistoryService()
@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+
+from app.database import db
+from app.models import Item, PriceHistory, ItemPriceStats, ItemPriceDaily
+
+# 需要维护的滑动窗口（天）
+WINDOWS = (30, 90)
+
+
+class PriceStatsService:
+    """
+    商品价格统计服务。
+    每次记录新价格时增量更新 ItemPriceStats（史低、窗口最低价、均价），单次更新是常数代价：
+    - 史低 / 最高价 / 累计和：直接比较或累加
+    - 按天汇总：按主键更新当天的一行
+    - 窗口最低价：新价格更低时直接替换；只有当前最低价滑出窗口时，才从至多 90 行的按天汇总中重新计算
+    窗口按天粒度计算，即“近 30 天”包含 30 天前的那一整天。
+    """
+
+    @staticmethod
+    def record_price(item_id: int, price: float, timestamp: datetime = None) -> ItemPriceStats:
+        """
+        写入一条价格历史并同步更新统计数据（不提交事务，由调用方统一 commit）。
+        返回更新后的 ItemPriceStats。
+        """
+        timestamp = timestamp or datetime.utcnow()
+        db.session.add(PriceHistory(item_id=item_id, price=price, timestamp=timestamp))
+
+        stats = db.session.get(ItemPriceStats, item_id)
+        if stats is None:
+            stats = ItemPriceStats(item_id=item_id, price_sum=0, price_count=0)
+            db.session.add(stats)
+
+        daily = db.session.get(ItemPriceDaily, (item_id, timestamp.date()))
+        if daily is None:
+            daily = ItemPriceDaily(item_id=item_id, day=timestamp.date(),
+                                   min_price=price, max_price=price, price_sum=0, price_count=0)
+            db.session.add(daily)
+
+        PriceStatsService._apply_daily(daily, price)
+        PriceStatsService._apply(stats, price, timestamp, PriceStatsService._window_low_from_daily)
+        return stats
+
+    @staticmethod
+    def _apply_daily(daily: ItemPriceDaily, price: float):
+        daily.min_price = min(daily.min_price, price)
+        daily.max_price = max(daily.max_price, price)
+        daily.price_sum = (daily.price_sum or 0) + price
+        daily.price_count = (daily.price_count or 0) + 1
+
+    @staticmethod
+    def _apply(stats: ItemPriceStats, price: float, timestamp: datetime, recompute_window_low):
+        """把一次观测合并进统计数据；recompute_window_low(item_id, days, now) 用于窗口最低价过期时重算"""
+        stats.last_price = price
+        stats.last_timestamp = timestamp
+        stats.price_sum = (stats.price_sum or 0) + price
+        stats.price_count = (stats.price_count or 0) + 1
+        stats.updated_at = datetime.utcnow()
+
+        if stats.all_time_low is None or price <= stats.all_time_low:
+            stats.all_time_low = price
+            stats.all_time_low_at = timestamp
+        if stats.all_time_high is None or price > stats.all_time_high:
+            stats.all_time_high = price
+
+        for days in WINDOWS:
+            low = getattr(stats, f'low_{days}d')
+            low_at = getattr(stats, f'low_{days}d_at')
+
+            if low is None or price <= low:
+                low, low_at = price, timestamp
+            elif low_at.date() < (timestamp - timedelta(days=days)).date():
+                # 原最低价已滑出窗口，重新计算（包含本次价格）
+                low, low_at = recompute_window_low(stats.item_id, days, timestamp)
+                if low is None or price <= low:
+                    low, low_at = price, timestamp
+
+            setattr(stats, f'low_{days}d', low)
+            setattr(stats, f'low_{days}d_at', low_at)
+
+    @staticmethod
+    def _window_low_from_daily(item_id: int, days: int, now: datetime):
+        """从按天汇总表中找出窗口内的最低价，返回 (价格, 日期)"""
+        first_day = (now - timedelta(days=days)).date()
+        row = ItemPriceDaily.query.filter(
+            ItemPriceDaily.item_id == item_id,
+            ItemPriceDaily.day >= first_day
+        ).order_by(ItemPriceDaily.min_price.asc(), ItemPriceDaily.day.desc()).first()
+
+        if not row:
+            return None, None
+        return row.min_price, datetime.combine(row.day, datetime.min.time())
+
+    @staticmethod
+    def to_dict(stats: ItemPriceStats) -> dict:
+        """统计数据的对外格式；stats 为 None 时各字段均为 None"""
+        if stats is None or not stats.price_count:
+            return {
+                'all_time_low': None,
+                'low_30d': None,
+                'low_90d': None,
+                'avg_price': None,
+                'percent_below_usual': None
+            }
+
+        avg_price = stats.price_sum / stats.price_count
+        percent_below_usual = None
+        if avg_price > 0 and stats.last_price is not None:
+            percent_below_usual = round((avg_price - stats.last_price) / avg_price * 100, 1)
+
+        return {
+            'all_time_low': stats.all_time_low,
+            'low_30d': stats.low_30d,
+            'low_90d': stats.low_90d,
+            'avg_price': round(avg_price, 2),
+            'percent_below_usual': percent_below_usual
+        }
+
+    @staticmethod
+    def rebuild(item_id: int = None, batch_size: int = 5000) -> int:
+        """
+        根据 price_history 全量重建统计表（用于首次上线回填或数据修复）。
+        按 (item_id, timestamp) 顺序流式读取，每个商品在内存中重放后写回。返回处理的商品数量。
+        """
+        item_query = db.session.query(Item.id)
+        if item_id is not None:
+            item_query = item_query.filter(Item.id == item_id)
+        item_ids = [row[0] for row in item_query.all()]
+
+        for current_id in item_ids:
+            ItemPriceDaily.query.filter_by(item_id=current_id).delete()
+            ItemPriceStats.query.filter_by(item_id=current_id).delete()
+
+            stats = ItemPriceStats(item_id=current_id, price_sum=0, price_count=0)
+            daily_rows = {}
+
+            def window_low(_, days, now):
+                first_day = (now - timedelta(days=days)).date()
+                candidates = [daily_rows[first_day + timedelta(days=offset)]
+                              for offset in range((now.date() - first_day).days + 1)
+                              if first_day + timedelta(days=offset) in daily_rows]
+                if not candidates:
+                    return None, None
+                best = min(candidates, key=lambda d: (d.min_price, -d.day.toordinal()))
+                return best.min_price, datetime.combine(best.day, datetime.min.time())
+
+            history = db.session.query(PriceHistory.price, PriceHistory.timestamp).filter(
+                PriceHistory.item_id == current_id,
+                PriceHistory.price >= 0
+            ).order_by(PriceHistory.timestamp.asc()).yield_per(batch_size)
+
+            for price, timestamp in history:
+                day = timestamp.date()
+                daily = daily_rows.get(day)
+                if daily is None:
+                    daily = ItemPriceDaily(item_id=current_id, day=day, min_price=price,
+                                           max_price=price, price_sum=0, price_count=0)
+                    daily_rows[day] = daily
+                PriceStatsService._apply_daily(daily, price)
+                PriceStatsService._apply(stats, price, timestamp, window_low)
+
+            if stats.price_count:
+                db.session.add(stats)
+                db.session.add_all(daily_rows.values())
+            db.session.commit()
+
+        return len(item_ids)
+
+
+# 实例化服务
+price_stats_service = PriceStatsService()
@@ -0,0 +1,144 @@
+import json
+import math
+import re
+
+from app.services.cache_service import TTLCache
+
+# 可选的模型档位：(模型名, 上下文窗口 Token 数)，按窗口从小到大排列
+MODEL_TIERS = (
+    ('moonshot-v1-8k', 8192),
+    ('moonshot-v1-32k', 32768),
+    ('moonshot-v1-128k', 131072),
+)
+# 估算误差的安全余量
+TOKEN_SAFETY_MARGIN = 1.1
+_TRUNCATED = "...(truncated)"
+
+_CJK = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+# README 清洗规则
+_CODE_BLOCK = re.compile(r'```.*?```|~~~.*?~~~', re.DOTALL)
+_HTML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+_HTML_TAG = re.compile(r'<[^>]+>')
+_BADGE = re.compile(r'\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)')  # [![alt](img)](link)
+_IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_REF_LINK_DEF = re.compile(r'^\s*\[[^\]]+\]:\s*\S+.*$', re.MULTILINE)
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+_SPACES = re.compile(r'[ \t]+')
+
+# 清洗后的 README 按 blob SHA 缓存：内容不变 SHA 就不变，可以放心长期缓存
+_readme_cache = TTLCache(maxsize=2048, ttl=7 * 24 * 3600)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算 Token 数：中日韩字符按每字 1 个 Token，其余字符按每 4 个字符 1 个 Token。
+    对中文偏保守，用于分配预算和选择模型档位，不需要精确。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到大约 max_tokens 个 Token 以内"""
+    if max_tokens <= 0:
+        return ''
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # 截断标记本身也占预算；按整体的字符 / Token 比例估算截断位置，再逐步缩短直到满足预算
+    max_tokens = max(0, max_tokens - estimate_tokens(_TRUNCATED))
+    end = int(len(text) * max_tokens / estimate_tokens(text))
+    while end > 0 and estimate_tokens(text[:end]) > max_tokens:
+        end = int(end * 0.9)
+    return text[:end] + _TRUNCATED
+
+
+def clean_readme(text: str) -> str:
+    """去掉 README 中的代码块、HTML、徽章和图片，链接只保留文字，压缩空白"""
+    if not text:
+        return ''
+    text = _CODE_BLOCK.sub('', text)
+    text = _HTML_COMMENT.sub('', text)
+    text = _BADGE.sub('', text)
+    text = _IMAGE.sub('', text)
+    text = _LINK.sub(r'\1', text)
+    text = _REF_LINK_DEF.sub('', text)
+    text = _HTML_TAG.sub('', text)
+    text = _SPACES.sub(' ', text)
+    text = _BLANK_LINES.sub('\n\n', text)
+    return text.strip()
+
+
+def readme_extract(sha: str, text: str) -> str:
+    """清洗 README；sha 为 GitHub 返回的 blob SHA，相同 SHA 直接使用缓存的结果"""
+    if not sha:
+        return clean_readme(text)
+
+    cleaned = _readme_cache.get(sha)
+    if cleaned is None:
+        cleaned = clean_readme(text)
+        _readme_cache.set(sha, cleaned)
+    return cleaned
+
+
+def choose_model(prompt_tokens: int, output_tokens: int) -> str:
+    """选择能容纳 提示词 + 输出 的最小模型档位"""
+    needed = (prompt_tokens + output_tokens) * TOKEN_SAFETY_MARGIN
+    for model, window in MODEL_TIERS:
+        if needed <= window:
+            return model
+    return MODEL_TIERS[-1][0]
+
+
+class PromptBuilder:
+    """
+    按优先级在固定的 Token 预算内组装提示词的各个部分：
+    - priority 越小越先分配；每个部分最多使用 max_tokens（不填则不设上限）
+    - 文本部分超出分配额时截断；列表部分按顺序整条放入，放不下的条目直接丢弃
+    build() 返回 {部分名称: 渲染后的文本}，used 记录每个部分实际占用的 Token 数。
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.used = {}
+        self._sections = []
+
+    def add_text(self, name: str, text: str, priority: int, max_tokens: int = None):
+        self._sections.append((priority, len(self._sections), name, 'text', text or '', max_tokens))
+        return self
+
+    def add_items(self, name: str, items: list, priority: int, max_tokens: int = None, render=None):
+        """render 把单个条目转换为一行文本，默认输出紧凑 JSON"""
+        render = render or (lambda item: json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+        self._sections.append((priority, len(self._sections), name, 'items', [render(i) for i in items], max_tokens))
+        return self
+
+    def build(self) -> dict:
+        remaining = self.budget
+        result = {}
+
+        for _, _, name, kind, content, max_tokens in sorted(self._sections):
+            allowance = remaining if max_tokens is None else min(remaining, max_tokens)
+
+            if kind == 'text':
+                text = truncate_to_tokens(content, allowance)
+                tokens = estimate_tokens(text)
+            else:
+                lines, tokens = [], 0
+                for line in content:
+                    cost = estimate_tokens(line) + 1  # 换行
+                    if tokens + cost > allowance:
+                        break
+                    lines.append(line)
+                    tokens += cost
+                text = '\n'.join(lines)
+
+            result[name] = text
+            self.used[name] = tokens
+            remaining -= tokens
+
+        return result
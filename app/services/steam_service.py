@@ -4,12 +4,19 @@ from .base_platform_service import BasePlatformService
 
 # Steam Store API 的基础 URL
 # 我们使用 cc=cn (中国) 获取人民币价格, l=chinese (简体中文) 获取中文信息
+# 实际使用的地址由配置项 STEAM_API_URL 决定（create_app 中设置），可以指向本地模拟服务器（见 simulator 包）
 STEAM_API_URL = "https://store.steampowered.com/api/appdetails"
 
+# 批量查询价格时每次请求携带的 AppID 数量 (appdetails 仅在 filters=price_overview 时支持多个 appids)
+STEAM_PRICE_BATCH_SIZE = 100
+
 
 class SteamService(BasePlatformService):
     """Steam 平台数据获取服务"""
 
+    def __init__(self, api_url: str = STEAM_API_URL):
+        self.api_url = api_url
+
     def get_platform_name(self) -> str:
         return 'steam'
 
@@ -20,6 +27,48 @@ class SteamService(BasePlatformService):
             return match.group(1)  # 返回数字 AppID
         raise ValueError("无效的 Steam 商品 URL 格式")
 
+    def canonicalize_url(self, url: str) -> str:
+        # 同一款游戏的链接可能带有名称后缀、语言或追踪参数，统一成 /app/<AppID>/ 形式
+        return f"https://store.steampowered.com/app/{self.extract_item_id(url)}/"
+
+    def fetch_prices_batch(self, item_ids: list) -> dict:
+        """
+        使用 appdetails 的 price_overview 过滤器批量获取价格，每 STEAM_PRICE_BATCH_SIZE 个 AppID 一次请求。
+        返回 {item_id: price}；免费游戏为 0.00，无法获取价格的商品为 -1。
+        """
+        prices = {}
+
+        for start in range(0, len(item_ids), STEAM_PRICE_BATCH_SIZE):
+            chunk = item_ids[start:start + STEAM_PRICE_BATCH_SIZE]
+            params = {
+                'appids': ','.join(chunk),
+                'filters': 'price_overview',
+                'cc': 'cn',
+                'l': 'chinese'
+            }
+
+            try:
+                response = requests.get(self.api_url, params=params, timeout=10)
+                response.raise_for_status()
+                data = response.json() or {}
+            except (requests.RequestException, ValueError) as e:
+                print(f"Error fetching Steam prices for {len(chunk)} items (Batch Request Failed): {e}")
+                data = {}
+
+            for item_id in chunk:
+                entry = data.get(item_id) or {}
+                app_data = entry.get('data')
+
+                if not entry.get('success'):
+                    prices[item_id] = -1
+                elif isinstance(app_data, dict) and app_data.get('price_overview'):
+                    prices[item_id] = app_data['price_overview'].get('final') / 100.0
+                else:
+                    # 过滤模式下免费游戏和未发售游戏都返回空列表，无法区分，交给详情接口确认
+                    prices[item_id] = -1
+
+        return prices
+
     def fetch_item_details(self, item_id: str, url: str) -> dict:
         """
         调用 Steam Store API 获取商品详情和价格。
@@ -33,7 +82,7 @@ class SteamService(BasePlatformService):
 
         try:
             # 注意：Steam API 对爬取速度有限制，实际使用中可能需要考虑限速或代理
-            response = requests.get(STEAM_API_URL, params=params, timeout=10)
+            response = requests.get(self.api_url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
 
@@ -1,10 +1,18 @@
+import math
+
 from app.database import db
-from app.models import Item, Wish, PriceHistory, User
+from app.models import Item, Wish, User, ItemPriceStats
 from app.services.platform_router import get_service_by_url
 from sqlalchemy.exc import IntegrityError # 用于处理数据库唯一性约束错误
 
-from app.services.notification_service import send_unlock_notification
+from app.services.outbox_service import outbox_service
 from app.services.achievement_service import achievement_service
+from app.services.enrichment_service import enrichment_queue
+from app.services.cache_service import wishlist_cache
+from app.services.event_bus import event_bus
+from app.services.change_log_service import change_log_service
+from app.services.price_stats_service import price_stats_service
+from app.services.price_history_service import price_history_service
 
 class WishlistService:
 
@@ -13,87 +21,307 @@ class WishlistService:
         """
         添加一个新的心愿商品。
         如果商品已存在（相同的URL），则只创建新的 Wish 记录。
+        如果商品不存在，先写入占位 Item 并立即返回，标题、图片和首次价格由后台补全队列填充。
         """
         service = get_service_by_url(url)
         if not service:
             return None, "不支持该平台或URL格式错误"
 
-        try:
-            # 1. 解析出商品 ID
-            item_id = service.extract_item_id(url)
-
-            # 2. 尝试查找 Item 是否已存在于数据库
-            item = Item.query.filter_by(original_url=url).first()
-
-            if not item:
-                # 3. 如果 Item 不存在，调用外部服务获取详细信息
-                item_data = service.get_standard_item_data(item_id, url)
-
-                # 4. 创建新的 Item 记录
-                item = Item(
-                    platform_item_id=item_data['platform_item_id'],
-                    original_url=item_data['original_url'],
-                    title=item_data['title'],
-                    image_url=item_data['image_url'],
-                    platform=item_data['platform']
-                )
-                db.session.add(item)
-                db.session.flush()  # 临时提交，以便获取 item.id
+        # 并发添加同一个新商品时，唯一约束会让后到的请求失败，此时重新查询已存在的 Item 再试一次
+        for attempt in range(2):
+            try:
+                # 1. 解析出商品 ID，并规范化 URL（同一商品的不同链接写法只对应一条 Item）
+                item_id = service.extract_item_id(url)
+                url = service.canonicalize_url(url)
+
+                # 2. 尝试查找 Item 是否已存在于数据库
+                item = Item.query.filter_by(platform=service.get_platform_name(), platform_item_id=item_id).first()
 
-                # 5. 记录首次价格历史
-                history = PriceHistory(
+                if not item:
+                    # 3. 如果 Item 不存在，创建占位记录，不在请求线程里调用外部平台 API
+                    item = Item(
+                        platform_item_id=item_id,
+                        original_url=url,
+                        title=f"Item ID {item_id} (信息获取中)",
+                        image_url=None,
+                        platform=service.get_platform_name(),
+                        enrich_status='pending'
+                    )
+                    db.session.add(item)
+                    db.session.flush()  # 临时提交，以便获取 item.id
+
+                # 4. 创建 Wish 记录（无论 Item 是否新建）
+                # 检查用户是否已经添加过该商品
+                existing_wish = Wish.query.filter_by(user_id=user_id, item_id=item.id).first()
+                if existing_wish:
+                    return existing_wish, "该商品已存在于您的心愿单中"
+
+                # 如果没有设置条件(None)，默认为解锁(True)；否则为锁定(False)
+                is_unlocked_status = (condition_type is None)
+
+                new_wish = Wish(
+                    user_id=user_id,
                     item_id=item.id,
-                    price=item_data['current_price']
+                    target_price=target_price,
+                    is_unlocked=is_unlocked_status,
+                    unlock_condition_type=condition_type,
+                    unlock_target_value=target_value
                 )
-                db.session.add(history)
+                db.session.add(new_wish)
+                db.session.flush()
+                change_log_service.record_wish(user_id, new_wish.id, item.id)
+                db.session.commit()
+                wishlist_cache.invalidate_user(user_id)
 
-            # 6. 创建 Wish 记录（无论 Item 是否新建）
-            # 检查用户是否已经添加过该商品
-            existing_wish = Wish.query.filter_by(user_id=user_id, item_id=item.id).first()
-            if existing_wish:
-                return existing_wish, "该商品已存在于您的心愿单中"
+                # 5. 提交成功后再投递补全任务，保证后台线程能查到这条 Item
+                if item.enrich_status != 'ready':
+                    enrichment_queue.submit(item.id, item.original_url)
+                    return new_wish, "心愿添加成功，商品信息正在后台获取"
 
-            # 如果没有设置条件(None)，默认为解锁(True)；否则为锁定(False)
-            is_unlocked_status = (condition_type is None)
+                return new_wish, "心愿添加成功"
 
-            new_wish = Wish(
-                user_id=user_id,
-                item_id=item.id,
-                target_price=target_price,
-                is_unlocked=is_unlocked_status,
-                unlock_condition_type=condition_type,
-                unlock_target_value=target_value
-            )
-            db.session.add(new_wish)
-            db.session.commit()
-            return new_wish, "心愿添加成功"
+            except IntegrityError:
+                # 处理并发或唯一性约束失败的情况
+                db.session.rollback()
+                if attempt == 0:
+                    continue
+                return None, "数据库完整性错误，请稍后再试"
+            except ValueError as e:
+                db.session.rollback()
+                return None, str(e)
+            except Exception as e:
+                db.session.rollback()
+                print(f"添加心愿时发生未知错误: {e}")
+                return None, "服务处理失败"
 
-        except IntegrityError:
-            # 处理并发或唯一性约束失败的情况
-            db.session.rollback()
-            return None, "数据库完整性错误，请稍后再试"
-        except ValueError as e:
-            db.session.rollback()
-            return None, str(e)
-        except Exception as e:
-            db.session.rollback()
-            print(f"添加心愿时发生未知错误: {e}")
-            return None, "服务处理失败"
+    @staticmethod
+    def bulk_add_wishes(user_id: int, entries: list):
+        """
+        批量导入心愿。
+        entries: [{'url': ..., 'target_price': ..., 'condition_type': ..., 'target_value': ...}, ...]
+        先在内存中规范化并去重，再用少量查询和两次事务写入，最后统一投递后台补全任务。
+        返回逐条结果报告。
+        """
+        results = [None] * len(entries)
+        # (platform, platform_item_id) -> 条目信息，用于批内去重
+        unique = {}
+
+        # 1. 校验、解析并规范化每一条 URL
+        for index, entry in enumerate(entries):
+            raw_url = (entry.get('url') or '').strip()
+            report = {'index': index, 'url': raw_url, 'wish_id': None}
+            results[index] = report
+
+            service = get_service_by_url(raw_url) if raw_url else None
+            if not service:
+                report.update(status='invalid', message='不支持该平台或URL格式错误')
+                continue
+
+            try:
+                target_price = float(entry.get('target_price'))
+            except (TypeError, ValueError):
+                report.update(status='invalid', message='期望价格格式不正确')
+                continue
+            if not math.isfinite(target_price) or target_price < 0:
+                report.update(status='invalid', message='期望价格必须是不小于 0 的数字')
+                continue
+
+            try:
+                target_value = int(entry.get('target_value') or 0)
+            except (TypeError, ValueError):
+                report.update(status='invalid', message='解锁目标值格式不正确')
+                continue
+            if target_value < 0:
+                report.update(status='invalid', message='解锁目标值不能小于 0')
+                continue
+
+            try:
+                item_id = service.extract_item_id(raw_url)
+                canonical_url = service.canonicalize_url(raw_url)
+            except (ValueError, NotImplementedError) as e:
+                report.update(status='invalid', message=str(e) or '无法解析商品 URL')
+                continue
+
+            key = (service.get_platform_name(), item_id)
+            if key in unique:
+                report.update(status='duplicate', message=f"与第 {unique[key]['index'] + 1} 条重复")
+                continue
+
+            report['url'] = canonical_url
+            condition_type = entry.get('condition_type') or None
+            unique[key] = {
+                'index': index,
+                'service': service,
+                'url': canonical_url,
+                'target_price': target_price,
+                'condition_type': condition_type,
+                'target_value': target_value
+            }
+
+        if not unique:
+            return WishlistService._summarize_import(results)
+
+        for attempt in range(2):
+            try:
+                # 2. 一次性查出已存在的 Item（按平台分组的 IN 查询）
+                items_by_key = {}
+                ids_by_platform = {}
+                for platform, item_id in unique:
+                    ids_by_platform.setdefault(platform, []).append(item_id)
+
+                for platform, item_ids in ids_by_platform.items():
+                    existing_items = Item.query.filter(
+                        Item.platform == platform,
+                        Item.platform_item_id.in_(item_ids)
+                    ).all()
+                    for item in existing_items:
+                        items_by_key[(platform, item.platform_item_id)] = item
+
+                # 3. 为未知商品批量创建占位 Item
+                new_keys = [key for key in unique if key not in items_by_key]
+                for key in new_keys:
+                    info = unique[key]
+                    item = Item(
+                        platform_item_id=key[1],
+                        original_url=info['url'],
+                        title=f"Item ID {key[1]} (信息获取中)",
+                        image_url=None,
+                        platform=key[0],
+                        enrich_status='pending'
+                    )
+                    items_by_key[key] = item
+                    db.session.add(item)
+                db.session.flush()
+
+                # 4. 一次性查出用户已有的心愿，跳过重复添加
+                all_item_ids = [item.id for item in items_by_key.values()]
+                existing_wishes = {
+                    wish.item_id: wish for wish in
+                    Wish.query.filter(Wish.user_id == user_id, Wish.item_id.in_(all_item_ids)).all()
+                }
+
+                new_wishes = {}
+                for key, info in unique.items():
+                    item = items_by_key[key]
+                    if item.id in existing_wishes:
+                        continue
+                    wish = Wish(
+                        user_id=user_id,
+                        item_id=item.id,
+                        target_price=info['target_price'],
+                        is_unlocked=(info['condition_type'] is None),
+                        unlock_condition_type=info['condition_type'],
+                        unlock_target_value=info['target_value']
+                    )
+                    new_wishes[key] = wish
+                    db.session.add(wish)
+
+                db.session.flush()
+                for wish in new_wishes.values():
+                    change_log_service.record_wish(user_id, wish.id, wish.item_id)
+
+                # 事务一：Item 占位记录 + Wish + 变更日志
+                db.session.commit()
+                wishlist_cache.invalidate_user(user_id)
+                break
+
+            except IntegrityError:
+                # 与其他请求并发创建了同一个 Item，回滚后重新查询一遍
+                db.session.rollback()
+                if attempt == 0:
+                    continue
+                for info in unique.values():
+                    results[info['index']].update(status='failed', message='数据库完整性错误，请稍后再试')
+                return WishlistService._summarize_import(results)
+            except Exception as e:
+                db.session.rollback()
+                print(f"批量导入心愿时发生未知错误: {e}")
+                for info in unique.values():
+                    results[info['index']].update(status='failed', message='服务处理失败')
+                return WishlistService._summarize_import(results)
+
+        for key, info in unique.items():
+            report = results[info['index']]
+            item = items_by_key[key]
+            if key in new_wishes:
+                report.update(status='created', wish_id=new_wishes[key].id, item_id=item.id,
+                              message='心愿添加成功')
+            else:
+                report.update(status='exists', wish_id=existing_wishes[item.id].id, item_id=item.id,
+                              message='该商品已存在于您的心愿单中')
+
+        # 5. 新商品的首次价格通过平台批量接口获取（事务二），标题和图片交给后台补全队列
+        if new_keys:
+            try:
+                keys_by_platform = {}
+                for key in new_keys:
+                    keys_by_platform.setdefault(key[0], []).append(key)
+
+                for platform, keys in keys_by_platform.items():
+                    service = unique[keys[0]]['service']
+                    prices = service.fetch_prices_batch([key[1] for key in keys])
+                    for key in keys:
+                        price = prices.get(key[1], -1)
+                        if price is not None and price >= 0:
+                            price_stats_service.record_price(items_by_key[key].id, price)
+                            change_log_service.record_item(items_by_key[key].id)
+                db.session.commit()
+                for key in new_keys:
+                    wishlist_cache.invalidate_item(items_by_key[key].id)
+                    price_history_service.invalidate_item(items_by_key[key].id)
+            except Exception as e:
+                # 首次价格获取失败不影响导入结果，补全队列和监控任务会再次尝试
+                db.session.rollback()
+                print(f"批量获取首次价格失败: {e}")
+
+            for key in new_keys:
+                enrichment_queue.submit(items_by_key[key].id, unique[key]['url'])
+
+        return WishlistService._summarize_import(results)
 
     @staticmethod
-    def get_wishes_by_user(user_id: int):
-        """查询用户所有心愿单项目及最新价格"""
-        # 使用 SQLAlchemy 的 join 语句查询
-        wishes = db.session.query(Wish, Item).join(Item).filter(Wish.user_id == user_id).all()
+    def _summarize_import(results: list) -> dict:
+        """汇总批量导入的逐条结果"""
+        summary = {'total': len(results), 'results': results}
+        for status in ('created', 'exists', 'duplicate', 'invalid', 'failed'):
+            summary[status] = sum(1 for r in results if r.get('status') == status)
+        return summary
 
-        result = []
-        for wish, item in wishes:
-            # 获取最新价格：通过 PriceHistory 表按照时间倒序查询第一个记录
-            latest_price_record = PriceHistory.query.filter_by(item_id=item.id).order_by(
-                PriceHistory.timestamp.desc()
-            ).first()
+    @staticmethod
+    def get_wish_status(user_id: int, wish_id: int):
+        """查询单个心愿的商品补全状态，供前端在添加后轮询"""
+        row = db.session.query(Wish, Item, ItemPriceStats).join(Item, Wish.item_id == Item.id).outerjoin(
+            ItemPriceStats, ItemPriceStats.item_id == Item.id
+        ).filter(Wish.id == wish_id, Wish.user_id == user_id).first()
+        if not row:
+            return None
 
-            latest_price = latest_price_record.price if latest_price_record else None
+        wish, item, stats = row
+        return {
+            'wish_id': wish.id,
+            'item_id': item.id,
+            'enrich_status': item.enrich_status,
+            'title': item.title,
+            'image_url': item.image_url,
+            'latest_price': stats.last_price if stats else None
+        }
+
+    @staticmethod
+    def get_wishes_by_user(user_id: int, wish_ids=None):
+        """查询用户所有心愿单项目及最新价格；传入 wish_ids 时只查询这些心愿（增量同步使用）"""
+        # 最新价格和价格统计都来自增量维护的 item_price_stats，一次 JOIN 取完，不再逐个商品查询 price_history
+        query = db.session.query(Wish, Item, ItemPriceStats).join(Item, Wish.item_id == Item.id).outerjoin(
+            ItemPriceStats, ItemPriceStats.item_id == Item.id
+        ).filter(Wish.user_id == user_id)
+        if wish_ids is not None:
+            if not wish_ids:
+                return []
+            query = query.filter(Wish.id.in_(list(wish_ids)))
+        rows = query.all()
+
+        result = []
+        for wish, item, stats in rows:
+            latest_price = stats.last_price if stats else None
 
             # 🚨 核心修正：当 latest_price 不为 None 时才进行价格比较。
             if latest_price is not None and latest_price <= wish.target_price:
@@ -101,7 +329,7 @@ class WishlistService:
             else:
                 status = '高于目标'
 
-            result.append({
+            row = {
                 'wish_id': wish.id,
                 'target_price': wish.target_price,
                 'item_id': item.id,
@@ -109,21 +337,62 @@ class WishlistService:
                 'platform': item.platform,
                 'original_url': item.original_url,
                 'image_url': item.image_url,
+                'enrich_status': item.enrich_status,
                 'latest_price': latest_price,
                 'status': status,
                 'is_unlocked': wish.is_unlocked,
                 'unlock_condition_type': wish.unlock_condition_type,
                 'unlock_target_value': wish.unlock_target_value
-            })
+            }
+            row.update(price_stats_service.to_dict(stats))
+            result.append(row)
         return result
 
+    @staticmethod
+    def get_wishlist_snapshot(user_id: int):
+        """
+        带缓存的心愿单查询，返回 (etag, data)。
+        心愿变更或监控任务记录新价格时缓存会被主动失效，因此命中时无需访问数据库。
+        """
+        cached = wishlist_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        token = wishlist_cache.begin(user_id)
+        data = WishlistService.get_wishes_by_user(user_id)
+        etag = wishlist_cache.set(user_id, data, token)
+        return etag, data
+
+    @staticmethod
+    def get_changes(user_id: int, since: int = None) -> dict:
+        """
+        增量同步：返回游标 since 之后变化过的心愿（完整行）和已删除的心愿 ID。
+        since 为空或早于日志保留范围时返回完整心愿单，并标记 reset。
+        """
+        if since is None:
+            cursor = change_log_service.safe_cursor()
+            return {'cursor': cursor, 'reset': True, 'changed': WishlistService.get_wishes_by_user(user_id), 'deleted': []}
+
+        cursor, reset, changed_ids, deleted_ids = change_log_service.get_changes(user_id, since)
+        if reset:
+            return {'cursor': cursor, 'reset': True, 'changed': WishlistService.get_wishes_by_user(user_id), 'deleted': []}
+
+        return {
+            'cursor': cursor,
+            'reset': False,
+            'changed': WishlistService.get_wishes_by_user(user_id, changed_ids),
+            'deleted': sorted(deleted_ids)
+        }
+
     @staticmethod
     def delete_wish(user_id: int, wish_id: int):
         """删除一个心愿单项目"""
         wish = Wish.query.filter_by(id=wish_id, user_id=user_id).first()
         if wish:
+            change_log_service.record_wish(user_id, wish.id, wish.item_id, 'delete')
             db.session.delete(wish)
             db.session.commit()
+            wishlist_cache.invalidate_user(user_id)
             # 注意：这里我们不删除 Item 和 PriceHistory，因为其他用户可能也收藏了该 Item
             return True
         return False
@@ -151,7 +420,7 @@ class WishlistService:
             if not locked_wishes:
                 return False, "当前没有需要解锁的心愿"
 
-            unlocked_count = 0
+            unlocked_wishes = []
 
             # 3. 遍历检查
             for wish in locked_wishes:
@@ -163,25 +432,30 @@ class WishlistService:
 
                 if achieved:
                     wish.is_unlocked = True
-                    unlocked_count += 1
-                    try:
-                        title = wish.item.title if wish.item else "神秘商品"
-                        url = wish.item.original_url if wish.item else ""
-                        # 获取图片 URL
-                        image_url = wish.item.image_url if wish.item else None
+                    unlocked_wishes.append(wish)
+                    change_log_service.record_wish(user_id, wish.id, wish.item_id)
 
-                        condition_msg = f"{wish.unlock_condition_type} >= {wish.unlock_target_value}"
+                    title = wish.item.title if wish.item else "神秘商品"
+                    url = wish.item.original_url if wish.item else ""
+                    # 获取图片 URL
+                    image_url = wish.item.image_url if wish.item else None
 
-                        # 发送解锁通知 (传入 image_url)
-                        send_unlock_notification(user_id, title, url, condition_msg, image_url)
+                    condition_msg = f"{wish.unlock_condition_type} >= {wish.unlock_target_value}"
 
-                    except Exception as e:
-                        print(f"邮件发送非致命错误: {e}")
+                    # 写入通知发件箱 (与解锁状态一起提交，邮件由后台投递任务发送，不阻塞请求)
+                    outbox_service.enqueue_unlock_notification(user_id, title, url, condition_msg, image_url)
 
             # 4. 提交更改
-            if unlocked_count > 0:
+            if unlocked_wishes:
                 db.session.commit()
-                return True, f"恭喜！成功解锁了 {unlocked_count} 个心愿！"
+                wishlist_cache.invalidate_user(user_id)
+                for wish in unlocked_wishes:
+                    event_bus.publish(user_id, 'unlock', {
+                        'wish_id': wish.id,
+                        'item_id': wish.item_id,
+                        'title': wish.item.title if wish.item else None
+                    })
+                return True, f"恭喜！成功解锁了 {len(unlocked_wishes)} 个心愿！"
 
             return False, "条件尚未达成，继续加油！"
 
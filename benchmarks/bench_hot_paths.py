@@ -0,0 +1,347 @@
+"""
+热点路径的端到端基准测试，结果输出为 JSON，便于在不同提交之间对比：
+- price_monitoring:  一轮 run_price_monitoring（默认 1k / 10k / 100k 个商品）
+- wishlist_query:    WishlistService.get_wishes_by_user（默认 10 / 100 / 1000 条心愿）
+- battle:            POST /api/battle/analyze?refresh=1（GitHub 数据获取 + 战力计算 + AI 解说）
+- ai_analysis:       POST /api/ai/analyze/<username> 到后台任务完成（GitHub 数据 + AI 深度分析 + 保存报告）
+- resume_pdf:        GET /api/ai/resume/<username>（HTML 渲染 + PDF 生成）
+- notification_fanout: 一次降价触发 N 个用户的提醒：监控入队 + 发件箱投递到 SMTP 收件器
+
+上游（Steam / GitHub / Moonshot）和 SMTP 由进程内的 simulator 替代，不访问外网。
+数据库默认使用临时 SQLite 文件；设置 DATABASE_URL 可改用 MySQL（会清空其中所有表，需要同时加 --allow-reset）。
+SQLite 的写并发很差，发件箱和后台任务的多线程写入数据以 MySQL 为准。
+
+用法:
+    python benchmarks/bench_hot_paths.py --output bench.json
+    python benchmarks/bench_hot_paths.py --only wishlist_query,resume_pdf --rounds 20
+    python benchmarks/bench_hot_paths.py --upstream http://127.0.0.1:8900   # 使用外部启动的模拟器（可带故障注入）
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulator import SMTPSink, UpstreamSimulator  # noqa: E402
+
+BENCHMARKS = ('price_monitoring', 'wishlist_query', 'battle', 'ai_analysis', 'resume_pdf', 'notification_fanout')
+CONFIG_NAME = 'default'
+
+
+def _log(message: str):
+    # 应用本身的 print 输出被重定向掉了，进度信息写到 stderr
+    print(message, file=sys.stderr, flush=True)
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        'min': round(ordered[0], 6),
+        'median': round(statistics.median(ordered), 6),
+        'mean': round(statistics.fmean(ordered), 6),
+        # nearest-rank 百分位：样本较少时取到最大值，而不是偏低的样本
+        'p95': round(ordered[math.ceil(0.95 * len(ordered)) - 1], 6),
+        'max': round(ordered[-1], 6),
+    }
+
+
+def _result(name: str, params: dict, samples: list, **extra) -> dict:
+    result = {'name': name, 'params': params, 'rounds': len(samples), 'seconds': _summary(samples)}
+    if extra:
+        result['extra'] = extra
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ----------------------------------------------------------------------
+# 各项基准
+# ----------------------------------------------------------------------
+def bench_price_monitoring(app, sizes: list, rounds: int) -> list:
+    """每个商品一条心愿，用户数为商品数的 1%；目标价 1 元，只有免费游戏（约 5%）会触发提醒"""
+    from app.services.monitoring_service import run_price_monitoring
+    from benchmarks import seed
+
+    results = []
+    for size in sizes:
+        with app.app_context():
+            seed.reset_database()
+            users = seed.seed_users(max(1, size // 100))
+            items = seed.seed_items(size)
+            seed.seed_wishes(((users[i % len(users)], item_id) for i, item_id in enumerate(items)), 1.0)
+
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            run_price_monitoring(CONFIG_NAME)
+            samples.append(time.perf_counter() - start)
+        results.append(_result('price_monitoring', {'items': size}, samples,
+                               items_per_second=round(size / min(samples), 1)))
+        _log(f"price_monitoring items={size}: {min(samples):.2f}s")
+    return results
+
+
+def bench_wishlist_query(app, sizes: list, rounds: int) -> list:
+    from app.database import db
+    from app.services.wishlist_service import WishlistService
+    from benchmarks import seed
+
+    results = []
+    for size in sizes:
+        with app.app_context():
+            seed.reset_database()
+            user_id = seed.seed_users(1)[0]
+            items = seed.seed_items(size)
+            seed.seed_price_stats(items)
+            seed.seed_wishes(((user_id, item_id) for item_id in items), 100.0)
+
+            WishlistService.get_wishes_by_user(user_id)  # 预热
+            samples = []
+            for _ in range(rounds):
+                # 清空 identity map，每轮都从数据库重新加载对象，而不是复用上一轮的 ORM 实例
+                db.session.expunge_all()
+                start = time.perf_counter()
+                rows = WishlistService.get_wishes_by_user(user_id)
+                samples.append(time.perf_counter() - start)
+            assert len(rows) == size, f"期望 {size} 条心愿，实际 {len(rows)} 条"
+        results.append(_result('wishlist_query', {'wishes': size}, samples))
+        _log(f"wishlist_query wishes={size}: {statistics.median(samples) * 1000:.2f}ms")
+    return results
+
+
+def bench_battle(app, rounds: int) -> list:
+    from benchmarks import seed
+
+    with app.app_context():
+        seed.reset_database()
+
+    client = app.test_client()
+    run_id = uuid.uuid4().hex[:6]
+    samples, stage_times = [], []
+    for i in range(rounds):
+        # 每轮使用新的选手，避开选手数据缓存和对战结果缓存
+        body = {'player1': f'bench-{run_id}-a{i}', 'player2': f'bench-{run_id}-b{i}'}
+        start = time.perf_counter()
+        response = client.post('/api/battle/analyze?refresh=1', json=body)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"对战接口返回 {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        stage_times.append(response.get_json().get('stage_times'))
+    _log(f"battle: {statistics.median(samples) * 1000:.0f}ms")
+    return [_result('battle', {}, samples, stage_times=stage_times)]
+
+
+def bench_ai_analysis(app, rounds: int, timeout: float = 300) -> list:
+    from benchmarks import seed
+
+    with app.app_context():
+        seed.reset_database()
+
+    client = app.test_client()
+    run_id = uuid.uuid4().hex[:6]
+    samples = []
+    for i in range(rounds):
+        # 新用户名：既没有 24 小时内的报告，也不会命中大模型响应缓存
+        username = f'bench-{run_id}-u{i}'
+        start = time.perf_counter()
+        response = client.post(f'/api/ai/analyze/{username}')
+        if response.status_code != 202:
+            raise RuntimeError(f"分析接口返回 {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        status_url = response.get_json()['status_url']
+
+        while True:
+            job = client.get(status_url).get_json()
+            if job['status'] == 'succeeded':
+                break
+            if job['status'] == 'failed':
+                raise RuntimeError(f"分析任务失败: {job.get('error')}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"分析任务 {timeout} 秒内未完成")
+            time.sleep(0.02)
+        samples.append(time.perf_counter() - start)
+    _log(f"ai_analysis: {statistics.median(samples) * 1000:.0f}ms")
+    return [_result('ai_analysis', {}, samples)]
+
+
+def bench_resume_pdf(app, rounds: int) -> list:
+    from benchmarks import seed
+
+    username = 'bench-resume'
+    with app.app_context():
+        seed.reset_database()
+        seed.seed_analysis(username)
+
+    client = app.test_client()
+    client.get(f'/api/ai/resume/{username}')  # 预热：字体注册、模板编译
+    samples, size = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.get(f'/api/ai/resume/{username}')
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"简历接口返回 {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        size = len(response.data)
+    _log(f"resume_pdf: {statistics.median(samples) * 1000:.0f}ms")
+    return [_result('resume_pdf', {}, samples, pdf_bytes=size)]
+
+
+def bench_notification_fanout(app, sink: SMTPSink, recipients: int, rounds: int, timeout: float = 600) -> list:
+    """同一个商品被 recipients 个用户加入心愿单，一次价格监控触发全部提醒，再由发件箱投递"""
+    from app.services.monitoring_service import run_price_monitoring
+    from app.services.outbox_service import outbox_service
+    from benchmarks import seed
+
+    enqueue_samples, deliver_samples = [], []
+    for _ in range(rounds):
+        with app.app_context():
+            seed.reset_database()
+            users = seed.seed_users(recipients)
+            item_id = seed.seed_items(1)[0]
+            # 目标价高于任何合成价格，每个用户都会收到提醒
+            seed.seed_wishes(((user_id, item_id) for user_id in users), 1e6)
+
+        start = time.perf_counter()
+        run_price_monitoring(CONFIG_NAME)
+        enqueue_samples.append(time.perf_counter() - start)
+
+        received_before = sink.stats()['received']
+        start = time.perf_counter()
+        while sink.stats()['received'] - received_before < recipients:
+            if outbox_service.deliver_due(app):
+                continue
+            # 没有到期的通知：发送失败的条目在退避等待中
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{timeout} 秒内只投递了 {sink.stats()['received'] - received_before} 封邮件")
+            time.sleep(0.1)
+        deliver_samples.append(time.perf_counter() - start)
+
+    _log(f"notification_fanout recipients={recipients}: enqueue {min(enqueue_samples):.2f}s, "
+         f"deliver {min(deliver_samples):.2f}s")
+    return [
+        _result('notification_fanout.enqueue', {'recipients': recipients}, enqueue_samples),
+        _result('notification_fanout.deliver', {'recipients': recipients}, deliver_samples,
+                messages_per_second=round(recipients / min(deliver_samples), 1)),
+    ]
+
+
+# ----------------------------------------------------------------------
+# 入口
+# ----------------------------------------------------------------------
+def _sizes(text: str) -> list:
+    return [int(s) for s in text.split(',') if s.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help=f"逗号分隔，可选: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--rounds', type=int, default=5, help='除价格监控外每项基准的轮数（心愿查询至少 20 轮）')
+    parser.add_argument('--monitor-sizes', default='1000,10000,100000')
+    parser.add_argument('--monitor-rounds', type=int, default=1)
+    parser.add_argument('--wish-sizes', default='10,100,1000')
+    parser.add_argument('--fanout', type=int, default=1000, help='降价提醒的收件人数')
+    parser.add_argument('--upstream', default=None, help='外部模拟器地址；不指定时在进程内启动')
+    parser.add_argument('--allow-reset', action='store_true', help='允许清空 DATABASE_URL 指向的数据库')
+    parser.add_argument('--output', default=None, help='结果 JSON 文件，不指定时输出到 stdout')
+    parser.add_argument('--verbose', action='store_true', help='保留应用自身的日志输出')
+    args = parser.parse_args()
+
+    selected = [name for name in args.only.split(',') if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(sorted(unknown))}")
+
+    overrides = {}
+    if os.environ.get('DATABASE_URL'):
+        if not args.allow_reset:
+            parser.error('DATABASE_URL 指向的数据库会被清空，确认后加 --allow-reset')
+    else:
+        overrides['SQLALCHEMY_DATABASE_URI'] = \
+            f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')}"
+
+    upstream = None
+    if args.upstream:
+        base = args.upstream.rstrip('/')
+        overrides.update({'STEAM_API_URL': f'{base}/steam/api/appdetails', 'GITHUB_API_BASE': f'{base}/github',
+                          'MOONSHOT_BASE_URL': f'{base}/moonshot/v1'})
+    else:
+        upstream = UpstreamSimulator(port=0, fixtures_dir=os.path.join(ROOT, 'simulator', 'fixtures'))
+        upstream.start()
+        overrides.update(upstream.app_config())
+    sink = SMTPSink(port=0)
+    sink.start()
+    overrides.update(sink.app_config())
+
+    # 大模型客户端的密钥和调度器额度在模块导入时读取，仍需在导入 app 之前设置；
+    # 放宽 RPM / TPM 额度，多轮测试不会被限流拖慢
+    os.environ.setdefault('MOONSHOT_API_KEY', 'simulator')
+    os.environ.setdefault('MOONSHOT_RPM_LIMIT', '100000')
+    os.environ.setdefault('MOONSHOT_TPM_LIMIT', '100000000')
+
+    from app import create_app
+    from app.database import db
+
+    app = create_app(CONFIG_NAME, overrides)
+    meta = {
+        'commit': _git_commit(),
+        'started_at': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(args),
+    }
+    with app.app_context():
+        meta['database'] = db.engine.url.get_backend_name()
+
+    results = []
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(output):
+            for name in selected:
+                _log(f"--- {name} ---")
+                if name == 'price_monitoring':
+                    results += bench_price_monitoring(app, _sizes(args.monitor_sizes), args.monitor_rounds)
+                elif name == 'wishlist_query':
+                    results += bench_wishlist_query(app, _sizes(args.wish_sizes), max(args.rounds, 20))
+                elif name == 'battle':
+                    results += bench_battle(app, args.rounds)
+                elif name == 'ai_analysis':
+                    results += bench_ai_analysis(app, args.rounds)
+                elif name == 'resume_pdf':
+                    results += bench_resume_pdf(app, args.rounds)
+                elif name == 'notification_fanout':
+                    results += bench_notification_fanout(app, sink, args.fanout, args.rounds)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        sink.stop()
+        if upstream:
+            meta['upstream'] = upstream.stats()['services']
+            upstream.stop()
+
+    report = json.dumps({'meta': meta, 'results': results}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+        _log(f"结果已写入 {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+降价提醒邮件渲染的微基准：同一商品同一价格发给 N 个收件人。
+对比两种方式：
+- full:   每封邮件完整渲染（包括商品卡片）
+- shared: 商品卡片只渲染一次，每封邮件只渲染个性化的外层
+
+用法: python benchmarks/bench_notification_render.py [--recipients 1000] [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markupsafe import Markup  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.services import notification_service  # noqa: E402
+from app.services.notification_service import _render, _price_badges, render_item_fragment  # noqa: E402
+
+ITEM = {
+    'item_title': 'Cyberpunk 2077: Ultimate Edition',
+    'current_price': 149.5,
+    'image_url': 'https://cdn.cloudflare.steamstatic.com/steam/apps/1091500/header.jpg',
+    'item_url': 'https://store.steampowered.com/app/1091500/',
+}
+CARD_TEMPLATE = 'email/_price_item_card.html'
+
+
+def render_full(recipients: int) -> float:
+    start = time.perf_counter()
+    for i in range(recipients):
+        card = _render(CARD_TEMPLATE, badges=_price_badges(True, 35.0), **ITEM)
+        _render('email/price_alert.html', username=f'user{i}', item_card=Markup(card),
+                target_price=160.0, item_url=ITEM['item_url'])
+    return time.perf_counter() - start
+
+
+def render_shared(recipients: int) -> float:
+    notification_service._fragment_cache.clear()
+    start = time.perf_counter()
+    for i in range(recipients):
+        card = render_item_fragment(CARD_TEMPLATE, ITEM['item_title'], ITEM['current_price'], ITEM['image_url'],
+                                    ITEM['item_url'], _price_badges(True, 35.0))
+        _render('email/price_alert.html', username=f'user{i}', item_card=card,
+                target_price=160.0, item_url=ITEM['item_url'])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipients', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(os.environ.get('FLASK_CONFIG') or 'default')
+    with app.app_context():
+        # 预热：编译模板并放入 jinja_env 的模板缓存
+        render_full(1)
+
+        for name, func in (('full', render_full), ('shared', render_shared)):
+            best = min(func(args.recipients) for _ in range(args.rounds))
+            print(f"{name:>6}: {best * 1000:8.1f} ms / {args.recipients} 收件人 "
+                  f"({best / args.recipients * 1e6:.1f} µs/封)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+基准测试的数据库造数工具：批量插入用户、Steam 商品、心愿和价格统计。
+所有函数都必须在 app_context 中调用。
+"""
+import json
+from datetime import datetime
+
+from app.database import db
+from app.models import User, Item, Wish, ItemPriceStats
+from app.ai_models import GitHubAnalysis
+
+# 每批插入的行数：过大时 MySQL 会超过 max_allowed_packet
+BATCH_SIZE = 5000
+# 商品的 Steam AppID 从这里开始编号，与模拟器合成的数据一一对应
+BASE_APPID = 100000
+
+
+def reset_database():
+    """删除并重新创建全部表"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def _insert(model, rows: list):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(db.insert(model), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+
+
+def seed_users(count: int, prefix: str = 'bench') -> list:
+    """插入 count 个用户，返回用户 ID 列表"""
+    first = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    rows = [
+        {'id': first + i, 'username': f'{prefix}{first + i}', 'password_hash': 'x',
+         'email': f'{prefix}{first + i}@example.com'}
+        for i in range(count)
+    ]
+    _insert(User, rows)
+    return [row['id'] for row in rows]
+
+
+def seed_items(count: int) -> list:
+    """插入 count 个已补全的 Steam 商品，返回商品 ID 列表"""
+    first = (db.session.query(db.func.max(Item.id)).scalar() or 0) + 1
+    rows = []
+    for i in range(count):
+        appid = str(BASE_APPID + first + i)
+        rows.append({
+            'id': first + i,
+            'platform_item_id': appid,
+            'original_url': f'https://store.steampowered.com/app/{appid}/',
+            'title': f'模拟游戏 {appid}',
+            'image_url': f'https://cdn.cloudflare.steamstatic.com/steam/apps/{appid}/header.jpg',
+            'platform': 'steam',
+            'enrich_status': 'ready',
+        })
+    _insert(Item, rows)
+    return [row['id'] for row in rows]
+
+
+def seed_wishes(pairs, target_price: float) -> int:
+    """为每个 (user_id, item_id) 插入一条激活的心愿，返回插入的条数"""
+    rows = [
+        {'user_id': user_id, 'item_id': item_id, 'target_price': target_price, 'is_active': True,
+         'is_unlocked': True, 'unlock_target_value': 0}
+        for user_id, item_id in pairs
+    ]
+    _insert(Wish, rows)
+    return len(rows)
+
+
+def seed_price_stats(item_ids: list, price: float = 98.0):
+    """为商品插入已有的价格统计（相当于已经被监控过一次）"""
+    now = datetime.utcnow()
+    _insert(ItemPriceStats, [
+        {'item_id': item_id, 'last_price': price, 'last_timestamp': now, 'all_time_low': price,
+         'all_time_low_at': now, 'all_time_high': price, 'price_sum': price, 'price_count': 1, 'updated_at': now}
+        for item_id in item_ids
+    ])
+
+
+def seed_analysis(username: str, repo_count: int = 6) -> int:
+    """插入一份完整的 AI 分析报告（生成简历 PDF 用），返回记录 ID"""
+    report = {
+        'summary': '## 核心竞争力摘要\n' + '专注于后端与基础设施开发。' * 20,
+        'resume_summary': '具备多年 Python 后端开发经验，熟悉分布式系统与性能优化，主导过多个开源项目。',
+        'overall_score': 85,
+        'radar_scores': {'code_quality': 82, 'activity': 90, 'documentation': 70, 'influence': 65, 'tech_breadth': 88},
+        'tech_stack': ['Python', 'Flask', 'MySQL', 'Redis', 'Docker', 'Vue'],
+        'repositories': [
+            {'name': f'{username}-repo{i}', 'status': 'Active', 'stars': 10 * i,
+             'ai_summary': '一个高性能的异步任务调度框架，支持分布式部署与失败重试。'}
+            for i in range(repo_count)
+        ],
+    }
+    record = GitHubAnalysis(github_username=username, avatar_url=f'https://avatars.githubusercontent.com/{username}',
+                            analysis_json=json.dumps(report, ensure_ascii=False))
+    db.session.add(record)
+    db.session.commit()
+    return record.id
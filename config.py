@@ -28,14 +28,75 @@ class Config:
     SMTP_USER = os.environ.get('SMTP_USER') or '1431785463@qq.com'  # 🚨 替换成你的邮箱
     # 在步骤一中获得的 16 位授权码，不是你的登录密码！
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD') or 'uhizndmuaarfbaai'  # 🚨 替换成你的授权码
+    # 是否使用 SSL 连接；指向本地调试 SMTP 服务器时设为 false
+    SMTP_USE_SSL = (os.environ.get('SMTP_USE_SSL') or 'true').lower() != 'false'
+    # 连接池大小：同时保持的已登录 SMTP 连接数
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE') or 3)
+    # 单条连接最多发送的邮件数，超过后重新建立连接（避免触发服务商限额）
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION') or 100)
+    # 连接空闲超过该秒数后，复用前先发送 NOOP 探测
+    SMTP_MAX_IDLE_SECONDS = int(os.environ.get('SMTP_MAX_IDLE_SECONDS') or 60)
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT') or 30)
+
+    # ------------------- 外部服务地址 -------------------
+    # 可以指向本地模拟服务器（见 simulator 包）；create_app 会把它们设置到对应的服务实例上
+    STEAM_API_URL = os.environ.get('STEAM_API_URL') or 'https://store.steampowered.com/api/appdetails'
+    GITHUB_API_BASE = os.environ.get('GITHUB_API_BASE') or 'https://api.github.com'
+    MOONSHOT_BASE_URL = os.environ.get('MOONSHOT_BASE_URL') or 'https://api.moonshot.cn/v1'
+    # ------------------- 通知发件箱配置 -------------------
+    # 投递任务轮询间隔（秒）和每批领取的条数
+    OUTBOX_POLL_SECONDS = int(os.environ.get('OUTBOX_POLL_SECONDS') or 10)
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE') or 100)
+    # 并发发送邮件的工作线程数
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS') or 4)
+    # 最大尝试次数，超过后转入死信；重试间隔为 base * 2^(n-1)，不超过 max
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 6)
+    OUTBOX_BACKOFF_BASE_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_BASE_SECONDS') or 30)
+    OUTBOX_BACKOFF_MAX_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_MAX_SECONDS') or 3600)
+    # 汇总模式：降价提醒延迟一个窗口发送，同一用户窗口内的所有降价提醒合并成一封邮件
+    NOTIFICATION_DIGEST_ENABLED = (os.environ.get('NOTIFICATION_DIGEST_ENABLED') or 'false').lower() == 'true'
+    # 汇总窗口（秒），建议不小于一个价格监控周期
+    NOTIFICATION_DIGEST_WINDOW_SECONDS = int(os.environ.get('NOTIFICATION_DIGEST_WINDOW_SECONDS') or 300)
+
+    # 运维接口（/api/system/stats）的访问令牌，请求头 X-Ops-Token 需与之相同；未设置时该接口不可访问
+    OPS_TOKEN = os.environ.get('OPS_TOKEN')
+
+    # 实时事件推送（SSE）：心跳间隔（秒）。事件缓冲区大小由环境变量 EVENT_BUFFER_SIZE 控制
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS') or 15)
+
+    # 心愿变更日志保留天数，超过后由压缩任务清理；游标更早的客户端需要全量同步
+    WISH_CHANGELOG_RETENTION_DAYS = int(os.environ.get('WISH_CHANGELOG_RETENTION_DAYS') or 30)
+    # 变更日志游标的安全延迟（秒）：返回给客户端的游标只推进到这么久之前写入的日志，
+    # 避免并发事务中较小的 id 晚于较大的 id 提交而被跳过。应大于最长的写事务耗时
+    WISH_CHANGELOG_SAFETY_LAG_SECONDS = int(os.environ.get('WISH_CHANGELOG_SAFETY_LAG_SECONDS') or 10)
+
+    # 对战接口：两名选手的 GitHub 数据共用的获取截止时间（秒）。并发线程数由环境变量 BATTLE_FETCH_WORKERS 控制
+    BATTLE_FETCH_TIMEOUT = float(os.environ.get('BATTLE_FETCH_TIMEOUT') or 30)
+    # 对战统计：内存缓冲区写入数据库的间隔（秒）
+    BATTLE_STATS_FLUSH_SECONDS = int(os.environ.get('BATTLE_STATS_FLUSH_SECONDS') or 10)
+    # 锦标赛模式允许的最多选手数
+    TOURNAMENT_MAX_PLAYERS = int(os.environ.get('TOURNAMENT_MAX_PLAYERS') or 32)
+    # 大模型响应缓存：按调用方配置 TTL（秒），0 表示该调用方不缓存；总条数超过上限时按 LRU 淘汰
+    LLM_CACHE_TTLS = {
+        'analyze_user': int(os.environ.get('LLM_CACHE_TTL_ANALYZE_USER') or 7 * 24 * 3600),
+        'analyze_repo': int(os.environ.get('LLM_CACHE_TTL_ANALYZE_REPO') or 7 * 24 * 3600),
+    }
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES') or 5000)
+    # AI 分析提示词（不含系统提示词）的 Token 预算；模型档位（8k / 32k）根据实际提示词大小选择
+    AI_USER_PROMPT_TOKEN_BUDGET = int(os.environ.get('AI_USER_PROMPT_TOKEN_BUDGET') or 6000)
+    AI_REPO_PROMPT_TOKEN_BUDGET = int(os.environ.get('AI_REPO_PROMPT_TOKEN_BUDGET') or 3000)
     # ------------------------------------------------------------------
-    # SQLAlchemy 配置
-    SQLALCHEMY_DATABASE_URI = (
+    # SQLAlchemy 配置；设置 DATABASE_URL 时直接使用它（例如基准测试用的 sqlite:///bench.db），忽略上面的 MySQL 参数
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or (
         f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
     )
     # 禁用修改追踪，可以节省资源
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # ------------------- 心愿单配置 -------------------
+    # 批量导入接口单次允许的最大条目数
+    BULK_IMPORT_MAX_ENTRIES = int(os.environ.get('BULK_IMPORT_MAX_ENTRIES') or 1000)
+
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -1,4 +1,12 @@
 import os
+
+# 使用 gevent 运行时必须在导入其他模块之前打补丁：SSE 长连接由协程承载，数千个空闲连接不再各占一个线程
+USE_GEVENT = (os.environ.get('USE_GEVENT') or 'false').lower() == 'true'
+if USE_GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+
+import click
 from app import create_app
 from app.database import db
 from app import models
@@ -25,14 +33,62 @@ def init_db_command():
     print('✅ 数据库初始化完成!')
 
 
+@app.cli.command("upgrade_db")
+def upgrade_db_command():
+    """升级已有部署的数据库：创建新表，并为已有的表补齐新增的列和索引（create_all 不会修改已有的表）"""
+    from app.schema_upgrade import upgrade_schema
+
+    with app.app_context():
+        applied = upgrade_schema()
+
+    for change in applied:
+        print(f'   -> 已添加 {change}')
+    print(f'✅ 数据库升级完成，共 {len(applied)} 项变更!')
+
+
+@app.cli.command("rebuild_price_stats")
+@click.option('--item-id', type=int, default=None, help='只重建指定商品的统计数据')
+def rebuild_price_stats_command(item_id):
+    """根据 price_history 回填 / 重建商品价格统计表"""
+    from app.services.price_stats_service import price_stats_service
+
+    with app.app_context():
+        count = price_stats_service.rebuild(item_id=item_id)
+
+    print(f'✅ 价格统计重建完成，共处理 {count} 个商品!')
+
+
 # ---------------------------------------------------------------
 
 
+def resume_analysis_jobs():
+    """重新提交上次进程退出时尚未完成的 AI 分析任务"""
+    from app.services.analysis_job_service import analysis_job_service
+
+    try:
+        submitted = analysis_job_service.resume(app)
+        if submitted:
+            print(f'🔁 已恢复 {submitted} 个未完成的 AI 分析任务')
+    except Exception as e:
+        print(f'❌ 恢复 AI 分析任务失败: {e}')
+
+
 if __name__ == '__main__':
     # 🚨 关键修正：在启动前配置调度器
-    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and not USE_GEVENT:
         init_scheduler(app)  # <-- 在这里调用 init_scheduler
         start_scheduler()
+        resume_analysis_jobs()
 
+    if USE_GEVENT:
+        from gevent.pywsgi import WSGIServer
+
+        # gevent 服务器不会设置 WERKZEUG_RUN_MAIN，在这里直接启动调度器
+        init_scheduler(app)
+        start_scheduler()
+        resume_analysis_jobs()
+        print('🚀 使用 gevent 服务器启动: http://0.0.0.0:5000')
+        WSGIServer(('0.0.0.0', 5000), app).serve_forever()
+    else:
         # Flask 自带的开发服务器启动
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+        app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""
+上游服务模拟器：在本机替代 Steam、GitHub、Moonshot 和 SMTP，用于离线压测和调试。
+
+    python -m simulator                              # 回放模式：录制数据 + 合成数据
+    python -m simulator --mode record                # 录制模式：转发到真实上游并保存响应
+    python -m simulator --latency-ms 200 --rate-limit-rate 0.05 --accepted-rate 0.3
+
+启动后会打印应用需要设置的环境变量（STEAM_API_URL、GITHUB_API_BASE、MOONSHOT_BASE_URL、SMTP_*），
+把它们写入 .env 或在启动 run.py 前导出，Web 接口和价格监控任务就都会改用模拟服务器。
+"""
+from simulator.upstream import FaultConfig, UpstreamSimulator
+from simulator.smtp_sink import SMTPSink
+
+__all__ = ['FaultConfig', 'UpstreamSimulator', 'SMTPSink']
@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+
+from simulator import FaultConfig, SMTPSink, UpstreamSimulator
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulator', description='Steam / GitHub / Moonshot / SMTP 模拟器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--mode', choices=('replay', 'record'), default='replay')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='录制数据目录')
+    parser.add_argument('--no-synthetic', action='store_true', help='回放时没有录制数据直接返回 404')
+    parser.add_argument('--price-period', type=int, default=300, help='合成 Steam 价格的打折周期（秒）')
+
+    faults = parser.add_argument_group('故障注入（对所有服务生效，运行中可通过 POST /_sim/faults 按服务修改）')
+    faults.add_argument('--latency-ms', type=float, default=0)
+    faults.add_argument('--jitter-ms', type=float, default=0)
+    faults.add_argument('--error-rate', type=float, default=0, help='返回 503 的概率')
+    faults.add_argument('--rate-limit-rate', type=float, default=0, help='返回 429 的概率')
+    faults.add_argument('--retry-after', type=float, default=1, help='429 响应的 Retry-After（秒）')
+    faults.add_argument('--accepted-rate', type=float, default=0, help='GitHub 统计接口返回 202 的概率')
+    faults.add_argument('--chunk-delay-ms', type=float, default=20, help='流式响应数据块间隔')
+
+    smtp = parser.add_argument_group('SMTP')
+    smtp.add_argument('--smtp-port', type=int, default=1025)
+    smtp.add_argument('--smtp-dir', default=None, help='把收到的邮件保存为 .eml 文件')
+    smtp.add_argument('--smtp-fail-rate', type=float, default=0, help='返回 451 的概率')
+    smtp.add_argument('--no-smtp', action='store_true')
+    args = parser.parse_args()
+
+    upstream = UpstreamSimulator(
+        host=args.host, port=args.port, mode=args.mode, fixtures_dir=args.fixtures,
+        synthetic_fallback=not args.no_synthetic, price_period=args.price_period,
+        faults=FaultConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                           accepted_rate=args.accepted_rate, chunk_delay_ms=args.chunk_delay_ms)
+    )
+    upstream.start()
+    env = upstream.app_env()
+    if args.mode == 'replay':
+        # 客户端未配置 Key 时不会发出请求；回放模式不校验 Key，随便填一个即可
+        env['MOONSHOT_API_KEY'] = os.environ.get('MOONSHOT_API_KEY') or 'simulator'
+
+    sink = None
+    if not args.no_smtp:
+        sink = SMTPSink(host=args.host, port=args.smtp_port, out_dir=args.smtp_dir, fail_rate=args.smtp_fail_rate)
+        sink.start()
+        env.update(sink.app_env())
+
+    print(f"--- 🧪 上游模拟器已启动: {upstream.base_url}（{args.mode} 模式，录制目录 {args.fixtures}）---")
+    if sink:
+        print(f"--- 📮 SMTP 收件器已启动: {args.host}:{sink.port} ---")
+    print("应用需要的环境变量：")
+    for name, value in env.items():
+        print(f"  {name}={value}")
+    print(f"统计数据: GET {upstream.base_url}/_sim/stats")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        upstream.stop()
+        if sink:
+            print(f"--- 📮 共收到 {sink.stats()['received']} 封邮件 ---")
+            sink.stop()
+
+
+if __name__ == '__main__':
+    main()
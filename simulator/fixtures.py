@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl
+
+
+class FixtureStore:
+    """
+    录制的上游响应，每个请求一个 JSON 文件：<root>/<服务名>/<请求键>.json
+    请求键由 方法 + 路径 + 排序后的查询参数 + 规范化的请求体 计算，不包含 Authorization 等请求头，
+    因此用不同的 Token 录制和回放都能命中同一份录制数据。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method: str, path: str, query: str, body: bytes) -> str:
+        params = sorted(parse_qsl(query or '', keep_blank_values=True))
+        try:
+            # JSON 请求体按键排序后再计算，字段顺序不同的相同请求得到相同的键
+            body_text = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False) if body else ''
+        except ValueError:
+            body_text = body.decode('utf-8', errors='replace')
+        raw = json.dumps([method.upper(), path, params, body_text], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, service: str, key: str) -> str:
+        return os.path.join(self.root, service, f'{key}.json')
+
+    def load(self, service: str, key: str):
+        """返回录制的响应 {status, headers, body, request}；没有录制时返回 None"""
+        try:
+            with open(self._path(service, key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, service: str, key: str, request: dict, response: dict):
+        path = self._path(service, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = dict(response, request=request)
+        # 先写临时文件再改名，并发录制同一请求时不会留下写了一半的文件
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+
+    def count(self) -> dict:
+        """每个服务已录制的响应数"""
+        if not os.path.isdir(self.root):
+            return {}
+        return {
+            service: len([name for name in os.listdir(os.path.join(self.root, service)) if name.endswith('.json')])
+            for service in sorted(os.listdir(self.root))
+            if os.path.isdir(os.path.join(self.root, service))
+        }
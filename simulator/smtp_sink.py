@@ -0,0 +1,149 @@
+import os
+import random
+import socketserver
+import threading
+import time
+from collections import deque
+
+
+class SMTPSink:
+    """
+    只接收不投递的 SMTP 服务器，用于本地压测邮件通知：
+    - 支持 EHLO/HELO、MAIL、RCPT、DATA、RSET、NOOP、QUIT；不声明 AUTH，mail_transport 会跳过登录
+    - 收到的邮件保存在内存中（最近 max_messages 封），指定 out_dir 时同时写成 .eml 文件
+    - fail_rate：按该概率在 DATA 结束时返回 451 临时错误，用于验证发件箱的重试逻辑
+    应用侧配置：SMTP_SERVER=<host>，SMTP_PORT=<port>，SMTP_USE_SSL=false
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 1025, out_dir: str = None, max_messages: int = 1000,
+                 fail_rate: float = 0.0):
+        self.host = host
+        self.port = port
+        self.out_dir = out_dir
+        self.fail_rate = fail_rate
+        self.messages = deque(maxlen=max_messages)
+
+        self._lock = threading.Lock()
+        self._received = 0
+        self._rejected = 0
+        self._connections = 0
+        self._server = None
+
+    def start(self) -> int:
+        """在后台线程中启动，返回实际监听的端口"""
+        sink_instance = self
+
+        class Handler(_SMTPHandler):
+            sink = sink_instance
+
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True).start()
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def app_env(self) -> dict:
+        return {'SMTP_SERVER': self.host, 'SMTP_PORT': str(self.port), 'SMTP_USE_SSL': 'false'}
+
+    def app_config(self) -> dict:
+        """传给 create_app 的 config_overrides"""
+        return {'SMTP_SERVER': self.host, 'SMTP_PORT': self.port, 'SMTP_USE_SSL': False}
+
+    def _accept(self, mail_from: str, rcpt_tos: list, data: bytes) -> bool:
+        """保存一封邮件；按 fail_rate 拒收时返回 False"""
+        if random.random() < self.fail_rate:
+            with self._lock:
+                self._rejected += 1
+            return False
+
+        with self._lock:
+            self._received += 1
+            seq = self._received
+            self.messages.append({'mail_from': mail_from, 'rcpt_tos': rcpt_tos, 'data': data,
+                                  'received_at': time.time()})
+        if self.out_dir:
+            with open(os.path.join(self.out_dir, f'{int(time.time() * 1000)}-{seq}.eml'), 'wb') as f:
+                f.write(data)
+        return True
+
+    def _connected(self):
+        with self._lock:
+            self._connections += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'received': self._received, 'rejected': self._rejected, 'connections': self._connections}
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    sink = None  # 由 SMTPSink.start 绑定
+
+    def _reply(self, line: str):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.sink._connected()
+        self._reply('220 smtp-sink ESMTP ready')
+        mail_from, rcpt_tos = None, []
+
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+            command = line[:4].upper()
+
+            if command == 'EHLO':
+                self._reply('250-smtp-sink')
+                self._reply('250-8BITMIME')
+                self._reply('250 SIZE 52428800')
+            elif command == 'HELO':
+                self._reply('250 smtp-sink')
+            elif command == 'MAIL':
+                mail_from, rcpt_tos = line.partition(':')[2].strip().strip('<>'), []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                rcpt_tos.append(line.partition(':')[2].strip().strip('<>'))
+                self._reply('250 OK')
+            elif command == 'DATA':
+                if mail_from is None or not rcpt_tos:
+                    self._reply('503 need MAIL and RCPT first')
+                    continue
+                self._reply('354 end data with <CR><LF>.<CR><LF>')
+                data = self._read_data()
+                if data is None:
+                    return
+                if self.sink._accept(mail_from, rcpt_tos, data):
+                    self._reply('250 OK queued')
+                else:
+                    self._reply('451 simulated temporary failure')
+                mail_from, rcpt_tos = None, []
+            elif command == 'RSET':
+                mail_from, rcpt_tos = None, []
+                self._reply('250 OK')
+            elif command == 'NOOP':
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 bye')
+                return
+            else:
+                self._reply('502 command not implemented')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return None
+            if raw in (b'.\r\n', b'.\n'):
+                return b''.join(lines)
+            # 去掉点填充（RFC 5321 4.5.2）
+            lines.append(raw[1:] if raw.startswith(b'..') else raw)
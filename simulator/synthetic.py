@@ -0,0 +1,241 @@
+"""
+没有录制数据时使用的合成响应。
+数据由请求参数（AppID、用户名、仓库名）作为随机种子生成，同一请求总是得到相同的结果，
+字段只覆盖本项目实际读取的部分。
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+_LANGUAGES = ('Python', 'JavaScript', 'TypeScript', 'Go', 'Rust', 'Java', 'C++', 'Vue', 'Shell')
+
+
+def _rng(*parts) -> random.Random:
+    seed = hashlib.sha256('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _json(status: int, data) -> dict:
+    return {
+        'status': status,
+        'headers': {'Content-Type': 'application/json; charset=utf-8'},
+        'body': json.dumps(data, ensure_ascii=False),
+    }
+
+
+# ----------------------------------------------------------------------
+# Steam appdetails
+# ----------------------------------------------------------------------
+def steam_appdetails(query: str, price_period: int = 300) -> dict:
+    """
+    appids 可以是逗号分隔的多个 AppID。价格按 price_period 秒为周期随机打折，
+    让价格监控任务在模拟环境中也能触发降价提醒。
+    """
+    params = parse_qs(query or '')
+    appids = [a for a in (params.get('appids') or [''])[0].split(',') if a]
+    price_only = (params.get('filters') or [''])[0] == 'price_overview'
+    bucket = int(time.time() // price_period) if price_period else 0
+
+    result = {}
+    for appid in appids:
+        if not appid.isdigit():
+            result[appid] = {'success': False}
+            continue
+
+        rng = _rng('steam', appid)
+        is_free = rng.random() < 0.05
+        initial = rng.choice((1800, 3800, 4800, 6800, 9800, 14800, 19800, 29800))
+        discount = _rng('steam', appid, bucket).choice((0, 0, 0, 0, 10, 20, 33, 50, 75))
+        final = initial * (100 - discount) // 100
+        price_overview = {
+            'currency': 'CNY',
+            'initial': initial,
+            'final': final,
+            'discount_percent': discount,
+            'initial_formatted': f'¥ {initial / 100:.2f}' if discount else '',
+            'final_formatted': f'¥ {final / 100:.2f}',
+        }
+
+        if price_only:
+            # 与真实接口一致：过滤模式下免费游戏返回空列表
+            result[appid] = {'success': True, 'data': [] if is_free else {'price_overview': price_overview}}
+            continue
+
+        data = {
+            'type': 'game',
+            'name': f'模拟游戏 {appid}',
+            'steam_appid': int(appid),
+            'is_free': is_free,
+            'short_description': f'AppID {appid} 的模拟商品数据。',
+            'header_image': f'https://cdn.cloudflare.steamstatic.com/steam/apps/{appid}/header.jpg',
+        }
+        if not is_free:
+            data['price_overview'] = price_overview
+        result[appid] = {'success': True, 'data': data}
+
+    return _json(200, result)
+
+
+# ----------------------------------------------------------------------
+# GitHub REST API
+# ----------------------------------------------------------------------
+def _repo_names(username: str) -> list:
+    rng = _rng('github', username, 'repos')
+    return [f'{username}-{word}' for word in rng.sample(
+        ('api', 'cli', 'web', 'bot', 'sdk', 'docs', 'core', 'tools', 'demo', 'infra', 'lab', 'kit'), rng.randint(3, 12)
+    )]
+
+
+def _repo(owner: str, name: str) -> dict:
+    rng = _rng('github', owner, name)
+    updated = datetime.utcnow() - timedelta(days=rng.randint(0, 400))
+    return {
+        'name': name,
+        'full_name': f'{owner}/{name}',
+        'html_url': f'https://github.com/{owner}/{name}',
+        'description': f'{name} 的模拟仓库',
+        'created_at': _iso(updated - timedelta(days=rng.randint(30, 1500))),
+        'updated_at': _iso(updated),
+        'stargazers_count': int(rng.paretovariate(1.2) * 5) - 5,
+        'forks_count': rng.randint(0, 50),
+        'open_issues_count': rng.randint(0, 30),
+        'subscribers_count': rng.randint(0, 20),
+        'language': rng.choice(_LANGUAGES),
+    }
+
+
+def github(path: str, query: str) -> dict:
+    parts = [p for p in path.split('/') if p]
+
+    if len(parts) >= 2 and parts[0] == 'users':
+        username = parts[1]
+        rng = _rng('github', username)
+        if len(parts) == 2:
+            return _json(200, {
+                'login': username,
+                'name': username.title(),
+                'avatar_url': f'https://avatars.githubusercontent.com/{username}',
+                'bio': '模拟用户',
+                'public_repos': len(_repo_names(username)),
+                'followers': int(rng.paretovariate(1.1) * 10) - 10,
+                'following': rng.randint(0, 100),
+                'html_url': f'https://github.com/{username}',
+                'created_at': _iso(datetime(2012, 1, 1) + timedelta(days=rng.randint(0, 4000))),
+            })
+        if parts[2:] == ['repos']:
+            return _json(200, [_repo(username, name) for name in _repo_names(username)])
+        if parts[2:] == ['events']:
+            now = datetime.utcnow()
+            return _json(200, [
+                {'type': 'PushEvent', 'created_at': _iso(now - timedelta(hours=rng.randint(1, 24 * 10))),
+                 'payload': {'size': rng.randint(0, 5)}}
+                for _ in range(rng.randint(0, 30))
+            ])
+
+    if len(parts) >= 3 and parts[0] == 'repos':
+        owner, name = parts[1], parts[2]
+        rng = _rng('github', owner, name)
+        rest = parts[3:]
+        if not rest:
+            return _json(200, _repo(owner, name))
+        if rest == ['contributors']:
+            return _json(200, [
+                {'login': f'contributor{i}', 'avatar_url': f'https://avatars.githubusercontent.com/contributor{i}',
+                 'contributions': rng.randint(1, 500), 'html_url': f'https://github.com/contributor{i}'}
+                for i in range(rng.randint(1, 8))
+            ])
+        if rest == ['stats', 'commit_activity']:
+            week = int(time.time()) // 604800 * 604800
+            return _json(200, [
+                {'week': week - i * 604800, 'total': rng.randint(0, 20), 'days': [0] * 7} for i in range(51, -1, -1)
+            ])
+        if rest == ['readme']:
+            text = f'# {name}\n\n[![build](https://img.shields.io/badge/build-passing-green)](#)\n\n' \
+                   f'{name} 的模拟 README。\n\n## 安装\n\n```bash\npip install {name}\n```\n'
+            content = text.encode('utf-8')
+            return _json(200, {
+                'name': 'README.md',
+                'sha': hashlib.sha1(content).hexdigest(),
+                'encoding': 'base64',
+                'content': base64.b64encode(content).decode('ascii'),
+            })
+        if rest == ['languages']:
+            return _json(200, {lang: rng.randint(1000, 200000) for lang in rng.sample(_LANGUAGES, rng.randint(1, 4))})
+
+    return _json(404, {'message': 'Not Found'})
+
+
+# ----------------------------------------------------------------------
+# Moonshot /chat/completions
+# ----------------------------------------------------------------------
+_REPORT = {
+    'summary': '## 核心竞争力摘要\n模拟报告。\n\n## 技术深度与架构\n模拟报告。\n\n'
+               '## 工程素养与规范\n模拟报告。\n\n## 业务价值与潜能\n模拟报告。',
+    'resume_summary': '模拟的简历摘要。',
+    'overall_score': 75,
+    'radar_scores': {'code_quality': 70, 'activity': 80, 'documentation': 65, 'influence': 60, 'tech_breadth': 75},
+    'radar_data': {'functionality': 80, 'code_quality': 70, 'documentation': 65, 'influence': 60, 'innovation': 70},
+    'tech_stack': ['Python', 'Flask'],
+    'repositories': [],
+    'scenarios': [{'name': '个人学习', 'score': 80}],
+    'keywords': ['模拟'],
+}
+_COMMENTARY = '【模拟解说】双方你来我往，仓库与提交数互有胜负，最终综合战力更高的一方拿下了这场对决！'
+
+
+def _usage(messages: list, content: str) -> dict:
+    # 粗略估算（每 2 个字符 1 个 Token），只用于让调用方的用量统计有数据
+    prompt = sum(len(str(m.get('content') or '')) for m in messages) // 2
+    completion = len(content) // 2
+    return {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}
+
+
+def moonshot_chat(body: bytes, chunk_size: int = 8) -> dict:
+    """要求 JSON 输出（response_format=json_object）时返回各类分析报告字段的并集，否则返回一段解说文本"""
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        return _json(400, {'error': {'message': 'invalid json', 'type': 'invalid_request_error'}})
+
+    messages = payload.get('messages') or []
+    wants_json = (payload.get('response_format') or {}).get('type') == 'json_object'
+    content = json.dumps(_REPORT, ensure_ascii=False) if wants_json else _COMMENTARY
+    usage = _usage(messages, content)
+    created = int(time.time())
+    model = payload.get('model') or 'moonshot-v1-8k'
+
+    if not payload.get('stream'):
+        return _json(200, {
+            'id': f'chatcmpl-sim-{created}',
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': usage,
+        })
+
+    events = []
+    for start in range(0, len(content), chunk_size):
+        chunk = {'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                 'choices': [{'index': 0, 'delta': {'content': content[start:start + chunk_size]}}]}
+        events.append(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n')
+    # 与真实接口一致：最后一个数据块的 choice 中携带 usage
+    last = {'object': 'chat.completion.chunk', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop', 'usage': usage}]}
+    events.append(f'data: {json.dumps(last, ensure_ascii=False)}\n\n')
+    events.append('data: [DONE]\n\n')
+    return {'status': 200, 'headers': {'Content-Type': 'text/event-stream'}, 'body': ''.join(events)}
+
+
+def is_github_stats_path(path: str) -> bool:
+    """GitHub 统计接口：数据尚未计算好时返回 202，调用方需要稍后重试"""
+    return re.match(r'^/repos/[^/]+/[^/]+/stats/', path) is not None
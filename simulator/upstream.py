@@ -0,0 +1,324 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from simulator import synthetic
+from simulator.fixtures import FixtureStore
+
+# 路径前缀 -> (服务名, 真实上游地址)。应用中对应的配置：
+#   STEAM_API_URL     = http://<host>:<port>/steam/api/appdetails
+#   GITHUB_API_BASE   = http://<host>:<port>/github
+#   MOONSHOT_BASE_URL = http://<host>:<port>/moonshot/v1
+SERVICES = {
+    '/steam': ('steam', 'https://store.steampowered.com'),
+    '/github': ('github', 'https://api.github.com'),
+    '/moonshot': ('moonshot', 'https://api.moonshot.cn'),
+}
+# 录制时转发给上游的请求头
+_FORWARD_HEADERS = ('Authorization', 'Accept', 'Content-Type', 'User-Agent')
+# 这些状态码是上游的临时故障，不录制（回放时由故障注入模拟）
+_TRANSIENT_STATUS = (429, 500, 502, 503, 504)
+
+
+class FaultConfig:
+    """
+    单个服务的故障注入参数：
+    - latency_ms / jitter_ms：每个请求先等待 latency_ms + [0, jitter_ms) 毫秒
+    - error_rate：按该概率返回 503
+    - rate_limit_rate：按该概率返回 429，带 Retry-After: retry_after 秒
+    - accepted_rate：GitHub 统计接口（/repos/*/*/stats/*）按该概率返回 202（数据计算中）
+    - chunk_delay_ms：流式响应每个数据块之间的间隔
+    """
+
+    FIELDS = ('latency_ms', 'jitter_ms', 'error_rate', 'rate_limit_rate', 'retry_after', 'accepted_rate',
+              'chunk_delay_ms')
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, rate_limit_rate: float = 0,
+                 retry_after: float = 1, accepted_rate: float = 0, chunk_delay_ms: float = 20):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.accepted_rate = accepted_rate
+        self.chunk_delay_ms = chunk_delay_ms
+
+    def updated(self, **changes) -> 'FaultConfig':
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"未知的故障参数: {', '.join(sorted(unknown))}")
+        return FaultConfig(**dict(self.to_dict(), **{k: float(v) for k, v in changes.items()}))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class UpstreamSimulator:
+    """
+    Steam / GitHub / Moonshot 的本地替身服务器：
+    - replay（默认）：返回录制的响应；没有录制时返回合成响应（synthetic=False 时返回 404）
+    - record：把请求转发给真实上游，保存响应后原样返回
+    - 故障注入：延迟、503、429、202，可按服务分别配置，运行中可通过 POST /_sim/faults 修改
+    - GET /_sim/stats 返回每个服务的请求数、命中方式和注入的故障数
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8900, mode: str = 'replay', fixtures_dir: str = None,
+                 synthetic_fallback: bool = True, faults: FaultConfig = None, price_period: int = 300):
+        if mode not in ('replay', 'record'):
+            raise ValueError(f"未知的模式: {mode}")
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.store = FixtureStore(fixtures_dir) if fixtures_dir else None
+        self.synthetic_fallback = synthetic_fallback
+        self.price_period = price_period
+
+        self._lock = threading.Lock()
+        # 服务名 -> FaultConfig；'default' 用于没有单独配置的服务
+        self._faults = {'default': faults or FaultConfig()}
+        self._stats = {}
+        self._server = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self):
+        """在后台线程中启动服务器，返回实际监听的端口（port=0 时由系统分配）"""
+        simulator = self
+
+        class Handler(_Handler):
+            sim = simulator
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='upstream-simulator', daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def app_env(self) -> dict:
+        """让应用改用模拟服务器所需的环境变量"""
+        return {
+            'STEAM_API_URL': f'{self.base_url}/steam/api/appdetails',
+            'GITHUB_API_BASE': f'{self.base_url}/github',
+            'MOONSHOT_BASE_URL': f'{self.base_url}/moonshot/v1',
+        }
+
+    def app_config(self) -> dict:
+        """让应用改用模拟服务器所需的配置项（传给 create_app 的 config_overrides），与环境变量同名"""
+        return self.app_env()
+
+    # ------------------------------------------------------------------
+    # 故障配置与统计
+    # ------------------------------------------------------------------
+    def faults_for(self, service: str) -> FaultConfig:
+        with self._lock:
+            return self._faults.get(service) or self._faults['default']
+
+    def set_faults(self, service: str = None, **changes):
+        """修改某个服务（不指定时为默认配置）的故障参数，未指定的参数保持不变"""
+        key = service or 'default'
+        with self._lock:
+            base = self._faults.get(key) or self._faults['default']
+            self._faults[key] = base.updated(**changes)
+
+    def reset(self):
+        with self._lock:
+            self._faults = {'default': FaultConfig()}
+            self._stats = {}
+
+    def count(self, service: str, event: str):
+        with self._lock:
+            stats = self._stats.setdefault(service, {})
+            stats[event] = stats.get(event, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'services': {name: dict(counts) for name, counts in self._stats.items()},
+                'faults': {name: faults.to_dict() for name, faults in self._faults.items()},
+                'fixtures': self.store.count() if self.store else {},
+            }
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+    def inject_fault(self, service: str, path: str):
+        """按故障配置等待，并在命中时返回要注入的响应；不注入时返回 None"""
+        faults = self.faults_for(service)
+        delay = faults.latency_ms + random.random() * faults.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        roll = random.random()
+        if roll < faults.error_rate:
+            self.count(service, 'injected_503')
+            return _error_response(service, 503, 'simulated upstream failure')
+        roll -= faults.error_rate
+        if roll < faults.rate_limit_rate:
+            self.count(service, 'injected_429')
+            response = _error_response(service, 429, 'simulated rate limit')
+            response['headers']['Retry-After'] = str(int(faults.retry_after))
+            return response
+        if service == 'github' and synthetic.is_github_stats_path(path) and random.random() < faults.accepted_rate:
+            self.count(service, 'injected_202')
+            return {'status': 202, 'headers': {'Content-Type': 'application/json'}, 'body': '{}'}
+        return None
+
+    def respond(self, service: str, upstream: str, method: str, path: str, query: str, headers, body: bytes) -> dict:
+        self.count(service, 'requests')
+        injected = self.inject_fault(service, path)
+        if injected is not None:
+            return injected
+
+        key = FixtureStore.make_key(method, path, query, body)
+        if self.mode == 'record':
+            response = self._forward(upstream, method, path, query, headers, body)
+            if self.store and response['status'] not in _TRANSIENT_STATUS:
+                self.store.save(service, key, {'method': method, 'path': path, 'query': query}, response)
+                self.count(service, 'recorded')
+            return response
+
+        recorded = self.store.load(service, key) if self.store else None
+        if recorded is not None:
+            self.count(service, 'replayed')
+            return recorded
+
+        if not self.synthetic_fallback:
+            self.count(service, 'missing')
+            return _error_response(service, 404, f'no fixture for {method} {path}?{query}')
+
+        self.count(service, 'synthetic')
+        if service == 'steam':
+            return synthetic.steam_appdetails(query, self.price_period)
+        if service == 'github':
+            return synthetic.github(path, query)
+        return synthetic.moonshot_chat(body)
+
+    @staticmethod
+    def _forward(upstream: str, method: str, path: str, query: str, headers, body: bytes) -> dict:
+        url = f"{upstream}{path}{'?' + query if query else ''}"
+        forward = {name: headers[name] for name in _FORWARD_HEADERS if headers.get(name)}
+        request = urllib.request.Request(url, data=body or None, headers=forward, method=method)
+        try:
+            # 流式响应也完整读取后再返回，回放时再按数据块节奏输出
+            with urllib.request.urlopen(request, timeout=120) as resp:
+                status, resp_headers, data = resp.status, resp.headers, resp.read()
+        except urllib.error.HTTPError as e:
+            status, resp_headers, data = e.code, e.headers, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return {'status': 502, 'headers': {'Content-Type': 'text/plain; charset=utf-8'},
+                    'body': f'upstream unreachable: {e}'}
+
+        kept = {name: resp_headers[name] for name in ('Content-Type', 'Retry-After') if resp_headers.get(name)}
+        return {'status': status, 'headers': kept, 'body': data.decode('utf-8', errors='replace')}
+
+
+def _error_response(service: str, status: int, message: str) -> dict:
+    # 各服务的错误体格式不同：Moonshot 为 {"error": {"message": ...}}，GitHub 为 {"message": ...}
+    if service == 'moonshot':
+        data = {'error': {'message': message, 'type': 'rate_limit_reached_error' if status == 429 else 'server_error'}}
+    else:
+        data = {'message': message}
+    return {'status': status, 'headers': {'Content-Type': 'application/json'}, 'body': json.dumps(data)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    sim = None  # 由 UpstreamSimulator.start 绑定
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        # 压测时每个请求一行日志太多，统计数据见 /_sim/stats
+        pass
+
+    def _handle(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if parts.path.startswith('/_sim/'):
+            return self._admin(parts.path, body)
+
+        for prefix, (service, upstream) in SERVICES.items():
+            if parts.path == prefix or parts.path.startswith(prefix + '/'):
+                path = parts.path[len(prefix):] or '/'
+                response = self.sim.respond(service, upstream, self.command, path, parts.query, self.headers, body)
+                return self._send(response, self.sim.faults_for(service).chunk_delay_ms)
+
+        self._send({'status': 404, 'headers': {'Content-Type': 'application/json'},
+                    'body': json.dumps({'message': f'unknown service: {parts.path}'})})
+
+    def _admin(self, path: str, body: bytes):
+        try:
+            if path == '/_sim/stats':
+                data = self.sim.stats()
+            elif path == '/_sim/faults' and self.command == 'POST':
+                # {"service": "github", "rate_limit_rate": 0.2}，不带 service 时修改默认配置
+                changes = json.loads(body or b'{}')
+                self.sim.set_faults(changes.pop('service', None), **changes)
+                data = self.sim.stats()['faults']
+            elif path == '/_sim/reset' and self.command == 'POST':
+                self.sim.reset()
+                data = {'ok': True}
+            else:
+                raise LookupError(path)
+            status = 200
+        except LookupError:
+            status, data = 404, {'message': 'not found'}
+        except (ValueError, TypeError) as e:
+            status, data = 400, {'message': str(e)}
+        self._send({'status': status, 'headers': {'Content-Type': 'application/json'},
+                    'body': json.dumps(data, ensure_ascii=False)})
+
+    def _send(self, response: dict, chunk_delay_ms: float = 0):
+        headers = response.get('headers') or {}
+        data = (response.get('body') or '').encode('utf-8')
+        streaming = headers.get('Content-Type', '').startswith('text/event-stream')
+
+        self.send_response(response['status'])
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        if not streaming:
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # SSE：按事件逐个输出，写完后关闭连接（没有 Content-Length，客户端读到 EOF 为止）
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for event in data.split(b'\n\n'):
+                if not event.strip():
+                    continue
+                self.wfile.write(event + b'\n\n')
+                self.wfile.flush()
+                if chunk_delay_ms:
+                    time.sleep(chunk_delay_ms / 1000)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入 app 和 simulator 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'app_config(**overrides): 覆盖 app fixture 的配置项')
+
+
+@pytest.fixture
+def app(request, tmp_path):
+    """
+    使用 tmp_path 下 SQLite 数据库的 Flask 应用，已创建全部表。
+    用 @pytest.mark.app_config(KEY=value) 覆盖配置项。
+    """
+    from flask import Flask
+    from app.database import db
+    from app import models, ai_models, battle_models  # noqa: F401  注册全部模型
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    marker = request.node.get_closest_marker('app_config')
+    if marker:
+        app.config.update(marker.kwargs)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
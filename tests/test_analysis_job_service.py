@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from app.database import db
+from app.ai_models import AnalysisJob
+from app.services.analysis_job_service import AnalysisJobService, STALE_HEARTBEAT_SECONDS
+
+
+def test_resume_requeues_only_jobs_with_stale_heartbeat(app):
+    now = datetime.utcnow()
+    long_ago = now - timedelta(hours=1)
+    with app.app_context():
+        db.session.add_all([
+            # 已执行很久，但心跳仍在刷新：不能被重复执行
+            AnalysisJob(id='alive', github_username='alice', status='running', attempts=1,
+                        created_at=long_ago, started_at=long_ago, heartbeat_at=now),
+            AnalysisJob(id='crashed', github_username='bob', status='running', attempts=1, created_at=long_ago,
+                        started_at=long_ago,
+                        heartbeat_at=now - timedelta(seconds=STALE_HEARTBEAT_SECONDS + 1)),
+        ])
+        db.session.commit()
+
+    service = AnalysisJobService(max_workers=1)
+    submitted = []
+    service._submit_locked = lambda _app, job_id, key: submitted.append(job_id)
+
+    assert service.resume(app) == 1
+    assert submitted == ['crashed']
+    with app.app_context():
+        assert db.session.get(AnalysisJob, 'alive').status == 'running'
+        assert db.session.get(AnalysisJob, 'crashed').status == 'queued'
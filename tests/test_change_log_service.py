@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import db
+from app.models import WishChangeLog
+from app.services.change_log_service import change_log_service
+
+
+def _log(wish_id: int, seconds_ago: int):
+    db.session.add(WishChangeLog(user_id=1, wish_id=wish_id, change_type='upsert',
+                                 created_at=datetime.utcnow() - timedelta(seconds=seconds_ago)))
+    db.session.commit()
+
+
+@pytest.mark.app_config(WISH_CHANGELOG_SAFETY_LAG_SECONDS=10)
+def test_cursor_does_not_pass_recent_logs(app):
+    with app.app_context():
+        _log(101, 60)
+        _log(102, 60)
+        _log(103, 0)
+
+        # 最近写入的日志仍然返回，但游标停在安全延迟之前，下次同步会再返回一次
+        cursor, reset, changed, deleted = change_log_service.get_changes(1, 1)
+        assert (cursor, reset, changed, deleted) == (2, False, {102, 103}, set())
+
+        cursor, reset, changed, _ = change_log_service.get_changes(1, cursor)
+        assert (cursor, reset, changed) == (2, False, {103})
+
+        # 延迟过后游标推进到最新
+        assert change_log_service.safe_cursor(0) == 3
+
+
+@pytest.mark.app_config(WISH_CHANGELOG_SAFETY_LAG_SECONDS=10)
+def test_cursor_newer_than_head_resets(app):
+    with app.app_context():
+        _log(101, 60)
+        cursor, reset, _, _ = change_log_service.get_changes(1, 50)
+        assert (cursor, reset) == (1, True)
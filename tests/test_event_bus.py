@@ -0,0 +1,29 @@
+from app.services.event_bus import EventBus
+
+
+def test_cursor_from_previous_process_gets_reset():
+    old = EventBus()
+    old.publish(1, 'price', {})
+    stale_cursor = old.last_id
+
+    # 进程重启：新的总线没有任何缓冲事件
+    bus = EventBus()
+    assert bus.wait(1, stale_cursor, timeout=0) == ([], True)
+
+    bus.publish(1, 'price', {'latest_price': 1.0})
+    events, reset = bus.wait(1, stale_cursor, timeout=0)
+    assert reset and len(events) == 1
+
+
+def test_cursor_ahead_of_sequence_gets_reset():
+    bus = EventBus()
+    assert bus.wait(1, bus.last_id + 100, timeout=0) == ([], True)
+
+
+def test_current_cursor_gets_new_events_without_reset():
+    bus = EventBus()
+    cursor = bus.last_id
+    seq = bus.publish([1, 2], 'unlock', {})
+    events, reset = bus.wait(1, cursor, timeout=0)
+    assert not reset
+    assert [e[1] for e in events] == ['unlock'] and events[-1][0] <= seq
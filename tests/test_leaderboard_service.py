@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from app.database import db
+from app.battle_models import PlayerPowerScore
+from app.services.leaderboard_service import LeaderboardService
+
+
+def _player(username: str, power_score: int) -> dict:
+    return {'username': username, 'power_score': power_score, 'rank': 'A'}
+
+
+def test_failed_flush_keeps_pending_entries(app, monkeypatch):
+    board = LeaderboardService()
+    with app.app_context():
+        board.record(_player('Alice', 100))
+
+        def fail():
+            raise RuntimeError('db down')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(db.session, 'commit', fail)
+            assert board.flush() == 0
+
+        # 写入失败后重新加载索引，尚未写入的数据仍然保留
+        board.refresh(force=True)
+        assert board.rank_of('alice')['power_score'] == 100
+
+        assert board.flush() == 1
+        assert db.session.get(PlayerPowerScore, 'alice').power_score == 100
+        assert board.flush() == 0
+
+
+def test_refresh_merges_newer_rows_from_other_processes(app):
+    board = LeaderboardService()
+    with app.app_context():
+        board.record(_player('Alice', 100))
+        board.record(_player('Bob', 50))
+        board.flush()
+
+        # 其他进程写入了更新的 bob，并新增了 carol
+        later = datetime.utcnow() + timedelta(seconds=5)
+        db.session.merge(PlayerPowerScore(username='bob', display_name='Bob', power_score=300, updated_at=later))
+        db.session.add(PlayerPowerScore(username='carol', display_name='Carol', power_score=200, updated_at=later))
+        db.session.commit()
+
+        # 未到重新加载间隔时不会查询数据库
+        assert board.refresh() is False
+        assert board.total() == 2
+
+        assert board.refresh(force=True) is True
+        assert [e['username'] for e in board.top()] == ['Bob', 'Carol', 'Alice']
@@ -0,0 +1,20 @@
+from app.services.moonshot_client import MoonshotClient
+from simulator import FaultConfig, UpstreamSimulator
+
+
+def test_stream_decodes_cjk_without_charset():
+    # 模拟器的 SSE 响应 Content-Type 为 text/event-stream，不带 charset
+    sim = UpstreamSimulator(port=0, faults=FaultConfig(chunk_delay_ms=0))
+    sim.start()
+    try:
+        client = MoonshotClient(api_key='test', base_url=f'{sim.base_url}/moonshot/v1', max_retries=0)
+        payload = {'model': 'moonshot-v1-8k', 'messages': [{'role': 'user', 'content': '你好'}]}
+
+        usage = {}
+        streamed = ''.join(client.stream('battle_stream', payload, usage_out=usage))
+
+        assert streamed.startswith('【模拟解说】')
+        assert streamed == client.complete('battle', payload)
+        assert usage['total_tokens'] > 0
+    finally:
+        sim.stop()
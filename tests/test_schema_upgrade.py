@@ -0,0 +1,34 @@
+from sqlalchemy import inspect, text
+
+from app import models
+from app.database import db
+from app.schema_upgrade import upgrade_schema
+
+
+def _make_legacy(app):
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as conn:
+            # 升级前的表结构：items 没有 enrich_status，price_history 没有联合索引
+            conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, platform_item_id VARCHAR(128) NOT NULL, "
+                              "original_url VARCHAR(512) NOT NULL UNIQUE, title VARCHAR(256) NOT NULL, "
+                              "image_url VARCHAR(512), platform VARCHAR(50) NOT NULL)"))
+            conn.execute(text("CREATE TABLE price_history (id INTEGER PRIMARY KEY, item_id INTEGER, "
+                              "price FLOAT NOT NULL, timestamp DATETIME)"))
+            conn.execute(text("INSERT INTO items (platform_item_id, original_url, title, platform) "
+                              "VALUES ('10', 'https://store.steampowered.com/app/10/', 'Counter-Strike', 'steam')"))
+
+
+def test_upgrade_adds_missing_column_and_indexes(app):
+    _make_legacy(app)
+    with app.app_context():
+        applied = upgrade_schema()
+        assert applied == ['items.enrich_status', 'items: ix_items_enrich_status',
+                           'price_history: ix_price_history_item_timestamp']
+
+        item = models.Item.query.one()
+        assert item.enrich_status == 'ready'
+        assert 'notification_outbox' in inspect(db.engine).get_table_names()
+
+        # 重复执行不做任何变更
+        assert upgrade_schema() == []
@@ -0,0 +1,21 @@
+import pytest
+
+from app.modules.system import system_bp
+
+
+@pytest.mark.app_config(OPS_TOKEN='secret')
+def test_stats_requires_ops_token(app):
+    app.register_blueprint(system_bp)
+    client = app.test_client()
+
+    assert client.get('/api/system/stats').status_code == 401
+    assert client.get('/api/system/stats', headers={'X-Ops-Token': 'wrong'}).status_code == 401
+
+    response = client.get('/api/system/stats', headers={'X-Ops-Token': 'secret'})
+    assert response.status_code == 200
+    assert 'moonshot' in response.get_json()['data']
+
+
+def test_stats_disabled_without_ops_token(app):
+    app.register_blueprint(system_bp)
+    assert app.test_client().get('/api/system/stats', headers={'X-Ops-Token': ''}).status_code == 403
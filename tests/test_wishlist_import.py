@@ -0,0 +1,22 @@
+from app.services.wishlist_service import WishlistService
+
+URL = 'https://store.steampowered.com/app/10/'
+
+
+def test_bulk_import_rejects_bad_rows_individually():
+    summary = WishlistService.bulk_add_wishes(1, [
+        {'url': URL, 'target_price': 'nan'},
+        {'url': URL, 'target_price': -5},
+        {'url': URL, 'target_price': 'inf'},
+        {'url': URL, 'target_price': 10, 'condition_type': 'checkin', 'target_value': 'abc'},
+        {'url': URL, 'target_price': 10, 'condition_type': 'checkin', 'target_value': -1},
+    ])
+
+    assert summary['invalid'] == 5
+    assert [r['message'] for r in summary['results']] == [
+        '期望价格必须是不小于 0 的数字',
+        '期望价格必须是不小于 0 的数字',
+        '期望价格必须是不小于 0 的数字',
+        '解锁目标值格式不正确',
+        '解锁目标值不能小于 0',
+    ]